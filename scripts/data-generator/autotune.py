@@ -0,0 +1,247 @@
+"""Sweep OCR settings on a clip and score each against a ground-truth table.
+
+Every combination of frame skip, confidence threshold, OCR band height and
+subtitle-presence gating is run through ``video_ocr.process_video`` on the
+same clip. The output is scored against the clip's lines in a
+``tables/*.csv`` file (line recall, precision, start-time error) and
+costed in OCR seconds. The Pareto front over recall, start error and OCR
+seconds is printed, with the cheapest setting that meets ``--target-recall``:
+
+    python autotune.py downloads/episode01.mp4 --episode 1
+    python autotune.py clip.mp4 --episode 3 --clip-start 600 \\
+        --frame-skips 2,4,8,16 --thresholds 0.4,0.6,0.8 --bands 0.3,0.2 --presence-fnr none,0.01
+
+OCR outputs are cached per (reader, frame, band), so grid points that
+sample the same frames share one OCR call. A point's OCR seconds are what
+its calls cost when they first ran, i.e. its cost if run on its own.
+"""
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import cv2
+
+from benchmarks.bench_pipeline import score_detections
+from ocr_backends import BACKENDS
+from subtitle_detector import SubtitleDetector
+from subtitle_streams import parse_table_time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_TABLE = os.path.join(REPO_ROOT, 'tables', 'mygo.csv')
+# video_ocr.crop_subtitle_region hands OCR the bottom 30% of the frame
+FULL_BAND = 0.3
+# Objectives of the Pareto front: (metric, True if higher is better)
+OBJECTIVES = (('recall', True), ('start_error', False), ('ocr_seconds', False))
+
+
+def load_truth(table_path, episode, clip_start=0.0, clip_end=None):
+    """Lines of ``episode`` shown in [clip_start, clip_end), timed relative to the clip."""
+    lines = []
+    with open(table_path, encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            if str(row['episode']).strip() != str(episode):
+                continue
+            start, end = parse_table_time(row['start_time']), parse_table_time(row['end_time'])
+            if end <= clip_start or (clip_end is not None and start >= clip_end):
+                continue
+            lines.append({'text': row['text'], 'start_time': start - clip_start, 'end_time': end - clip_start})
+    lines.sort(key=lambda line: line['start_time'])
+    return lines
+
+
+class CachedReader:
+    """Reader that crops its input to ``band`` and serves repeated frames from ``cache``.
+
+    ``cache`` maps (name, frame index, band) to (output, seconds) and is
+    shared by all grid points. ``stats`` counts this reader's calls and the
+    OCR seconds they cost when first run.
+    """
+
+    def __init__(self, reader, name, cache, band=FULL_BAND):
+        self.reader = reader
+        self.name = name
+        self.cache = cache
+        self.band = band
+        self.frame_index = None
+        self.stats = {'ocr_calls': 0, 'ocr_seconds': 0.0, 'cache_hits': 0}
+
+    def seek_frame(self, frame_index):
+        """Called by process_video before the reader is used on a frame."""
+        self.frame_index = frame_index
+        if hasattr(self.reader, 'seek_frame'):
+            self.reader.seek_frame(frame_index)
+
+    def readtext(self, image, *args, **kwargs):
+        key = (self.name, self.frame_index, self.band)
+        entry = self.cache.get(key)
+        if entry is None:
+            if self.band < FULL_BAND:
+                image = image[image.shape[0] - max(1, round(image.shape[0] * self.band / FULL_BAND)):]
+            start = time.perf_counter()
+            results = self.reader.readtext(image, *args, **kwargs)
+            entry = self.cache[key] = (results, time.perf_counter() - start)
+        else:
+            self.stats['cache_hits'] += 1
+        self.stats['ocr_calls'] += 1
+        self.stats['ocr_seconds'] += entry[1]
+        return entry[0]
+
+
+def settings_grid(frame_skips, thresholds, bands=(FULL_BAND,), presence_fnrs=(None,)):
+    """Every combination of the swept settings."""
+    return [
+        {'frame_skip': skip, 'confidence_threshold': threshold, 'band': band, 'presence_fnr': fnr}
+        for skip, threshold, band, fnr in itertools.product(frame_skips, thresholds, bands, presence_fnrs)
+    ]
+
+
+def run_point(video_path, truth_lines, settings, readers, cache, decoder='opencv', verbose=False):
+    """Run one grid point and return its settings with scores and costs."""
+    import video_ocr
+
+    ch_reader = CachedReader(readers[0], 'ch_tra', cache, settings['band'])
+    ja_reader = CachedReader(readers[1], 'ja', cache, settings['band'])
+    fnr = settings['presence_fnr']
+    frames_dir = tempfile.mkdtemp(prefix='autotune_')
+    detections = []
+    start = time.perf_counter()
+    try:
+        with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+            for result in video_ocr.process_video(
+                video_path,
+                frame_skip=settings['frame_skip'],
+                confidence_threshold=settings['confidence_threshold'],
+                readers=(ch_reader, ja_reader),
+                decoder=decoder,
+                use_subtitle_streams=False,
+                frames_dir=frames_dir,
+                subtitle_detector=SubtitleDetector.load(fnr) if fnr is not None else None
+            ):
+                best = max(result['texts'], key=lambda x: x['confidence'])
+                detections.append((result['timestamp'], best['text']))
+    finally:
+        shutil.rmtree(frames_dir, ignore_errors=True)
+
+    point = dict(settings)
+    point.update(score_detections(detections, truth_lines))
+    for key in ('ocr_calls', 'ocr_seconds', 'cache_hits'):
+        point[key] = ch_reader.stats[key] + ja_reader.stats[key]
+    point['elapsed_seconds'] = time.perf_counter() - start
+    return point
+
+
+def sweep(video_path, truth_lines, grid, readers, decoder='opencv', verbose=False):
+    """Run every grid point on ``video_path`` with one OCR cache."""
+    cache = {}
+    points = []
+    for index, settings in enumerate(grid, 1):
+        point = run_point(video_path, truth_lines, settings, readers, cache, decoder, verbose)
+        print(f"[{index}/{len(grid)}] {describe(point)}")
+        points.append(point)
+    print(f"OCR calls: {sum(p['ocr_calls'] for p in points)} requested, {len(cache)} run")
+    return points
+
+
+def dominates(a, b):
+    """True if ``a`` is at least as good as ``b`` on every objective and better on one."""
+    better = False
+    for metric, higher in OBJECTIVES:
+        x, y = (a[metric], b[metric]) if higher else (b[metric], a[metric])
+        if x < y:
+            return False
+        better = better or x > y
+    return better
+
+
+def pareto_front(points):
+    """Points no other point dominates, cheapest first."""
+    front = [p for p in points if not any(dominates(q, p) for q in points)]
+    return sorted(front, key=lambda p: (p['ocr_seconds'], -p['recall']))
+
+
+def cheapest(points, target_recall):
+    """Lowest-OCR-cost point with recall >= ``target_recall``, or None."""
+    eligible = [p for p in points if p['recall'] >= target_recall]
+    return min(eligible, key=lambda p: (p['ocr_seconds'], p['start_error'])) if eligible else None
+
+
+def describe(point):
+    """One-line summary of a grid point."""
+    fnr = 'off' if point['presence_fnr'] is None else point['presence_fnr']
+    return (f"skip={point['frame_skip']:<3} threshold={point['confidence_threshold']:<4} "
+            f"band={point['band']:<4} presence_fnr={fnr:<5} recall={point['recall']:.3f} "
+            f"precision={point['precision']:.3f} start_error={point['start_error']:.2f}s "
+            f"ocr={point['ocr_seconds']:.1f}s ({point['ocr_calls']} calls)")
+
+
+def _number_list(value, cast):
+    return [None if item.strip().lower() == 'none' else cast(item) for item in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep OCR settings against a ground-truth table')
+    parser.add_argument('video', help='Clip to run the sweep on')
+    parser.add_argument('--table', default=DEFAULT_TABLE, help='Ground-truth table (tables/*.csv format)')
+    parser.add_argument('--episode', required=True, help='Episode of the table the clip comes from')
+    parser.add_argument('--clip-start', type=float, default=0.0, help='Episode time (seconds) the clip starts at')
+    parser.add_argument('--frame-skips', default='4,8,12,16', help='Comma separated frame_skip values')
+    parser.add_argument('--thresholds', default='0.4,0.5,0.6,0.7', help='Comma separated confidence thresholds')
+    parser.add_argument('--bands', default=str(FULL_BAND), help=f'Comma separated OCR band heights (fraction of the frame, <= {FULL_BAND})')
+    parser.add_argument('--presence-fnr', default='none', help="Comma separated subtitle detector rates ('none' = off)")
+    parser.add_argument('--target-recall', type=float, default=0.95, help='Recall the recommended setting must reach')
+    parser.add_argument('--ocr-backend', default='easyocr', choices=sorted(BACKENDS), help='OCR backend')
+    parser.add_argument('--decoder', default='opencv', choices=('opencv', 'ffmpeg'), help='Decode path')
+    parser.add_argument('--output', default=None, help='Write every grid point to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help='Show process_video output')
+    args = parser.parse_args()
+
+    bands = _number_list(args.bands, float)
+    if any(band is None or not 0 < band <= FULL_BAND for band in bands):
+        parser.error(f"Bands must be in (0, {FULL_BAND}]")
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        parser.error(f"Could not open video file: {args.video}")
+    duration = cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    truth_lines = load_truth(args.table, args.episode, args.clip_start, args.clip_start + duration)
+    if not truth_lines:
+        parser.error(f"No lines of episode {args.episode} in {args.table} within the clip")
+    print(f"{len(truth_lines)} ground-truth lines in {duration:.0f}s of video")
+
+    grid = settings_grid(
+        _number_list(args.frame_skips, int),
+        _number_list(args.thresholds, float),
+        bands,
+        _number_list(args.presence_fnr, float)
+    )
+
+    from video_ocr import init_readers
+
+    readers = init_readers(args.ocr_backend)
+    points = sweep(args.video, truth_lines, grid, readers, args.decoder, args.verbose)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(points, f, indent=2)
+
+    print("\nPareto front (recall vs. start error vs. OCR seconds):")
+    for point in pareto_front(points):
+        print(f"  {describe(point)}")
+    best = cheapest(points, args.target_recall)
+    if best is None:
+        print(f"\nNo setting reaches recall {args.target_recall}")
+    else:
+        print(f"\nCheapest with recall >= {args.target_recall}:\n  {describe(best)}")
+
+
+if __name__ == '__main__':
+    main()
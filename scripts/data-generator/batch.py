@@ -0,0 +1,428 @@
+"""Batch OCR of local episodes into the tables/*.csv files the server loads.
+
+``tables/schema.yml`` lists the collections. Each one has a ``table_file``,
+a ``content_dir`` and a ``video_format.naming_pattern`` such as
+``{episode}.mp4``. Every matching video is OCR'd into its own episode CSV
+under ``batch_work/<table>/``, with episodes spread over a process pool.
+Those episodes' rows are then replaced in the collection's table, in
+episode order; rows of episodes batch did not produce are kept.
+
+Episodes whose source hash and settings match the last run are skipped:
+
+    python batch.py
+    python batch.py --collections MyGO --workers 4 --frame-skip 8
+    python batch.py --dry-run
+
+Rows follow the table format: ``HH:MM:SS,mmm`` times, integer frames and
+the real episode number. IDs are ``generate_frame_id`` over the table name
+plus episode, start frame, start time and text, so they stay the same
+across runs.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+
+import yaml
+
+from id_generator import generate_frame_id
+from line_merge import merge_near_duplicates
+from ngram_index import build_index, read_rows
+from ocr_backends import BACKENDS
+from result_store import ResultStore
+from result_writer import CSV_HEADER, format_row
+from subtitle_streams import format_table_time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCHEMA_PATH = os.path.join(REPO_ROOT, 'tables', 'schema.yml')
+WORK_DIR = 'batch_work'
+MANIFEST = 'manifest.json'
+# Bytes hashed from the start, end and evenly spaced points of a video
+HASH_BLOCK = 1 << 16
+HASH_BLOCKS = 16
+
+
+class Collection:
+    """One entry of ``tables/schema.yml``, with paths resolved against the repository root."""
+
+    def __init__(self, name, config, root=REPO_ROOT):
+        self.name = name
+        self.table_file = os.path.join(root, config['table_file'])
+        self.content_dir = os.path.join(root, config['content_dir'])
+        video_format = config.get('video_format', {})
+        self.naming_pattern = video_format.get('naming_pattern', '{episode}.' + video_format.get('extension', 'mp4'))
+        # IDs and work files are keyed on the table name ('mygo', 'ave')
+        self.key = os.path.splitext(os.path.basename(self.table_file))[0]
+
+    def __repr__(self):
+        return f'Collection({self.name!r}, {self.naming_pattern!r} in {self.content_dir})'
+
+
+def load_schema(path=SCHEMA_PATH):
+    """Collections of a schema file, in file order."""
+    with open(path, encoding='utf-8') as f:
+        schema = yaml.safe_load(f)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+    return [Collection(name, config, root) for name, config in (schema.get('collections') or {}).items()]
+
+
+def pattern_regex(naming_pattern):
+    """Regex for a naming pattern; ``{episode}`` captures the episode number."""
+    parts = re.split(r'(\{episode\})', naming_pattern)
+    if '{episode}' not in parts:
+        raise ValueError(f"Naming pattern has no {{episode}}: {naming_pattern}")
+    return re.compile(''.join(r'(?P<episode>\d+)' if part == '{episode}' else re.escape(part) for part in parts) + '$')
+
+
+def find_episodes(content_dir, naming_pattern):
+    """Sorted (episode, path) pairs of the videos under ``content_dir`` matching the pattern."""
+    regex = pattern_regex(naming_pattern)
+    episodes = {}
+    for dirpath, _, filenames in os.walk(content_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            match = regex.match(os.path.relpath(path, content_dir).replace(os.sep, '/'))
+            if match:
+                episode = int(match.group('episode'))
+                if episode in episodes:
+                    raise ValueError(f"Episode {episode} matches both {episodes[episode]} and {path}")
+                episodes[episode] = path
+    return sorted(episodes.items())
+
+
+def source_hash(path):
+    """Hash of a video's size and sampled blocks of its contents.
+
+    Reading the whole file would cost as much as decoding it; a re-encode
+    or a different download changes the sampled bytes (or the size) anyway.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= HASH_BLOCK * HASH_BLOCKS:
+            digest.update(f.read())
+        else:
+            for i in range(HASH_BLOCKS):
+                f.seek((size - HASH_BLOCK) * i // (HASH_BLOCKS - 1))
+                digest.update(f.read(HASH_BLOCK))
+    return digest.hexdigest()
+
+
+def episode_rows(store, collection, episode, fps, frame_skip=1):
+    """Table rows for one episode's results.
+
+    Spans end where the next line starts. A span with nothing after it
+    (or a one-frame cue) still gets at least one sample interval, because
+    the server rejects rows whose end frame is not after their start.
+    """
+    rows = []
+    interval = max(1, frame_skip)
+    for text_id, confidence, start_frame, start_time, end_frame, end_time in zip(*store.span_arrays()):
+        text = store.strings[text_id]
+        start_frame, end_frame = int(start_frame), int(end_frame)
+        start_time, end_time = float(start_time), float(end_time)
+        if end_frame <= start_frame:
+            end_frame = start_frame + interval
+            end_time = max(end_time, start_time + interval / fps)
+        rows.append({
+            'id': generate_frame_id(f'{collection}_{episode}', start_frame, start_time, text),
+            'score': float(confidence),
+            'text': text,
+            'episode': episode,
+            'start_time': format_table_time(start_time),
+            'end_time': format_table_time(end_time),
+            'start_frame': start_frame,
+            'end_frame': end_frame
+        })
+    return rows
+
+
+def write_table(path, rows):
+    """Atomically write a CSV with the table header."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write((','.join(CSV_HEADER) + '\r\n').encode('utf-8'))
+        f.writelines(format_row(row) for row in rows)
+    os.replace(tmp_path, path)
+
+
+def read_table(path):
+    """Data lines of a CSV written by ``write_table`` (without the header)."""
+    with open(path, 'rb') as f:
+        return f.read().split(b'\r\n', 1)[1]
+
+
+class Manifest:
+    """Per-collection record of processed episodes: source hash, settings and row count."""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, MANIFEST)
+        self.episodes = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self.episodes = json.load(f).get('episodes', {})
+
+    def is_current(self, episode, digest, settings, csv_path):
+        entry = self.episodes.get(str(episode))
+        return bool(entry) and entry['source_hash'] == digest and entry['settings'] == settings and os.path.exists(csv_path)
+
+    def record(self, episode, **entry):
+        self.episodes[str(episode)] = entry
+        self.save()
+
+    def save(self):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'episodes': self.episodes}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+# Worker process state: readers are loaded once per process by the initializer
+_worker_readers = None
+
+
+def _init_worker(ocr_backend, plan_data=None):
+    global _worker_readers
+    from cpu_planner import ExecutionPlan, apply_plan
+    from video_ocr import init_readers
+
+    if plan_data:
+        apply_plan(ExecutionPlan.from_dict(plan_data))
+    _worker_readers = init_readers(ocr_backend)
+
+
+def process_episode(task, readers=None):
+    """OCR one episode into its CSV; returns (collection key, episode, rows, seconds)."""
+    import cv2
+    from video_ocr import process_video
+    from subtitle_detector import SubtitleDetector
+
+    key, episode, video_path, csv_path, frames_dir, settings = task
+    start = time.perf_counter()
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+
+    frame_store = None
+    if settings.get('frame_store') == 'pack':
+        # One pack per episode: contents/<collection>/<episode>.pack
+        from frame_pack import FramePackWriter, pack_path_for
+        frame_store = FramePackWriter(pack_path_for(frames_dir))
+    else:
+        os.makedirs(frames_dir, exist_ok=True)
+    results = merge_near_duplicates(process_video(
+        video_path,
+        frame_skip=settings['frame_skip'],
+        confidence_threshold=settings['confidence_threshold'],
+        readers=readers or _worker_readers,
+        decoder=settings['decoder'],
+        frames_dir=frames_dir,
+        subtitle_detector=SubtitleDetector.load(settings['presence_fnr']) if settings.get('presence_fnr') is not None else None,
+        frame_store=frame_store
+    ))
+    try:
+        rows = episode_rows(ResultStore.from_results(results), key, episode, fps, settings['frame_skip'])
+    finally:
+        if frame_store is not None:
+            frame_store.close()
+    write_table(csv_path, rows)
+    return key, episode, len(rows), time.perf_counter() - start
+
+
+def _process_episode_job(task):
+    return process_episode(task)
+
+
+def plan_collection(collection, settings, force=False):
+    """Episodes of a collection, split into (tasks to run, episodes that are current)."""
+    directory = os.path.join(WORK_DIR, collection.key)
+    os.makedirs(directory, exist_ok=True)
+    manifest = Manifest(directory)
+    tasks, current = [], []
+    for episode, video_path in find_episodes(collection.content_dir, collection.naming_pattern):
+        csv_path = os.path.join(directory, f'ep_{episode:03d}.csv')
+        digest = source_hash(video_path)
+        if not force and manifest.is_current(episode, digest, settings, csv_path):
+            current.append(episode)
+            continue
+        # Frames next to the videos: contents/<collection>/<episode>/frame_*.jpg, as phash_index expects
+        frames_dir = os.path.join(collection.content_dir, str(episode))
+        tasks.append(((collection.key, episode, os.path.abspath(video_path), csv_path, frames_dir, settings), digest))
+    return manifest, tasks, current
+
+
+def table_episodes(path):
+    """Records of an existing table, byte for byte, grouped by episode in table order."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as f:
+        data = f.read()
+    header = next(csv.reader([data.split(b'\n', 1)[0].decode('utf-8-sig').rstrip('\r')]))
+    if header != CSV_HEADER:
+        raise ValueError(f"{path} has columns {header}, expected {CSV_HEADER}")
+    rows, end = read_rows(data, column='episode')
+    offsets = [offset for offset, _ in rows] + [end]
+    episodes = {}
+    for (offset, episode), next_offset in zip(rows, offsets[1:]):
+        record = data[offset:next_offset]
+        if not record.endswith(b'\n'):
+            record += b'\r\n'
+        episodes.setdefault(int(episode), []).append(record)
+    return episodes
+
+
+def rebuild_table(collection, manifest):
+    """Replace the rows of the episodes batch produced in the collection's table, and index it.
+
+    Episodes batch never wrote (e.g. curated rows checked in with the
+    table) are kept as they are; an episode batch wrote whose video is gone
+    is dropped. Rows stay in episode order. Returns the table's row count.
+    """
+    directory = os.path.join(WORK_DIR, collection.key)
+    episodes = {int(episode) for episode in manifest.episodes}
+    present = {episode for episode, _ in find_episodes(collection.content_dir, collection.naming_pattern)}
+    removed = episodes - present
+    for episode in removed:
+        # The video is gone; so are the rows batch wrote for it
+        del manifest.episodes[str(episode)]
+    manifest.save()
+    if not episodes:
+        # Nothing processed here (yet); keep whatever table is checked in
+        return 0
+
+    records = table_episodes(collection.table_file)
+    for episode in removed:
+        records.pop(episode, None)
+    for episode in episodes & present:
+        records[episode] = [read_table(os.path.join(directory, f'ep_{episode:03d}.csv'))]
+
+    tmp_path = f'{collection.table_file}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write((','.join(CSV_HEADER) + '\r\n').encode('utf-8'))
+        for episode in sorted(records):
+            f.writelines(records[episode])
+    os.replace(tmp_path, collection.table_file)
+    # Prebuilt postings next to the table, so the server need not re-tokenize it
+    build_index(collection.table_file)
+    kept = sum(len(records[episode]) for episode in records if episode not in episodes)
+    return kept + sum(manifest.episodes[str(episode)]['rows'] for episode in episodes & present)
+
+
+def run_batch(collections, workers=None, frame_skip=8, confidence_threshold=0.6, ocr_backend='easyocr',
+              decoder='opencv', presence_fnr=None, force=False, dry_run=False, readers=None, frame_store='files'):
+    """Process every stale episode of ``collections`` and rebuild their tables.
+
+    ``workers`` defaults to the CPU planner's worker count (one process on
+    GPU). With ``readers`` (or a single worker) episodes run in this
+    process, one after another. ``presence_fnr`` enables the subtitle
+    detector before OCR at that false-negative rate. ``frame_store='pack'``
+    appends each episode's frames to one ``frame_pack`` file.
+    """
+    settings = {
+        'frame_skip': frame_skip,
+        'confidence_threshold': confidence_threshold,
+        'ocr_backend': ocr_backend,
+        'decoder': decoder,
+    }
+    if presence_fnr is not None:
+        settings['presence_fnr'] = presence_fnr
+    if frame_store != 'files':
+        settings['frame_store'] = frame_store
+    plans = {}
+    pending = []
+    for collection in collections:
+        manifest, tasks, current = plan_collection(collection, settings, force)
+        plans[collection.key] = (collection, manifest)
+        print(f"{collection.name}: {len(tasks)} episode(s) to process, {len(current)} unchanged")
+        pending += tasks
+    if dry_run:
+        for (key, episode, video_path, *_), _ in pending:
+            print(f"  {key} episode {episode}: {video_path}")
+        return {}
+
+    plan = None
+    if workers is None and readers is None:
+        import torch
+        from cpu_planner import load_plan
+
+        if torch.cuda.is_available():
+            workers = 1
+        else:
+            # Whole episodes per process: each worker gets the planner's per-worker thread budget
+            plan = load_plan()
+            workers = plan.workers
+    workers = max(1, min(workers or 1, len(pending) or 1))
+
+    digests = {(task[0], task[1]): digest for task, digest in pending}
+
+    def finished(key, episode, rows, seconds):
+        plans[key][1].record(episode, source_hash=digests[(key, episode)], settings=settings, rows=rows)
+        print(f"{plans[key][0].name} episode {episode}: {rows} rows in {seconds:.1f}s")
+
+    if pending and (readers is not None or workers == 1):
+        if readers is None:
+            _init_worker(ocr_backend, plan.to_dict() if plan else None)
+        for task, _ in pending:
+            finished(*process_episode(task, readers))
+    elif pending:
+        context = multiprocessing.get_context('spawn')
+        initargs = (ocr_backend, plan.to_dict() if plan else None)
+        with context.Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            # Longest episodes first keeps the pool busy until the end
+            tasks = sorted((task for task, _ in pending), key=lambda task: -os.path.getsize(task[2]))
+            for result in pool.imap_unordered(_process_episode_job, tasks):
+                finished(*result)
+
+    totals = {}
+    for collection, manifest in plans.values():
+        totals[collection.name] = rebuild_table(collection, manifest)
+        if manifest.episodes:
+            print(f"Wrote {totals[collection.name]} rows to {collection.table_file}")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR local episodes into tables/*.csv')
+    parser.add_argument('--schema', default=SCHEMA_PATH, help='Schema file listing the collections')
+    parser.add_argument('--collections', nargs='+', default=None, help='Only these collections (schema names)')
+    parser.add_argument('--workers', type=int, default=None, help='Episode processes (default: CPU planner)')
+    parser.add_argument('--frame-skip', type=int, default=8, help='Process every n-th frame')
+    parser.add_argument('--threshold', type=float, default=0.6, help='Confidence threshold')
+    parser.add_argument('--ocr-backend', default='easyocr', choices=sorted(BACKENDS), help='OCR backend')
+    parser.add_argument('--decoder', default='opencv', choices=('opencv', 'ffmpeg'), help='Decode path')
+    parser.add_argument('--presence-fnr', type=float, default=None,
+                        help='Skip OCR on frames the subtitle detector rejects, at this false-negative rate (e.g. 0.01)')
+    parser.add_argument('--frame-store', default='files', choices=('files', 'pack'),
+                        help="Save frames as loose files or in one pack per episode (see frame_pack.py)")
+    parser.add_argument('--force', action='store_true', help='Reprocess unchanged episodes too')
+    parser.add_argument('--dry-run', action='store_true', help='Only list the episodes that would run')
+    args = parser.parse_args()
+
+    collections = load_schema(args.schema)
+    if args.collections:
+        unknown = set(args.collections) - {collection.name for collection in collections}
+        if unknown:
+            parser.error(f"unknown collection(s): {', '.join(sorted(unknown))}")
+        collections = [collection for collection in collections if collection.name in args.collections]
+
+    run_batch(
+        collections,
+        workers=args.workers,
+        frame_skip=args.frame_skip,
+        confidence_threshold=args.threshold,
+        ocr_backend=args.ocr_backend,
+        decoder=args.decoder,
+        presence_fnr=args.presence_fnr,
+        force=args.force,
+        dry_run=args.dry_run,
+        frame_store=args.frame_store
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Compare the cv2.VideoCapture and ffmpeg rawvideo decode paths.
+
+Usage:
+    python -m benchmarks.bench_decode --video downloads/episode.mp4 --frame-skip 8
+    python -m benchmarks.bench_decode --lines 30 --width 1920 --height 1080
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from ffmpeg_decode import FFmpegFrameReader
+from video_ocr import crop_subtitle_region, iter_sampled_frames
+
+
+def bench_opencv_full(video_path, frame_skip):
+    """The original loop: read and convert every frame, crop the sampled ones."""
+    cap = cv2.VideoCapture(video_path)
+    frame_count = sampled = moved = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_count % frame_skip == 0:
+            region = crop_subtitle_region(frame)
+            sampled += 1
+            moved += frame.nbytes
+            region.sum()
+        frame_count += 1
+    cap.release()
+    return sampled, moved
+
+
+def bench_opencv_grab(video_path, frame_skip):
+    """VideoCapture with grab() for skipped frames (the current opencv decoder)."""
+    cap = cv2.VideoCapture(video_path)
+    sampled = moved = 0
+    for _, frame in iter_sampled_frames(cap, frame_skip):
+        region = crop_subtitle_region(frame)
+        sampled += 1
+        moved += frame.nbytes
+        region.sum()
+    cap.release()
+    return sampled, moved
+
+
+def bench_ffmpeg(video_path, frame_skip, **reader_kwargs):
+    """ffmpeg rawvideo pipe with in-decoder select/crop/scale/gray."""
+    sampled = moved = 0
+    for _, _, region in FFmpegFrameReader(video_path, frame_skip=frame_skip, **reader_kwargs):
+        sampled += 1
+        moved += region.nbytes
+        region.sum()
+    return sampled, moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark decode backends')
+    parser.add_argument('--video', default=None, help='Video to decode (default: render a synthetic episode)')
+    parser.add_argument('--frame-skip', type=int, default=8, help='Frame skip rate')
+    parser.add_argument('--lines', type=int, default=30, help='Subtitle lines in the synthetic episode')
+    parser.add_argument('--width', type=int, default=1920, help='Synthetic episode width')
+    parser.add_argument('--height', type=int, default=1080, help='Synthetic episode height')
+    parser.add_argument('--font', default=None, help='Path to a CJK font')
+    parser.add_argument('--scale-width', type=int, default=960, help='Width for the scaled ffmpeg variant')
+    parser.add_argument('--output', default=None, help='Optional JSON result path')
+    args = parser.parse_args()
+
+    video_path = args.video
+    if video_path is None:
+        from benchmarks.synthetic import render_suite
+        suite = render_suite(
+            os.path.join(BENCH_DIR, 'work', 'decode'), episodes=1, lines_per_episode=args.lines,
+            font_path=args.font, width=args.width, height=args.height
+        )
+        video_path = suite[0]['video_path']
+
+    total_frames = int(cv2.VideoCapture(video_path).get(cv2.CAP_PROP_FRAME_COUNT))
+    variants = [
+        ('opencv_full', lambda: bench_opencv_full(video_path, args.frame_skip)),
+        ('opencv_grab', lambda: bench_opencv_grab(video_path, args.frame_skip)),
+        ('ffmpeg_gray', lambda: bench_ffmpeg(video_path, args.frame_skip)),
+        ('ffmpeg_bgr', lambda: bench_ffmpeg(video_path, args.frame_skip, gray=False)),
+        ('ffmpeg_gray_scaled', lambda: bench_ffmpeg(video_path, args.frame_skip, scale_width=args.scale_width)),
+    ]
+
+    results = []
+    print(f"\n{'variant':20s} {'frames/s':>10s} {'sampled':>8s} {'MB moved':>10s}")
+    for name, run in variants:
+        start = time.perf_counter()
+        sampled, moved = run()
+        elapsed = time.perf_counter() - start
+        results.append({
+            'variant': name,
+            'elapsed_seconds': elapsed,
+            'frames_per_second': total_frames / elapsed,
+            'sampled_frames': sampled,
+            'bytes_moved': moved,
+        })
+        print(f"{name:20s} {total_frames / elapsed:10.1f} {sampled:8d} {moved / 1024**2:10.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'video': video_path, 'frame_skip': args.frame_skip, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Load and query time of a table through its prebuilt .ngram index vs tokenizing the CSV.
+
+The table is tables/*.csv concatenated ``--copies`` times (a stand-in for
+more seasons). Every query's index result is checked against a scan of
+the CSV, so the run also validates the format.
+
+Usage:
+    python -m benchmarks.bench_ngram_index --copies 20
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from ngram_index import CJK_CHARS, build_index, index_path_for, normalize, open_index, read_rows, terms
+from result_writer import CSV_HEADER
+
+TABLES_DIR = os.path.join(os.path.dirname(BENCH_DIR), '..', '..', 'tables')
+
+
+def write_table(path, copies):
+    """Concatenate the repository's tables ``copies`` times; returns the row texts."""
+    rows = []
+    for table in sorted(glob.glob(os.path.join(TABLES_DIR, '*.csv'))):
+        with open(table, encoding='utf-8', newline='') as f:
+            rows.extend(csv.DictReader(f))
+    texts = []
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_HEADER, extrasaction='ignore')
+        writer.writeheader()
+        for _ in range(copies):
+            writer.writerows(rows)
+            texts.extend(row['text'] for row in rows)
+    return texts
+
+
+def tokenize_csv(path):
+    """What a loader does without the index: parse, normalize and tokenize every row into postings."""
+    with open(path, 'rb') as f:
+        rows, _ = read_rows(f.read())
+    postings = {}
+    for row, (_, text) in enumerate(rows):
+        for term in dict.fromkeys(terms(normalize(text))):
+            postings.setdefault(term, []).append(row)
+    return postings
+
+
+def timed(function, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        times.append(time.perf_counter() - start)
+    return value, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the prebuilt CJK n-gram index')
+    parser.add_argument('--copies', type=int, default=20, help='Times the tables are repeated')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        table = os.path.join(tmp, 'table.csv')
+        texts = write_table(table, args.copies)
+        _, build_s = timed(lambda: build_index(table), repeat=1)
+        _, tokenize_s = timed(lambda: tokenize_csv(table))
+        index, open_s = timed(lambda: open_index(table))
+
+        # Runs of CJK text, where the index must find exactly what a substring scan finds
+        rng = random.Random(0)
+        runs = [run for text in texts for run in re.findall(f'[{CJK_CHARS}]+', normalize(text))]
+        queries = []
+        for run in rng.sample(runs, min(args.queries, len(runs))):
+            length = rng.randint(1, min(6, len(run)))
+            offset = rng.randrange(len(run) - length + 1)
+            queries.append(run[offset:offset + length])
+
+        index_times, scan_times, mismatches = [], [], []
+        normalized = [normalize(text) for text in texts]
+        for query in queries:
+            start = time.perf_counter()
+            found = index.search(query)
+            index_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            expected = [row for row, text in enumerate(normalized) if query in text]
+            scan_times.append(time.perf_counter() - start)
+            if found != expected:
+                mismatches.append(query)
+
+        report = {
+            'rows': len(texts),
+            'csv_mb': os.path.getsize(table) / 2**20,
+            'index_mb': os.path.getsize(index_path_for(table)) / 2**20,
+            'build_s': build_s,
+            'tokenize_csv_s': tokenize_s,
+            'open_index_s': open_s,
+            'query_index_ms': statistics.median(index_times) * 1000,
+            'query_scan_ms': statistics.median(scan_times) * 1000,
+            'mismatched_queries': mismatches,
+        }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""Throughput and accuracy benchmark for the OCR pipelines on synthetic episodes.
+
+Usage:
+    python -m benchmarks.bench_pipeline --episodes 2 --lines-per-episode 20
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/abc1234.json
+    python -m benchmarks.bench_pipeline --pipelines video_ocr --backends easyocr,onnx
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from difflib import SequenceMatcher
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_GENERATOR_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, DATA_GENERATOR_DIR)
+
+from line_merge import normalize_text
+
+PIPELINES = ('video_ocr', 'generator')
+
+
+class CountingReader:
+    """Wrap an OCR reader and count/time its readtext calls."""
+
+    def __init__(self, reader, stats):
+        self._reader = reader
+        self._stats = stats
+
+    def readtext(self, image, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._reader.readtext(image, *args, **kwargs)
+        finally:
+            self._stats['ocr_calls'] += 1
+            self._stats['ocr_seconds'] += time.perf_counter() - start
+
+    def __getattr__(self, name):
+        return getattr(self._reader, name)
+
+
+def score_detections(detections, truth_lines, tolerance=0.5, min_similarity=0.8):
+    """Compute line-level recall and precision.
+
+    A detection matches a ground-truth line when its timestamp falls inside
+    the line's span (plus tolerance) and the normalized texts are similar.
+    ``start_error`` is the mean distance in seconds between a matched line's
+    start and its first matching detection.
+    """
+    # Collapse consecutive detections of the same line
+    lines = []
+    for timestamp, text in detections:
+        if lines and normalize_text(lines[-1][1]) == normalize_text(text):
+            continue
+        lines.append((timestamp, text))
+
+    matched_truth = {}
+    matched_detections = 0
+    for timestamp, text in lines:
+        norm = normalize_text(text)
+        best_index, best_ratio = None, 0.0
+        for i, line in enumerate(truth_lines):
+            if not (line['start_time'] - tolerance <= timestamp <= line['end_time'] + tolerance):
+                continue
+            ratio = SequenceMatcher(None, norm, normalize_text(line['text'])).ratio()
+            if ratio > best_ratio:
+                best_index, best_ratio = i, ratio
+        if best_index is not None and best_ratio >= min_similarity:
+            matched_detections += 1
+            matched_truth.setdefault(best_index, abs(timestamp - truth_lines[best_index]['start_time']))
+
+    return {
+        'detected_lines': len(lines),
+        'truth_lines': len(truth_lines),
+        'recall': len(matched_truth) / len(truth_lines) if truth_lines else 0.0,
+        'precision': matched_detections / len(lines) if lines else 0.0,
+        'start_error': sum(matched_truth.values()) / len(matched_truth) if matched_truth else 0.0,
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of the current process."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_video_ocr(truth, frame_skip, confidence_threshold, backend):
+    """Run video_ocr.process_video and return detections and stats."""
+    import video_ocr
+
+    stats = {'ocr_calls': 0, 'ocr_seconds': 0.0, 'init_seconds': 0.0,
+             'frame_skip': frame_skip, 'confidence_threshold': confidence_threshold}
+    original_init = video_ocr.init_readers
+
+    def counting_init(ocr_backend='easyocr'):
+        start = time.perf_counter()
+        readers = original_init(ocr_backend)
+        stats['init_seconds'] += time.perf_counter() - start
+        return tuple(CountingReader(reader, stats) for reader in readers)
+
+    video_ocr.init_readers = counting_init
+    os.makedirs('frames', exist_ok=True)
+    detections = []
+    start = time.perf_counter()
+    try:
+        for result in video_ocr.process_video(
+            truth['video_path'],
+            frame_skip=frame_skip,
+            confidence_threshold=confidence_threshold,
+            ocr_backend=backend
+        ):
+            best = max(result['texts'], key=lambda x: x['confidence'])
+            detections.append((result['timestamp'], best['text']))
+    finally:
+        video_ocr.init_readers = original_init
+    stats['elapsed_seconds'] = time.perf_counter() - start
+    return detections, stats
+
+
+def run_generator(truth, frame_skip, confidence_threshold, backend):
+    """Run ImageBattleGenerator.process_video and return detections and stats.
+
+    The generator OCRs every frame and keeps any text it reads, so
+    ``frame_skip`` and ``confidence_threshold`` do not apply; the stats
+    record the settings it actually ran with.
+    """
+    from main import ImageBattleGenerator
+
+    stats = {'ocr_calls': 0, 'ocr_seconds': 0.0, 'frame_skip': 1, 'confidence_threshold': None}
+    start = time.perf_counter()
+    generator = ImageBattleGenerator(output_dir='contents', ocr_backend=backend)
+    stats['init_seconds'] = time.perf_counter() - start
+    generator.reader = CountingReader(generator.reader, stats)
+
+    start = time.perf_counter()
+    frames_data = generator.process_video(truth['video_path'], 'synthetic')
+    stats['elapsed_seconds'] = time.perf_counter() - start + stats['init_seconds']
+
+    detections = []
+    for item in frames_data:
+        frame_number = int(os.path.basename(item['image_path']).split('_')[1].split('.')[0])
+        detections.append((frame_number / truth['fps'], item['text']))
+    return detections, stats
+
+
+def run_one(pipeline, backend, truth, workdir, frame_skip, confidence_threshold):
+    """Benchmark one pipeline on one episode. Runs inside a fresh process."""
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    runner = run_video_ocr if pipeline == 'video_ocr' else run_generator
+    detections, stats = runner(truth, frame_skip, confidence_threshold, backend)
+
+    processing_seconds = max(stats['elapsed_seconds'] - stats['init_seconds'], 1e-9)
+    metrics = {
+        'pipeline': pipeline,
+        'backend': backend,
+        'frame_skip': stats['frame_skip'],
+        'confidence_threshold': stats['confidence_threshold'],
+        'video': os.path.basename(truth['video_path']),
+        'total_frames': truth['total_frames'],
+        'duration_seconds': truth['duration'],
+        'elapsed_seconds': stats['elapsed_seconds'],
+        'init_seconds': stats['init_seconds'],
+        'ocr_seconds': stats['ocr_seconds'],
+        'ocr_calls': stats['ocr_calls'],
+        'frames_per_second': truth['total_frames'] / processing_seconds,
+        'ocr_calls_per_video_minute': stats['ocr_calls'] / (truth['duration'] / 60.0),
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+    metrics.update(score_detections(detections, truth['lines']))
+    return metrics
+
+
+def run_isolated(*args):
+    """Run a benchmark in a spawned process so peak RSS is not shared between runs."""
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        return pool.apply(run_one, args)
+
+
+def summarize(runs):
+    """Aggregate per-episode metrics for each pipeline and OCR backend."""
+    summary = {}
+    for pipeline, backend in sorted({(run['pipeline'], run['backend']) for run in runs}):
+        group = [run for run in runs if (run['pipeline'], run['backend']) == (pipeline, backend)]
+        frames = sum(run['total_frames'] for run in group)
+        seconds = sum(run['elapsed_seconds'] - run['init_seconds'] for run in group)
+        minutes = sum(run['duration_seconds'] for run in group) / 60.0
+        truth_lines = sum(run['truth_lines'] for run in group)
+        detected_lines = sum(run['detected_lines'] for run in group)
+        summary[f'{pipeline}/{backend}'] = {
+            'frames_per_second': frames / seconds if seconds else 0.0,
+            'ocr_calls_per_video_minute': sum(run['ocr_calls'] for run in group) / minutes,
+            'peak_rss_bytes': max(run['peak_rss_bytes'] for run in group),
+            'recall': sum(run['recall'] * run['truth_lines'] for run in group) / truth_lines if truth_lines else 0.0,
+            'precision': sum(run['precision'] * run['detected_lines'] for run in group) / detected_lines if detected_lines else 0.0,
+        }
+    return summary
+
+
+def git_revision():
+    """Short hash of the current commit, or 'unknown' outside a git checkout."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, cwd=BENCH_DIR, check=True
+        ).stdout.strip()
+    except Exception:
+        return 'unknown'
+
+
+def print_comparison(current, baseline):
+    """Print metric deltas between two result files."""
+    print(f"\nComparison against {baseline.get('revision', '?')}:")
+    for pipeline, metrics in current['summary'].items():
+        previous = baseline.get('summary', {}).get(pipeline)
+        if not previous:
+            continue
+        print(f"  {pipeline}")
+        for key, value in metrics.items():
+            old = previous.get(key)
+            if not old:
+                continue
+            print(f"    {key:28s} {old:14.3f} -> {value:14.3f} ({(value - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark OCR pipelines on synthetic episodes')
+    parser.add_argument('--episodes', type=int, default=2, help='Number of synthetic episodes')
+    parser.add_argument('--lines-per-episode', type=int, default=20, help='Subtitle lines per episode')
+    parser.add_argument('--fps', type=float, default=24.0, help='Frame rate of synthetic episodes')
+    parser.add_argument('--width', type=int, default=1280, help='Frame width')
+    parser.add_argument('--height', type=int, default=720, help='Frame height')
+    parser.add_argument('--font', default=None, help='Path to a CJK font')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for text and layout')
+    parser.add_argument('--pipelines', default=','.join(PIPELINES), help='Comma separated pipelines to run')
+    parser.add_argument('--backends', default='easyocr', help='Comma separated OCR backends to compare')
+    parser.add_argument('--frame-skip', type=int, default=8, help='frame_skip for video_ocr (the generator reads every frame)')
+    parser.add_argument('--threshold', type=float, default=0.6, help='confidence_threshold for video_ocr (the generator has none)')
+    parser.add_argument('--workdir', default=os.path.join(BENCH_DIR, 'work'), help='Where videos and outputs go')
+    parser.add_argument('--output', default=None, help='Result JSON path (default: results/<revision>.json)')
+    parser.add_argument('--compare', default=None, help='Previous result JSON to compare against')
+    args = parser.parse_args()
+
+    from benchmarks.synthetic import render_suite
+
+    workdir = os.path.abspath(args.workdir)
+    suite = render_suite(
+        os.path.join(workdir, 'videos'),
+        episodes=args.episodes,
+        lines_per_episode=args.lines_per_episode,
+        font_path=args.font,
+        seed=args.seed,
+        fps=args.fps,
+        width=args.width,
+        height=args.height
+    )
+
+    runs = []
+    for pipeline in args.pipelines.split(','):
+        if pipeline not in PIPELINES:
+            parser.error(f"Unknown pipeline: {pipeline}")
+        for backend in args.backends.split(','):
+            for truth in suite:
+                run_dir = os.path.join(workdir, pipeline, backend, os.path.basename(truth['video_path']))
+                print(f"\n=== {pipeline} ({backend}): {truth['video_path']} ===")
+                runs.append(run_isolated(pipeline, backend, truth, run_dir, args.frame_skip, args.threshold))
+
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': vars(args),
+        'runs': runs,
+        'summary': summarize(runs),
+    }
+
+    output = args.output or os.path.join(BENCH_DIR, 'results', f'{revision}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print("\nSummary:")
+    for pipeline, metrics in report['summary'].items():
+        print(f"  {pipeline}: {metrics['frames_per_second']:.1f} frames/s, "
+              f"{metrics['ocr_calls_per_video_minute']:.0f} OCR calls/min, "
+              f"peak RSS {metrics['peak_rss_bytes'] / 1024**2:.0f} MB, "
+              f"recall {metrics['recall']:.3f}, precision {metrics['precision']:.3f}")
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
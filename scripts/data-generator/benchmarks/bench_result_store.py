@@ -0,0 +1,94 @@
+"""Peak memory and span/export time of a list of result dicts vs ResultStore.
+
+Usage:
+    python -m benchmarks.bench_result_store --hours 3 --fps 30 --frame-skip 4
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import id_generator
+from result_store import ResultStore
+from result_writer import IncrementalResultWriter
+
+
+def synthetic_results(hours, fps, frame_skip, seed=0):
+    """Results shaped like EasyOCR output: NumPy int bboxes, NumPy float confidences."""
+    rng = random.Random(seed)
+    lines = [f'第{i}句台詞內容，大概這麼長' for i in range(2000)]
+    line = 0
+    for frame in range(0, int(hours * 3600 * fps), frame_skip):
+        if rng.random() < 0.02:
+            line = (line + 1) % len(lines)
+        x = rng.randrange(100, 400)
+        yield {
+            'frame': f'frame_{frame:06d}.jpg',
+            'timestamp': frame / fps,
+            'texts': [{
+                'text': lines[line],
+                'confidence': np.float64(rng.uniform(0.6, 1.0)),
+                'bbox': [[np.int32(x), np.int32(20)], [np.int32(x + 600), np.int32(20)],
+                         [np.int32(x + 600), np.int32(70)], [np.int32(x), np.int32(70)]],
+                'lang': 'ch_tra'
+            }]
+        }
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return value, peak, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare result dicts with the columnar ResultStore')
+    parser.add_argument('--hours', type=float, default=3.0, help='Length of the synthetic video')
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--frame-skip', type=int, default=4)
+    args = parser.parse_args()
+
+    # generate_frame_id logs every id; keep it out of the timings
+    id_generator.print = lambda *a, **k: None
+
+    results, list_peak, list_build = measure(lambda: list(synthetic_results(args.hours, args.fps, args.frame_skip)))
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        with IncrementalResultWriter(os.path.join(tmp, 'list.csv')) as writer:
+            for result in results:
+                writer.add(result)
+        list_export = time.perf_counter() - start
+        del results
+
+        store, store_peak, store_build = measure(lambda: ResultStore.from_results(synthetic_results(args.hours, args.fps, args.frame_skip)))
+        start = time.perf_counter()
+        store.write_csv(os.path.join(tmp, 'store.csv'))
+        store_export = time.perf_counter() - start
+        with open(os.path.join(tmp, 'list.csv'), 'rb') as a, open(os.path.join(tmp, 'store.csv'), 'rb') as b:
+            identical = a.read() == b.read()
+
+    report = {
+        'results': len(store),
+        'list': {'peak_mb': list_peak / 2**20, 'build_s': list_build, 'export_s': list_export},
+        'store': {'peak_mb': store_peak / 2**20, 'build_s': store_build, 'export_s': store_export,
+                  'columns_mb': store.nbytes / 2**20},
+        'identical_csv': identical,
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Latency of Storage.search_frames (trigram FTS5) against a LIKE scan, over a large frames table.
+
+Frames are the lines of tables/*.csv, spread over synthetic jobs until
+``--rows`` frames exist, inserted with the full-text triggers active.
+
+Usage:
+    python -m benchmarks.bench_search --rows 300000
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from storage import Storage
+
+TABLES_DIR = os.path.join(os.path.dirname(BENCH_DIR), '..', '..', 'tables')
+
+
+def table_lines(tables_dir=TABLES_DIR):
+    lines = []
+    for path in sorted(glob.glob(os.path.join(tables_dir, '*.csv'))):
+        with open(path, encoding='utf-8', newline='') as f:
+            lines.extend(row['text'] for row in csv.DictReader(f) if row.get('text'))
+    return lines
+
+
+def fill(storage, lines, rows, frames_per_job=3000, seed=0):
+    """Insert ``rows`` frames through the triggers; returns seconds taken."""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    with sqlite3.connect(storage.db_path) as conn:
+        batch = []
+        for i in range(rows):
+            job, frame = divmod(i, frames_per_job)
+            text = lines[rng.randrange(len(lines))]
+            batch.append((f'id{i}', f'job{job:04d}', f'frame_{frame * 8:06d}.jpg', text, frame * 8 / 30,
+                          rng.uniform(0.6, 1.0), frame * 8))
+            if len(batch) == 10000:
+                conn.executemany('INSERT INTO frames (id, youtube_id, frame_number, text, timestamp, confidence, frame_index) '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+                batch = []
+        if batch:
+            conn.executemany('INSERT INTO frames (id, youtube_id, frame_number, text, timestamp, confidence, frame_index) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?)', batch)
+    return time.perf_counter() - start
+
+
+def latencies(search, queries, repeat):
+    times = []
+    for query in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            search(query)
+            times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {'median_ms': statistics.median(times), 'p95_ms': times[int(len(times) * 0.95)]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full-text search over stored frames')
+    parser.add_argument('--rows', type=int, default=300000, help='Frames in the table')
+    parser.add_argument('--queries', type=int, default=50, help='Distinct queries per query length')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    lines = table_lines()
+    if not lines:
+        parser.error(f'No table lines found in {TABLES_DIR}')
+    rng = random.Random(1)
+    long_lines = [line for line in lines if len(line) >= 6]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(os.path.join(tmp, 'bench.db'))
+        insert_s = fill(storage, lines, args.rows)
+        report = {'rows': args.rows, 'insert_s': insert_s, 'db_mb': os.path.getsize(storage.db_path) / 2**20}
+
+        for length in (3, 5, 0):
+            queries = []
+            for line in rng.sample(long_lines, min(args.queries, len(long_lines))):
+                offset = rng.randrange(len(line) - length + 1) if length else 0
+                queries.append(line[offset:offset + length] if length else line)
+            name = f'{length}_chars' if length else 'whole_line'
+            indexed = latencies(lambda q: storage.search_frames(q, limit=50), queries, args.repeat)
+            storage.full_text = False
+            scanned = latencies(lambda q: storage.search_frames(q, limit=50), queries, args.repeat)
+            storage.full_text = True
+            report[name] = {'fts': indexed, 'like': scanned}
+
+        start = time.perf_counter()
+        duplicates = storage.find_duplicate_lines('job0000')
+        report['duplicates'] = {'lines': len(duplicates), 'seconds': time.perf_counter() - start}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Import-time benchmark for the web UI and command line entry points.
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --modules web_ui,storage --repeat 5
+    python -m benchmarks.bench_startup --compare benchmarks/results/startup-abc1234.json
+
+Each module is imported in a fresh interpreter under ``python -X importtime``.
+The report has the median wall time of the import, its cumulative import
+time, the slowest imports it pulled in, and which heavy dependencies
+(torch, easyocr, pandas, ...) got loaded. None of the entry points should
+load those at import time; the run exits non-zero if one does, or if an
+import got slower than ``--max-regression`` against ``--compare``.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_GENERATOR_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, DATA_GENERATOR_DIR)
+
+from benchmarks.bench_pipeline import git_revision
+
+ENTRY_POINTS = ('web_ui', 'storage', 'video_ocr', 'main', 'batch', 'cpu_planner', 'ocr_replay', 'crop_archive')
+# Only OCR itself may load these
+HEAVY_MODULES = ('torch', 'easyocr', 'pandas', 'onnxruntime', 'scipy', 'skimage')
+
+
+def parse_importtime(stderr):
+    """{module: (self us, cumulative us)} from ``-X importtime`` output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(module, repeat=3):
+    """Import ``module`` in ``repeat`` fresh interpreters; timings of the median run."""
+    code = f"import {module}"
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True, text=True, cwd=DATA_GENERATOR_DIR
+        )
+        wall = time.perf_counter() - start
+        if process.returncode:
+            raise RuntimeError(f"import {module} failed:\n{process.stderr[-2000:]}")
+        runs.append((wall, parse_importtime(process.stderr)))
+    runs.sort(key=lambda run: run[0])
+    wall, timings = runs[len(runs) // 2]
+    slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:10]
+    return {
+        'wall_ms': wall * 1000,
+        'import_ms': timings.get(module, (0, 0))[1] / 1000,
+        'heavy_modules': sorted(name for name in HEAVY_MODULES if name in timings),
+        'slowest_self_ms': {name: self_us / 1000 for name, (self_us, _) in slowest},
+    }
+
+
+def print_comparison(current, baseline):
+    """Print import-time deltas between two result files."""
+    print(f"\nComparison against {baseline.get('revision', '?')}:")
+    for module, metrics in current['modules'].items():
+        old = baseline.get('modules', {}).get(module, {}).get('import_ms')
+        if not old:
+            continue
+        value = metrics['import_ms']
+        print(f"  {module:14s} {old:10.1f} ms -> {value:10.1f} ms ({(value - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark entry point import times')
+    parser.add_argument('--modules', default=','.join(ENTRY_POINTS), help='Comma separated modules to import')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreters per module (median is kept)')
+    parser.add_argument('--output', default=None, help='Result JSON path (default: results/startup-<revision>.json)')
+    parser.add_argument('--compare', default=None, help='Previous result JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.5,
+                        help='Fail when an import is this much slower than --compare (0.5 = +50%%)')
+    args = parser.parse_args()
+
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'modules': {},
+    }
+    for module in args.modules.split(','):
+        metrics = measure(module, args.repeat)
+        report['modules'][module] = metrics
+        heavy = f", loads {', '.join(metrics['heavy_modules'])}" if metrics['heavy_modules'] else ''
+        print(f"  {module:14s} {metrics['import_ms']:8.1f} ms import, {metrics['wall_ms']:8.1f} ms wall{heavy}")
+
+    output = args.output or os.path.join(BENCH_DIR, 'results', f'startup-{revision}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    failures = [
+        f"{module} loads {', '.join(metrics['heavy_modules'])} at import time"
+        for module, metrics in report['modules'].items() if metrics['heavy_modules']
+    ]
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print_comparison(report, baseline)
+        for module, metrics in report['modules'].items():
+            old = baseline.get('modules', {}).get(module, {}).get('import_ms')
+            if old and metrics['import_ms'] > old * (1 + args.max_regression):
+                failures.append(f"{module} import went from {old:.1f} ms to {metrics['import_ms']:.1f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
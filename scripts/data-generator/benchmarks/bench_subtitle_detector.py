@@ -0,0 +1,133 @@
+"""Recall and OCR savings of the subtitle-presence detector on synthetic episodes.
+
+Usage:
+    python -m benchmarks.bench_subtitle_detector --episodes 4 --frame-skip 8
+    python -m benchmarks.bench_subtitle_detector --fnr 0.001,0.01,0.05 --save
+
+Sampled bands are labelled by the ground truth (a line is on screen or
+not). Thresholds are calibrated on the even episodes and measured on the
+odd ones, so the reported recall is on episodes the threshold never saw.
+``--save`` writes the calibration of all episodes to
+``model_cache/subtitle_detector.json`` for ``SubtitleDetector.load``.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from subtitle_detector import CALIBRATION_PATH, DEFAULT_THRESHOLD, save_calibration, subtitle_score, threshold_for
+from video_ocr import crop_subtitle_region
+
+
+def score_episode(truth, frame_skip):
+    """(scores, on-screen line index or -1) of every sampled band, plus seconds spent scoring."""
+    line_at = np.full(truth['total_frames'], -1, dtype=np.int64)
+    for index, line in enumerate(truth['lines']):
+        line_at[line['start_frame']:line['end_frame'] + 1] = index
+
+    scores, labels = [], []
+    seconds = 0.0
+    cap = cv2.VideoCapture(truth['video_path'])
+    frame_index = 0
+    while True:
+        if frame_index % frame_skip:
+            if not cap.grab():
+                break
+            frame_index += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        band = crop_subtitle_region(frame)
+        start = time.perf_counter()
+        scores.append(subtitle_score(band))
+        seconds += time.perf_counter() - start
+        labels.append(line_at[frame_index] if frame_index < len(line_at) else -1)
+        frame_index += 1
+    cap.release()
+    return np.asarray(scores), np.asarray(labels), seconds
+
+
+def evaluate(scores, labels, threshold):
+    """Frame recall, line recall and the share of subtitle-free bands that skip OCR."""
+    accepted = scores >= threshold
+    positive = labels >= 0
+    lines = np.unique(labels[positive])
+    found = np.unique(labels[positive & accepted])
+    return {
+        'threshold': float(threshold),
+        'frame_recall': float(accepted[positive].mean()) if positive.any() else 1.0,
+        'line_recall': len(found) / len(lines) if len(lines) else 1.0,
+        'negatives_skipped': float((~accepted[~positive]).mean()) if (~positive).any() else 0.0,
+        'ocr_calls_saved': float((~accepted).mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the subtitle-presence detector')
+    parser.add_argument('--episodes', type=int, default=4, help='Number of synthetic episodes')
+    parser.add_argument('--lines-per-episode', type=int, default=20, help='Subtitle lines per episode')
+    parser.add_argument('--width', type=int, default=1280, help='Frame width')
+    parser.add_argument('--height', type=int, default=720, help='Frame height')
+    parser.add_argument('--font', default=None, help='Path to a CJK font')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for text and layout')
+    parser.add_argument('--frame-skip', type=int, default=8, help='Score every n-th frame')
+    parser.add_argument('--fnr', default='0.001,0.01,0.05', help='Comma separated target false-negative rates')
+    parser.add_argument('--workdir', default=os.path.join(BENCH_DIR, 'work'), help='Where videos go')
+    parser.add_argument('--save', action='store_true', help=f'Write the calibration to {CALIBRATION_PATH}')
+    args = parser.parse_args()
+
+    from benchmarks.synthetic import render_suite
+
+    suite = render_suite(
+        os.path.join(os.path.abspath(args.workdir), 'detector_videos'),
+        episodes=args.episodes,
+        lines_per_episode=args.lines_per_episode,
+        font_path=args.font,
+        seed=args.seed,
+        width=args.width,
+        height=args.height
+    )
+
+    scored = [score_episode(truth, args.frame_skip) for truth in suite]
+    seconds = sum(s for _, _, s in scored)
+    frames = sum(len(scores) for scores, _, _ in scored)
+
+    def pool(episodes):
+        # Line indices are per episode; offset them so lines stay distinct
+        scores, labels, offset = [], [], 0
+        for scores_, labels_, _ in episodes:
+            scores.append(scores_)
+            labels.append(np.where(labels_ >= 0, labels_ + offset, -1))
+            offset += int(labels_.max()) + 1 if len(labels_) else 0
+        return np.concatenate(scores), np.concatenate(labels)
+
+    calibration_scores, calibration_labels = pool(scored[0::2])
+    test_scores, test_labels = pool(scored[1::2] or scored)
+    positive_quantiles = np.percentile(calibration_scores[calibration_labels >= 0], np.linspace(0, 100, 1001))
+
+    report = {
+        'frames': frames,
+        'ms_per_frame': 1000 * seconds / max(1, frames),
+        'default': evaluate(test_scores, test_labels, DEFAULT_THRESHOLD),
+        'targets': {},
+    }
+    for rate in (float(value) for value in args.fnr.split(',')):
+        report['targets'][rate] = evaluate(test_scores, test_labels, threshold_for(positive_quantiles, rate))
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        scores, labels = pool(scored)
+        save_calibration(scores[labels >= 0], scores[labels < 0])
+        print(f"Calibration saved to {CALIBRATION_PATH}")
+
+
+if __name__ == '__main__':
+    main()
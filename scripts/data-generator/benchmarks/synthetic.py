@@ -0,0 +1,170 @@
+"""Render synthetic episodes with burned-in subtitles and known timing."""
+import csv
+import json
+import os
+import random
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+DATA_GENERATOR_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_TABLE = os.path.join(DATA_GENERATOR_DIR, '..', '..', 'tables', 'mygo.csv')
+
+# Common locations of a CJK capable font
+FONT_CANDIDATES = [
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/wqy-zenhei/wqy-zenhei.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+    'C:/Windows/Fonts/msjh.ttc',
+]
+
+
+def find_cjk_font(font_path=None):
+    """Return a usable CJK font path, preferring an explicit one."""
+    if font_path:
+        if not os.path.exists(font_path):
+            raise FileNotFoundError(f"Font not found: {font_path}")
+        return font_path
+    for candidate in FONT_CANDIDATES:
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(
+        "No CJK font found. Install Noto Sans CJK or pass --font explicitly."
+    )
+
+
+def load_subtitle_lines(table_path=DEFAULT_TABLE, limit=None, seed=0):
+    """Load real subtitle lines from a tables/*.csv file."""
+    with open(table_path, encoding='utf-8', newline='') as f:
+        lines = [row['text'].strip() for row in csv.DictReader(f) if row['text'].strip()]
+    rng = random.Random(seed)
+    rng.shuffle(lines)
+    return lines[:limit] if limit else lines
+
+
+def render_text_overlay(text, font, width, stroke_width=3):
+    """Render white subtitle text with a dark outline as a BGRA overlay."""
+    probe = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+    left, top, right, bottom = probe.textbbox((0, 0), text, font=font, stroke_width=stroke_width)
+    text_w, text_h = right - left, bottom - top
+    overlay = Image.new('RGBA', (width, text_h + 2 * stroke_width), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    x = max((width - text_w) // 2, 0) - left
+    draw.text(
+        (x, stroke_width - top), text, font=font,
+        fill=(255, 255, 255, 255),
+        stroke_width=stroke_width, stroke_fill=(16, 16, 16, 255)
+    )
+    return cv2.cvtColor(np.asarray(overlay), cv2.COLOR_RGBA2BGRA)
+
+
+def render_background(frame_index, width, height, shapes):
+    """Render a moving background so frames are never trivially identical."""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    shift = (frame_index * 3) % 256
+    row = (x + shift) % 256
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:, :, 0] = row.astype(np.uint8)
+    background[:, :, 1] = np.linspace(40, 200, height, dtype=np.uint8)[:, None]
+    background[:, :, 2] = (255 - row).astype(np.uint8)
+    for cx, cy, vx, vy, radius, color in shapes:
+        px = int(cx + vx * frame_index) % width
+        py = int(cy + vy * frame_index) % height
+        cv2.circle(background, (px, py), radius, color, -1)
+    return background
+
+
+def composite(frame, overlay, bottom_margin):
+    """Alpha blend an overlay onto the bottom of a frame in place."""
+    h = overlay.shape[0]
+    y1 = frame.shape[0] - bottom_margin
+    y0 = y1 - h
+    alpha = overlay[:, :, 3:4].astype(np.float32) / 255.0
+    region = frame[y0:y1].astype(np.float32)
+    frame[y0:y1] = (overlay[:, :, :3] * alpha + region * (1.0 - alpha)).astype(np.uint8)
+
+
+def render_episode(video_path, lines, font_path, fps=24.0, width=1280, height=720,
+                   line_duration=(1.5, 3.0), gap_duration=(0.3, 2.0), font_size=None,
+                   seed=0):
+    """Render an episode and return the ground-truth subtitle timing.
+
+    Each line is shown for a random duration, separated by random gaps with
+    no subtitle at all, the same way a real episode alternates dialogue and
+    silence.
+    """
+    rng = random.Random(seed)
+    font = ImageFont.truetype(font_path, font_size or height // 16)
+    shapes = [
+        (rng.randrange(width), rng.randrange(height), rng.uniform(-6, 6), rng.uniform(-3, 3),
+         rng.randrange(20, 120), tuple(rng.randrange(256) for _ in range(3)))
+        for _ in range(6)
+    ]
+
+    # Lay out the timeline in frames first
+    truth = []
+    cursor = int(rng.uniform(*gap_duration) * fps)
+    for text in lines:
+        length = int(rng.uniform(*line_duration) * fps)
+        truth.append({
+            'text': text,
+            'start_frame': cursor,
+            'end_frame': cursor + length - 1,
+            'start_time': cursor / fps,
+            'end_time': (cursor + length - 1) / fps,
+        })
+        cursor += length + int(rng.uniform(*gap_duration) * fps)
+    total_frames = cursor
+
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {video_path}")
+    try:
+        bottom_margin = height // 12
+        line_index = 0
+        overlay = None
+        for frame_index in range(total_frames):
+            frame = render_background(frame_index, width, height, shapes)
+            while line_index < len(truth) and truth[line_index]['end_frame'] < frame_index:
+                line_index += 1
+                overlay = None
+            if line_index < len(truth) and truth[line_index]['start_frame'] <= frame_index:
+                if overlay is None:
+                    overlay = render_text_overlay(truth[line_index]['text'], font, width)
+                composite(frame, overlay, bottom_margin)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+    return {
+        'video_path': video_path,
+        'fps': fps,
+        'width': width,
+        'height': height,
+        'total_frames': total_frames,
+        'duration': total_frames / fps,
+        'lines': truth,
+    }
+
+
+def render_suite(output_dir, episodes=2, lines_per_episode=20, font_path=None,
+                 table_path=DEFAULT_TABLE, seed=0, **render_kwargs):
+    """Render a set of synthetic episodes and write their ground truth as JSON."""
+    os.makedirs(output_dir, exist_ok=True)
+    font_path = find_cjk_font(font_path)
+    lines = load_subtitle_lines(table_path, limit=episodes * lines_per_episode, seed=seed)
+    suite = []
+    for episode in range(episodes):
+        episode_lines = lines[episode * lines_per_episode:(episode + 1) * lines_per_episode]
+        video_path = os.path.join(output_dir, f'synthetic_{episode + 1:02d}.mp4')
+        truth = render_episode(video_path, episode_lines, font_path, seed=seed + episode, **render_kwargs)
+        with open(os.path.splitext(video_path)[0] + '.json', 'w', encoding='utf-8') as f:
+            json.dump(truth, f, ensure_ascii=False, indent=2)
+        print(f"Rendered {video_path} ({truth['total_frames']} frames, {len(episode_lines)} lines)")
+        suite.append(truth)
+    return suite
@@ -0,0 +1,426 @@
+"""CPU execution planner for OCR jobs.
+
+On CPU, torch's intra-op pool, OpenCV's thread pool and our own OCR worker
+processes all compete for the same cores. This module looks at what the
+process is actually allowed to use (CPU affinity, cgroup v1/v2 CPU quota and
+memory limit), picks a layout of
+
+    worker processes x torch threads x OpenCV threads
+
+and pins it in every worker before the OCR models are loaded.
+
+A layout can also be measured on a short clip and saved:
+
+    python cpu_planner.py show
+    python cpu_planner.py calibrate downloads/episode.mp4 --seconds 60
+
+``load_plan()`` returns the calibrated layout when it was measured on a
+machine with the same limits, otherwise the heuristic one.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+
+PLAN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_cache', 'cpu_plan.json')
+
+# Resident memory of one worker holding both EasyOCR readers (ch_tra + ja) on CPU
+WORKER_MEMORY = 1536 * 1024 ** 2
+# Memory kept free for the main process, decoding and the page cache
+RESERVED_MEMORY = 1024 ** 3
+# Intra-op speedup of the CRAFT/CRNN models flattens out beyond this many threads
+MAX_USEFUL_THREADS = 4
+
+_applied_plan = None
+
+def _read_first_line(path):
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+def _cgroup_cpu_quota():
+    """CPU quota in cores from cgroup v2 ``cpu.max`` or v1 ``cfs_quota_us``, or None."""
+    line = _read_first_line('/sys/fs/cgroup/cpu.max')
+    if line:
+        quota, _, period = line.partition(' ')
+        if quota != 'max' and period:
+            return int(quota) / int(period)
+        return None
+    quota = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+def available_cpus():
+    """Number of cores this process may use (affinity mask and cgroup quota)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.floor(quota)))
+    return max(1, cpus)
+
+def _cgroup_memory_limit():
+    """Memory limit in bytes from cgroup v2 ``memory.max`` or v1 ``limit_in_bytes``, or None."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read_first_line(path)
+        if value and value != 'max':
+            limit = int(value)
+            # cgroup v1 reports "unlimited" as a huge page-aligned number
+            if limit < 1 << 60:
+                return limit
+    return None
+
+def _meminfo_available():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def available_memory():
+    """Bytes of memory this process may use (free memory capped by the cgroup limit)."""
+    free = _meminfo_available()
+    limit = _cgroup_memory_limit()
+    if limit is not None:
+        try:
+            with open('/sys/fs/cgroup/memory.current') as f:
+                limit -= int(f.read().strip())
+        except (OSError, ValueError):
+            pass
+        free = limit if free is None else min(free, limit)
+    return free
+
+class ExecutionPlan:
+    """A process/thread layout for an OCR job."""
+
+    def __init__(self, workers=1, torch_threads=1, cv2_threads=1, cpus=None, memory=None, source='heuristic', frames_per_second=None):
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.cv2_threads = cv2_threads
+        self.cpus = cpus
+        self.memory = memory
+        self.source = source
+        self.frames_per_second = frames_per_second
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: data[key] for key in cls().__dict__ if key in data})
+
+    def single_process(self):
+        """The same machine limits laid out for one process (e.g. GPU fallback)."""
+        return plan_execution(cpus=self.cpus, memory=self.memory, max_workers=1)
+
+    def __eq__(self, other):
+        return isinstance(other, ExecutionPlan) and self.layout() == other.layout()
+
+    def layout(self):
+        return self.workers, self.torch_threads, self.cv2_threads
+
+    def __repr__(self):
+        return (f"ExecutionPlan(workers={self.workers}, torch_threads={self.torch_threads}, "
+                f"cv2_threads={self.cv2_threads}, source={self.source!r})")
+
+def plan_execution(cpus=None, memory=None, max_workers=None, threads_per_worker=None):
+    """Pick workers x torch threads x OpenCV threads for the available cores and memory.
+
+    Each worker gets up to ``MAX_USEFUL_THREADS`` torch threads; cores beyond
+    that are better spent on another worker, as long as its readers fit in
+    memory. OpenCV only resizes/crops inside a worker, so with several
+    workers it gets a single thread to avoid oversubscription.
+    """
+    cpus = cpus or available_cpus()
+    memory = available_memory() if memory is None else memory
+
+    threads = threads_per_worker or min(MAX_USEFUL_THREADS, cpus)
+    workers = max(1, cpus // threads)
+    if memory is not None:
+        workers = min(workers, max(1, (memory - RESERVED_MEMORY) // WORKER_MEMORY))
+    if max_workers is not None:
+        workers = min(workers, max_workers)
+
+    torch_threads = max(1, cpus // workers)
+    cv2_threads = 1 if workers > 1 else min(2, cpus)
+    return ExecutionPlan(workers, torch_threads, cv2_threads, cpus=cpus, memory=memory)
+
+def candidate_plans(cpus=None, memory=None):
+    """Distinct layouts worth measuring, from one process using every core up."""
+    cpus = cpus or available_cpus()
+    memory = available_memory() if memory is None else memory
+    plans = []
+    for threads in sorted({1, 2, MAX_USEFUL_THREADS, cpus}):
+        if threads > cpus:
+            continue
+        plan = plan_execution(cpus, memory, threads_per_worker=threads)
+        if plan not in plans:
+            plans.append(plan)
+    return sorted(plans, key=lambda plan: plan.workers)
+
+def apply_plan(plan):
+    """Pin the thread pools of the current process to ``plan``.
+
+    Must run before the OCR models are loaded; torch only accepts the
+    inter-op setting before its pool starts, so that one is best effort.
+    The environment variables cover BLAS/OpenMP pools of child processes.
+    """
+    global _applied_plan
+    import cv2
+    import torch
+
+    threads = str(plan.torch_threads)
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[name] = threads
+    torch.set_num_threads(plan.torch_threads)
+    try:
+        torch.set_num_interop_threads(1 if plan.workers > 1 else min(2, plan.torch_threads))
+    except RuntimeError:
+        pass
+    cv2.setNumThreads(plan.cv2_threads)
+    _applied_plan = plan
+    return plan
+
+def applied_plan():
+    """The plan pinned in this process, or None."""
+    return _applied_plan
+
+def save_plan(plan, path=PLAN_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(plan.to_dict(), f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_plan(path=PLAN_PATH):
+    """Calibrated plan if it matches the current limits, else the heuristic plan."""
+    current = plan_execution()
+    try:
+        with open(path) as f:
+            saved = ExecutionPlan.from_dict(json.load(f))
+    except (OSError, ValueError, TypeError):
+        return current
+    if saved.cpus != current.cpus or saved.workers > current.workers:
+        # Measured under different limits (or more memory than is free now)
+        return current
+    return saved
+
+# Worker process state: readers are loaded once per process by the initializer
+_worker_readers = None
+
+def _init_worker(plan_data, ocr_backend):
+    global _worker_readers
+    from video_ocr import init_readers
+
+    apply_plan(ExecutionPlan.from_dict(plan_data))
+    _worker_readers = init_readers(ocr_backend)
+
+def _process_segment(task):
+    from video_ocr import process_video
+    from result_store import ResultStore
+
+    video_path, start, end, options = task
+    # Columns pickle far smaller than result dicts full of NumPy scalars
+    return ResultStore.from_results(process_video(
+        video_path,
+        start_frame=start,
+        end_frame=end,
+        readers=_worker_readers,
+        use_subtitle_streams=False,
+        **options
+    ))
+
+def video_segments(total_frames, workers, frame_skip=1, start_frame=0, per_worker=4):
+    """Split [start_frame, total_frames) into aligned segments, a few per worker."""
+    remaining = max(0, total_frames - start_frame)
+    count = max(1, workers * per_worker)
+    # Keep every boundary on the same frame_skip grid as a single-process run
+    length = max(frame_skip, math.ceil(remaining / count / frame_skip) * frame_skip)
+    return [
+        (start, min(start + length, total_frames))
+        for start in range(start_frame, total_frames, length)
+    ]
+
+def process_video_parallel(video_path, plan=None, progress_callback=None, frame_skip=1, confidence_threshold=0.6, pause_event=None, start_frame=0, decoder='opencv', ocr_backend='easyocr', on_frame_saved=None, ranges=None, range_unit='seconds', archive_dir=None, subtitle_detector=None, resume_state=None, on_checkpoint=None, frame_store=None):
+    """``process_video`` split over ``plan.workers`` OCR processes.
+
+    The video is cut into contiguous frame segments that workers OCR
+    independently; results are yielded in video order. A line that straddles
+    a segment boundary can be reported twice, which ``merge_near_duplicates``
+    folds back together. ``on_frame_saved`` runs in this process, on the
+    frames the workers wrote, as each segment's results arrive. With
+    ``ranges`` only those parts of the video are split up. With
+    ``archive_dir`` each segment writes its own crop archive shard.
+    ``subtitle_detector`` is copied to every worker. Split runs report a
+    checkpoint after each segment; it resumes at the next segment with the
+    fresh text tracking a segment starts with anyway. Progress inside a
+    segment is not checkpointed, so a crash redoes the segments in flight. With ``frame_store``
+    the frames workers wrote are moved into it as their segment arrives.
+    """
+    import cv2
+    from video_ocr import process_video
+    from frame_ranges import normalize_ranges
+    from subtitle_streams import find_subtitle_track
+
+    plan = plan or load_plan()
+    try:
+        has_subtitles = find_subtitle_track(video_path)[0] is not None
+    except Exception:
+        has_subtitles = False
+    if plan.workers <= 1 or has_subtitles:
+        if plan.workers <= 1 and _applied_plan is None:
+            apply_plan(plan)
+        yield from process_video(
+            video_path,
+            progress_callback=progress_callback,
+            frame_skip=frame_skip,
+            confidence_threshold=confidence_threshold,
+            pause_event=pause_event,
+            start_frame=start_frame,
+            decoder=decoder,
+            ocr_backend=ocr_backend,
+            on_frame_saved=on_frame_saved,
+            ranges=ranges,
+            range_unit=range_unit,
+            archive_dir=archive_dir,
+            subtitle_detector=subtitle_detector,
+            resume_state=resume_state,
+            on_checkpoint=on_checkpoint,
+            frame_store=frame_store
+        )
+        return
+
+    if resume_state:
+        start_frame = max(start_frame, resume_state['next_frame'])
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    frame_ranges = normalize_ranges(ranges, fps, range_unit, total_frames) if ranges else [(0, total_frames)]
+    options = {
+        'frame_skip': frame_skip,
+        'confidence_threshold': confidence_threshold,
+        'decoder': decoder,
+        'archive_dir': archive_dir,
+        'subtitle_detector': subtitle_detector
+    }
+    tasks = [
+        (video_path, start, end, options)
+        for range_start, range_end in frame_ranges
+        if range_end > start_frame
+        for start, end in video_segments(range_end, plan.workers, frame_skip, max(range_start, start_frame))
+    ]
+    if tasks and resume_state:
+        # The checkpoint's text tracking carries on into the first segment
+        video, start, end, first_options = tasks[0]
+        tasks[0] = (video, start, end, dict(first_options, resume_state=resume_state))
+    print(f"Processing {len(tasks)} segments with {plan}")
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(plan.workers, initializer=_init_worker, initargs=(plan.to_dict(), ocr_backend)) as pool:
+        for (_, _, end, _), results in zip(tasks, pool.imap(_process_segment, tasks)):
+            if pause_event:
+                pause_event.wait()
+            for result in results:
+                frame_path = os.path.join('frames', result['frame'])
+                if on_frame_saved:
+                    image = cv2.imread(frame_path)
+                    if image is not None:
+                        on_frame_saved(frame_path, image)
+                if frame_store is not None and os.path.exists(frame_path):
+                    # Workers write loose files; only this process appends to the pack
+                    with open(frame_path, 'rb') as f:
+                        frame_store.add(result['frame'], f.read())
+                    os.remove(frame_path)
+                if progress_callback:
+                    progress_callback(
+                        frame=result['frame'],
+                        text=max(result['texts'], key=lambda x: x['confidence'])['text'],
+                        timestamp=result['timestamp'],
+                        total_frames=total_frames,
+                        processed_frames=end
+                    )
+                yield result
+            if progress_callback:
+                progress_callback(frame=None, text=None, timestamp=None, total_frames=total_frames, processed_frames=end)
+            if on_checkpoint:
+                on_checkpoint({'next_frame': end, 'last_text': None, 'last_text_frame': 0})
+
+def _measure(plan, video_path, frames, frame_skip, ocr_backend):
+    """Sampled frames per second of ``plan`` over the first ``frames`` frames."""
+    options = {'frame_skip': frame_skip, 'confidence_threshold': 0.6, 'decoder': 'opencv'}
+    segments = video_segments(frames, plan.workers, frame_skip, per_worker=1)
+    tasks = [(video_path, start, end, options) for start, end in segments]
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(plan.workers, initializer=_init_worker, initargs=(plan.to_dict(), ocr_backend)) as pool:
+        # Load the models in every worker before the clock starts
+        pool.map(_process_segment, [(video_path, 0, 1, options)] * plan.workers, chunksize=1)
+        start = time.perf_counter()
+        pool.map(_process_segment, tasks, chunksize=1)
+        elapsed = time.perf_counter() - start
+    return math.ceil(frames / frame_skip) / elapsed
+
+def calibrate(video_path, seconds=60, frame_skip=8, ocr_backend='easyocr', path=PLAN_PATH):
+    """Measure every candidate layout on the first ``seconds`` of a video and save the fastest."""
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 24.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    frames = min(total_frames, int(seconds * fps))
+
+    best = None
+    for plan in candidate_plans():
+        rate = _measure(plan, video_path, frames, frame_skip, ocr_backend)
+        print(f"{plan}: {rate:.2f} sampled frames/s")
+        if best is None or rate > best.frames_per_second:
+            best = plan
+            best.frames_per_second = rate
+
+    best.source = 'calibrated'
+    save_plan(best, path)
+    print(f"Saved {best} to {path}")
+    return best
+
+if __name__ == '__main__':
+    from ocr_backends import BACKENDS
+
+    parser = argparse.ArgumentParser(description='Plan OCR worker processes and thread pools for this machine')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('show', help='Print detected limits and the plan that would be used')
+
+    calibrate_parser = subparsers.add_parser('calibrate', help='Measure layouts on a short clip and save the best one')
+    calibrate_parser.add_argument('video', help='Video to measure on')
+    calibrate_parser.add_argument('--seconds', type=float, default=60, help='Length of the clip to measure')
+    calibrate_parser.add_argument('--frame-skip', type=int, default=8, help='Frame skip used while measuring')
+    calibrate_parser.add_argument('--ocr-backend', default='easyocr', choices=sorted(BACKENDS), help='OCR backend to measure')
+    calibrate_parser.add_argument('--output', default=PLAN_PATH, help='Where to save the plan')
+
+    args = parser.parse_args()
+    if args.command == 'show':
+        memory = available_memory()
+        print(f"CPUs: {available_cpus()}")
+        print(f"Memory: {memory / 1024 ** 3:.1f} GiB" if memory else "Memory: unknown")
+        print(f"Candidates: {candidate_plans()}")
+        print(f"Plan: {load_plan()}")
+    else:
+        calibrate(args.video, args.seconds, args.frame_skip, args.ocr_backend, args.output)
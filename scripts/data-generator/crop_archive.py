@@ -0,0 +1,430 @@
+"""Per-job archive of sampled subtitle crops and raw OCR candidates.
+
+While ``process_video`` runs with ``archive_dir=...``, every sampled
+subtitle crop is stored grayscale and PNG-compressed (lossless), and every
+``readtext`` output is stored unfiltered. Afterwards the job can be
+
+- re-thresholded or re-run with another language order instantly, from the
+  stored candidates, and
+- re-OCR'd with another backend from the crops, without touching the video.
+
+An archive is a directory of shards, one per writer (a run, a resumed run,
+a reprocessed range or a CPU worker segment). Each shard has
+
+    <shard>.json        metadata (fps, frame_skip, video, ...)
+    <shard>.crops       concatenated PNG crops
+    <shard>.index       fixed-size records: frame, timestamp, offset, length
+    <shard>.candidates  JSON lines: frame, lang, raw readtext output
+
+Shard names sort by creation time, so a later shard overrides earlier ones
+for the same frame. Identical consecutive crops (static shots) share one
+stored image.
+
+Usage:
+    python crop_archive.py info archives/<job>
+    python crop_archive.py rethreshold archives/<job> --threshold 0.7 --output ocr_results.csv
+    python crop_archive.py reocr archives/<job> --ocr-backend onnx --output ocr_results.csv
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import struct
+import time
+
+import cv2
+import numpy as np
+
+ARCHIVE_ROOT = 'archives'
+ARCHIVE_VERSION = 1
+# frame number, timestamp, offset into .crops, PNG length, crop height, crop width
+INDEX_RECORD = struct.Struct('<IdQIHH')
+PNG_COMPRESSION = 3
+LANGUAGES = ('ch_tra', 'ja')
+
+
+def _to_json_output(results):
+    """Convert readtext output (NumPy scalars in bboxes) to plain JSON types."""
+    return [
+        [[[float(x), float(y)] for x, y in bbox], text, float(prob)]
+        for bbox, text, prob in results
+    ]
+
+
+class CropArchiveWriter:
+    """Append one shard of crops and OCR candidates to an archive directory."""
+
+    def __init__(self, directory, metadata=None, tag='run'):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = f'{time.time_ns():020d}-{os.getpid()}-{tag}'
+        base = os.path.join(directory, self.name)
+        with open(f'{base}.json', 'w', encoding='utf-8') as f:
+            json.dump({'version': ARCHIVE_VERSION, **(metadata or {})}, f, ensure_ascii=False)
+        self._crops = open(f'{base}.crops', 'ab')
+        self._index = open(f'{base}.index', 'ab')
+        self._candidates = open(f'{base}.candidates', 'a', encoding='utf-8')
+        self._offset = self._crops.tell()
+        self._last_digest = None
+        self._last_record = None
+        self.crops = 0
+        self.stored_bytes = 0
+
+    def add_crop(self, frame_index, timestamp, image):
+        """Store the subtitle crop OCR sees for ``frame_index``."""
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        digest = hashlib.blake2b(image.tobytes(), digest_size=16).digest()
+        if digest == self._last_digest:
+            # Same pixels as the previous crop: point at the stored copy
+            offset, length = self._last_record
+        else:
+            ok, data = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION])
+            if not ok:
+                raise ValueError(f"Could not encode crop of frame {frame_index}")
+            offset, length = self._offset, len(data)
+            self._crops.write(data.tobytes())
+            self._offset += length
+            self.stored_bytes += length
+            self._last_digest, self._last_record = digest, (offset, length)
+        height, width = image.shape[:2]
+        self._index.write(INDEX_RECORD.pack(frame_index, float(timestamp), offset, length, height, width))
+        self.crops += 1
+
+    def add_candidates(self, frame_index, lang, results):
+        """Store the unfiltered ``readtext`` output of one reader for ``frame_index``."""
+        record = {'frame': frame_index, 'lang': lang, 'results': _to_json_output(results)}
+        self._candidates.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def recording_readers(self, readers, languages=LANGUAGES):
+        """Wrap (lang-ordered) readers so every ``readtext`` output is archived."""
+        return tuple(ArchiveRecordingReader(reader, self, lang) for reader, lang in zip(readers, languages))
+
+    def flush(self):
+        # Crops before index, so an index record never points past the data
+        self._crops.flush()
+        self._index.flush()
+        self._candidates.flush()
+
+    def close(self):
+        if self._crops.closed:
+            return
+        self.flush()
+        self._crops.close()
+        self._index.close()
+        self._candidates.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveRecordingReader:
+    """Forward ``readtext`` to a real reader and archive its raw output."""
+
+    def __init__(self, reader, writer, lang):
+        self.reader = reader
+        self.writer = writer
+        self.lang = lang
+        self.frame_index = None
+
+    def seek_frame(self, frame_index):
+        self.frame_index = frame_index
+        if hasattr(self.reader, 'seek_frame'):
+            self.reader.seek_frame(frame_index)
+
+    def readtext(self, image):
+        results = self.reader.readtext(image)
+        if self.frame_index is not None:
+            self.writer.add_candidates(self.frame_index, self.lang, results)
+        return results
+
+
+class CropArchive:
+    """Read every shard of an archive directory; later shards win per frame."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.metadata = {}
+        self.records = {}
+        self.candidates = {}
+        self._files = {}
+        for meta_path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            self._load_shard(meta_path[:-len('.json')])
+        if not self.metadata:
+            raise FileNotFoundError(f"No crop archive in {directory}")
+
+    def _load_shard(self, base):
+        with open(f'{base}.json', encoding='utf-8') as f:
+            self.metadata.update(json.load(f))
+        crops_path = f'{base}.crops'
+        crops_size = os.path.getsize(crops_path) if os.path.exists(crops_path) else 0
+        if os.path.exists(f'{base}.index'):
+            with open(f'{base}.index', 'rb') as f:
+                data = f.read()
+            # A torn trailing record (interrupted run) is ignored
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            for frame, timestamp, offset, length, height, width in INDEX_RECORD.iter_unpack(data[:usable]):
+                if offset + length <= crops_size:
+                    self.records[frame] = (crops_path, timestamp, offset, length)
+        if os.path.exists(f'{base}.candidates'):
+            with open(f'{base}.candidates', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.candidates[(record['frame'], record['lang'])] = [
+                        (bbox, text, prob) for bbox, text, prob in record['results']
+                    ]
+
+    @property
+    def fps(self):
+        return self.metadata.get('fps') or 30.0
+
+    def frames(self):
+        """Archived frame numbers in video order."""
+        return sorted(self.records)
+
+    def timestamp(self, frame_index):
+        return self.records[frame_index][1]
+
+    def crop(self, frame_index):
+        """Decoded grayscale crop of ``frame_index``."""
+        path, _, offset, length = self.records[frame_index]
+        f = self._files.get(path)
+        if f is None:
+            f = self._files[path] = open(path, 'rb')
+        f.seek(offset)
+        return cv2.imdecode(np.frombuffer(f.read(length), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """Serve archived ``readtext`` output for one language.
+
+    On a miss (the frame was gated out, or the language never ran on it) the
+    crop is OCR'd with ``fallback`` if one is given. With ``reocr`` every
+    frame goes to ``fallback``.
+    """
+
+    def __init__(self, archive, lang, fallback=None, reocr=False):
+        self.archive = archive
+        self.lang = lang
+        self.fallback = fallback
+        self.reocr = reocr
+        self.frame_index = None
+        self.hits = 0
+        self.misses = 0
+
+    def seek_frame(self, frame_index):
+        self.frame_index = frame_index
+        if hasattr(self.fallback, 'seek_frame'):
+            self.fallback.seek_frame(frame_index)
+
+    def readtext(self, image):
+        if not self.reocr:
+            stored = self.archive.candidates.get((self.frame_index, self.lang))
+            if stored is not None:
+                self.hits += 1
+                return stored
+        self.misses += 1
+        if self.fallback is None:
+            return []
+        return self.fallback.readtext(image)
+
+
+class LazyBackend:
+    """OCR backend created by ``factory`` on the first crop it has to read.
+
+    As an ``evaluate`` reader it OCRs misses without loading a model for
+    archives that turn out to have every candidate stored.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.backend = None
+        self.frame_index = None
+
+    def seek_frame(self, frame_index):
+        self.frame_index = frame_index
+
+    def readtext(self, image):
+        if self.backend is None:
+            self.backend = self.factory()
+        if hasattr(self.backend, 'seek_frame'):
+            self.backend.seek_frame(self.frame_index)
+        return self.backend.readtext(image)
+
+
+def evaluate(archive, confidence_threshold=0.6, languages=LANGUAGES, readers=None, reocr=False,
+             min_text_duration=0.5, progress_callback=None, misses=None):
+    """Re-run ``process_video``'s text selection over an archive.
+
+    Yields ``process_video``-style results. ``languages`` is the order in
+    which languages are tried. ``readers`` optionally maps a language to an
+    OCR backend used for crops without stored candidates (or for every crop
+    with ``reocr``). Once the results are consumed, ``misses`` (a dict) holds
+    the number of crops each language had no stored candidates for.
+    """
+    from video_ocr import detect_texts
+
+    readers = readers or {}
+    lang_readers = [
+        (lang, ArchiveReader(archive, lang, readers.get(lang), reocr=reocr))
+        for lang in languages
+    ]
+    fps = archive.fps
+    frames = archive.frames()
+    last_text = None
+    last_text_frame = 0
+
+    for frame_index in frames:
+        # Same gating as process_video
+        if frame_index - last_text_frame <= fps * min_text_duration:
+            continue
+        for _, reader in lang_readers:
+            reader.seek_frame(frame_index)
+        needs_crop = reocr or any(
+            (frame_index, lang) not in archive.candidates and reader.fallback is not None
+            for lang, reader in lang_readers
+        )
+        crop = archive.crop(frame_index) if needs_crop else None
+        texts = detect_texts(lang_readers, crop, confidence_threshold)
+        if not texts:
+            continue
+        best_text = max(texts, key=lambda x: x['confidence'])
+        if best_text['text'] == last_text:
+            continue
+        last_text = best_text['text']
+        last_text_frame = frame_index
+        result = {
+            'frame': f'frame_{frame_index:06d}.jpg',
+            'timestamp': archive.timestamp(frame_index),
+            'texts': texts
+        }
+        if progress_callback:
+            progress_callback(
+                frame=result['frame'],
+                text=best_text['text'],
+                timestamp=result['timestamp'],
+                total_frames=archive.metadata.get('total_frames'),
+                processed_frames=frame_index
+            )
+        yield result
+    if misses is not None:
+        misses.update((lang, reader.misses) for lang, reader in lang_readers)
+
+
+def save_missing_frames(results, archive, frames_dir='frames'):
+    """Make sure every result has an image in ``frames_dir``.
+
+    Frames that were not detected in the original run have no saved image;
+    they are taken from the archived video if it still exists, otherwise
+    the archived crop is saved instead.
+    """
+    video_path = archive.metadata.get('video_path')
+    cap = cv2.VideoCapture(video_path) if video_path and os.path.exists(video_path) else None
+    os.makedirs(frames_dir, exist_ok=True)
+    try:
+        for result in results:
+            frame_path = os.path.join(frames_dir, result['frame'])
+            if not os.path.exists(frame_path):
+                frame_index = int(result['frame'][6:12])
+                image = None
+                if cap is not None:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                    ret, image = cap.read()
+                    if not ret:
+                        image = None
+                if image is None:
+                    image = archive.crop(frame_index)
+                cv2.imwrite(frame_path, image)
+            yield result
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+def job_archive_dir(job_id, root=ARCHIVE_ROOT):
+    return os.path.join(root, job_id)
+
+
+def _write_csv(results, output, collection, episode):
+    from line_merge import merge_near_duplicates
+    from result_writer import IncrementalResultWriter
+
+    if os.path.exists(output):
+        os.remove(output)
+    count = 0
+    with IncrementalResultWriter(output, collection, episode) as writer:
+        for result in merge_near_duplicates(results):
+            writer.add(result)
+            count += 1
+    print(f"Wrote {count} lines to {output}")
+
+
+if __name__ == '__main__':
+    from ocr_backends import BACKENDS, LANGUAGE_SETS, create_backend
+
+    parser = argparse.ArgumentParser(description='Inspect, re-threshold or re-OCR a subtitle crop archive')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = subparsers.add_parser('info', help='Show archive contents')
+    info_parser.add_argument('archive', help='Archive directory')
+
+    for command in ('rethreshold', 'reocr'):
+        sub = subparsers.add_parser(command, help=(
+            'Re-select texts from stored candidates' if command == 'rethreshold'
+            else 'OCR the archived crops again with a (new) backend'
+        ))
+        sub.add_argument('archive', help='Archive directory')
+        sub.add_argument('--threshold', type=float, default=0.6, help='Confidence threshold')
+        sub.add_argument('--languages', default=','.join(LANGUAGES), help='Language order, e.g. "ja,ch_tra"')
+        sub.add_argument('--output', default='ocr_results.csv', help='CSV to write')
+        sub.add_argument('--collection', default='mygo', help='Collection name for the CSV')
+        sub.add_argument('--episode', default='1', help='Episode for the CSV')
+        sub.add_argument('--ocr-backend', default='easyocr', choices=sorted(BACKENDS), help='Backend for crops that need OCR')
+        sub.add_argument('--frames-dir', default=None, help='Also save images for newly detected frames here')
+
+    args = parser.parse_args()
+    archive = CropArchive(args.archive)
+
+    if args.command == 'info':
+        shards = len(glob.glob(os.path.join(args.archive, '*.json')))
+        stored = sum(os.path.getsize(path) for path in glob.glob(os.path.join(args.archive, '*.crops')))
+        print(f"Shards: {shards}")
+        print(f"Crops: {len(archive)} ({stored / 1024 ** 2:.1f} MB stored)")
+        print(f"Candidate sets: {len(archive.candidates)}")
+        print(f"Metadata: {json.dumps(archive.metadata, ensure_ascii=False)}")
+    else:
+        languages = [lang.strip() for lang in args.languages.split(',') if lang.strip()]
+        readers = None
+        if args.command == 'reocr':
+            readers = {lang: create_backend(args.ocr_backend, LANGUAGE_SETS[lang]) for lang in languages}
+        start = time.perf_counter()
+        misses = {}
+        results = evaluate(archive, args.threshold, languages, readers, reocr=args.command == 'reocr', misses=misses)
+        if args.frames_dir:
+            results = save_missing_frames(results, archive, args.frames_dir)
+        _write_csv(results, args.output, args.collection, args.episode)
+        if args.command == 'rethreshold' and any(misses.values()):
+            print(f"Crops without stored candidates (read as no text): {misses}; use reocr to OCR them")
+        print(f"Done in {time.perf_counter() - start:.2f}s")
+    archive.close()
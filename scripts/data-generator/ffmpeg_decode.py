@@ -0,0 +1,197 @@
+"""FFmpeg rawvideo pipe decoder for the subtitle band.
+
+Instead of decoding full BGR frames with OpenCV and cropping afterwards,
+ffmpeg drops unsampled frames, crops, scales and converts to grayscale inside
+its filter graph, so only the pixels we OCR cross the pipe. Frames are read
+into one reused NumPy buffer.
+"""
+import functools
+import re
+import subprocess
+import threading
+import queue
+
+import cv2
+import numpy as np
+
+FFMPEG_PATH = "ffmpeg"
+
+PTS_TIME_PATTERN = re.compile(r'\bn:\s*(\d+).*?\bpts_time:\s*([-\d.]+)')
+VERSION_PATTERN = re.compile(r'ffmpeg version n?(\d+)\.(\d+)')
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_version(ffmpeg_path=FFMPEG_PATH):
+    """(major, minor) of an ffmpeg binary, or None for builds that do not say (e.g. git snapshots)."""
+    try:
+        output = subprocess.run([ffmpeg_path, '-version'], capture_output=True, text=True).stdout
+    except OSError:
+        return None
+    match = VERSION_PATTERN.match(output)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def passthrough_args(ffmpeg_path=FFMPEG_PATH):
+    """Output options that keep every filtered frame as is: -fps_mode needs ffmpeg 5.1, older ones have -vsync."""
+    version = ffmpeg_version(ffmpeg_path)
+    if version is not None and version < (5, 1):
+        return ['-vsync', 'passthrough']
+    return ['-fps_mode', 'passthrough']
+
+
+def probe_video(video_path):
+    """Return (width, height, fps, total_frames) of a video."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"Could not open video file: {video_path}")
+    try:
+        return (
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            cap.get(cv2.CAP_PROP_FPS),
+            int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        )
+    finally:
+        cap.release()
+
+
+class FFmpegFrameReader:
+    """Iterate over (frame_index, timestamp, subtitle_region) read from an ffmpeg pipe.
+
+    By default every ``frame_skip``-th source frame is kept with a ``select``
+    filter, so frame indices line up exactly with the OpenCV path. Passing
+    ``sample_fps`` uses the ``fps`` filter instead. Timestamps come from the
+    ``showinfo`` filter, so they stay accurate for variable frame rate sources.
+
+    The yielded array is reused for the next frame; copy it to keep it.
+    """
+
+    def __init__(self, video_path, frame_skip=1, start_frame=0, crop_top=0.7,
+                 scale_width=None, gray=True, sample_fps=None, ffmpeg_path=None):
+        self.video_path = video_path
+        self.frame_skip = max(1, int(frame_skip))
+        self.start_frame = start_frame
+        self.sample_fps = sample_fps
+        self.ffmpeg_path = ffmpeg_path or FFMPEG_PATH
+        self.width, self.height, self.fps, self.total_frames = probe_video(video_path)
+
+        # Crop the subtitle band in source pixels, then optionally scale it down.
+        # Keep the band height even: ffmpeg rounds crops of subsampled formats.
+        crop_h = (self.height - int(self.height * crop_top)) // 2 * 2
+        self.crop_y = self.height - crop_h
+        if scale_width and scale_width < self.width:
+            self.out_w = scale_width - scale_width % 2
+            self.out_h = max(2, int(round(crop_h * self.out_w / self.width / 2)) * 2)
+        else:
+            self.out_w, self.out_h = self.width, crop_h
+        self.channels = 1 if gray else 3
+        shape = (self.out_h, self.out_w) if gray else (self.out_h, self.out_w, 3)
+        self.buffer = np.empty(shape, dtype=np.uint8)
+        self.frame_bytes = self.buffer.nbytes
+
+        self.process = None
+        self._timestamps = queue.Queue()
+        self._stderr_tail = []
+        self._full_capture = None
+
+    def filter_graph(self):
+        """Build the -vf chain: sample, crop, scale, convert, report timestamps."""
+        filters = []
+        if self.sample_fps:
+            filters.append(f'fps={self.sample_fps}')
+        elif self.frame_skip > 1:
+            filters.append(f'select=not(mod(n+{self.start_frame}\\,{self.frame_skip}))')
+        filters.append(f'crop={self.width}:{self.height - self.crop_y}:0:{self.crop_y}')
+        if (self.out_w, self.out_h) != (self.width, self.height - self.crop_y):
+            filters.append(f'scale={self.out_w}:{self.out_h}:flags=area')
+        filters.append('format=gray' if self.channels == 1 else 'format=bgr24')
+        filters.append('showinfo')
+        return ','.join(filters)
+
+    def command(self):
+        cmd = [self.ffmpeg_path, '-hide_banner', '-nostdin', '-loglevel', 'info']
+        if self.start_frame > 0:
+            cmd += ['-ss', f'{self.start_frame / self.fps:.6f}']
+        cmd += [
+            '-copyts',
+            '-i', self.video_path,
+            '-an', '-sn', '-dn',
+            '-vf', self.filter_graph(),
+            *passthrough_args(self.ffmpeg_path),
+            '-f', 'rawvideo',
+            '-pix_fmt', 'gray' if self.channels == 1 else 'bgr24',
+            'pipe:1'
+        ]
+        return cmd
+
+    def _read_stderr(self):
+        for raw in self.process.stderr:
+            line = raw.decode('utf-8', errors='replace')
+            match = PTS_TIME_PATTERN.search(line) if 'showinfo' in line else None
+            if match:
+                self._timestamps.put(float(match.group(2)))
+            else:
+                self._stderr_tail = (self._stderr_tail + [line])[-20:]
+        self._timestamps.put(None)
+
+    def _read_frame(self):
+        view = memoryview(self.buffer).cast('B')
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    def _frame_index(self, count, timestamp):
+        if self.sample_fps:
+            return int(round(timestamp * self.fps))
+        # Same frame numbering as the OpenCV path
+        first = self.start_frame + (-self.start_frame) % self.frame_skip
+        return first + count * self.frame_skip
+
+    def __iter__(self):
+        self.process = subprocess.Popen(
+            self.command(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=self.frame_bytes
+        )
+        stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        stderr_thread.start()
+        count = 0
+        try:
+            while self._read_frame():
+                try:
+                    timestamp = self._timestamps.get(timeout=10)
+                except queue.Empty:
+                    timestamp = None
+                frame_index = self._frame_index(count, timestamp or 0.0)
+                if timestamp is None:
+                    timestamp = frame_index / self.fps
+                yield frame_index, timestamp, self.buffer
+                count += 1
+        finally:
+            self.close()
+        if self.process.returncode not in (0, None, -15) and count == 0:
+            raise RuntimeError(f"ffmpeg failed on {self.video_path}:\n{''.join(self._stderr_tail)}")
+
+    def read_full_frame(self, frame_index):
+        """Decode one full-resolution BGR frame, e.g. to save it for review."""
+        if self._full_capture is None:
+            self._full_capture = cv2.VideoCapture(self.video_path)
+        self._full_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        ret, frame = self._full_capture.read()
+        return frame if ret else None
+
+    def close(self):
+        if self.process is not None and self.process.poll() is None:
+            # ffmpeg blocked on a full pipe only sees SIGTERM once its write fails
+            self.process.stdout.close()
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._full_capture is not None:
+            self._full_capture.release()
+            self._full_capture = None
@@ -0,0 +1,323 @@
+"""Append-only pack files of encoded frames, for episodes with tens of thousands of images.
+
+A pack replaces a directory of loose JPEGs with two files:
+
+    <name>.pack      the encoded images, back to back, after an 8-byte magic
+    <name>.pack.idx  fixed-size records: offset, length, content digest, file name
+
+Images and records are only ever appended; a later record for the same name
+wins, so re-saving a frame never rewrites the pack. The data is flushed
+before its record, and a torn trailing record (or one pointing past the
+data) is ignored, so an interrupted writer leaves a readable pack.
+
+``FramePack`` maps the pack with ``mmap``: ``read`` is a zero-copy view and
+``open_slice`` hands a WSGI server a file positioned at one image, so
+servers with a sendfile ``wsgi.file_wrapper`` (e.g. gunicorn) send it
+straight from the page cache.
+
+Usage:
+    python frame_pack.py pack contents/mygo/1              # -> contents/mygo/1.pack
+    python frame_pack.py pack frames --remove              # pack, then delete the loose files
+    python frame_pack.py unpack contents/mygo/1.pack contents/mygo/1
+    python frame_pack.py info contents/mygo/1.pack
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+PACK_MAGIC = b'FRMPACK1'
+INDEX_MAGIC = b'FRMIDX01'
+PACK_SUFFIX = '.pack'
+INDEX_SUFFIX = '.idx'
+# offset into .pack, length, blake2b-128 of the bytes, UTF-8 name (NUL padded)
+INDEX_RECORD = struct.Struct('<QI16s64s')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def pack_path_for(directory):
+    """Pack file for a directory of frames: ``contents/mygo/1`` -> ``contents/mygo/1.pack``."""
+    return os.path.normpath(directory) + PACK_SUFFIX
+
+
+def _index_path(pack_path):
+    return pack_path + INDEX_SUFFIX
+
+
+def _open_append(path, magic):
+    f = open(path, 'ab')
+    if f.tell() == 0:
+        f.write(magic)
+        f.flush()
+    return f
+
+
+class FramePackWriter:
+    """Append encoded images to a pack; safe to share between threads.
+
+    Offsets are tracked in memory, so a pack has one writer at a time.
+    """
+
+    def __init__(self, pack_path):
+        self.pack_path = pack_path
+        directory = os.path.dirname(pack_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._data = _open_append(pack_path, PACK_MAGIC)
+        self._index = _open_append(_index_path(pack_path), INDEX_MAGIC)
+        torn = (self._index.tell() - len(INDEX_MAGIC)) % INDEX_RECORD.size
+        if torn:
+            # Drop the half record an interrupted writer left, so new records stay aligned
+            self._index.truncate(self._index.tell() - torn)
+        self._offset = self._data.tell()
+        self._lock = threading.Lock()
+        self.images = 0
+
+    def add(self, name, data):
+        """Append the encoded bytes of image ``name`` (a relative path such as ``frame_000016.jpg``)."""
+        relative = name.replace(os.sep, '/')
+        if relative.startswith('/') or any(part in ('', '.', '..') for part in relative.split('/')):
+            raise ValueError(f"Frame pack names must be relative paths inside the pack: {name}")
+        encoded_name = relative.encode('utf-8')
+        if len(encoded_name) > 64:
+            raise ValueError(f"Name too long for a frame pack (64 bytes max): {name}")
+        data = memoryview(data).cast('B')
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        with self._lock:
+            offset = self._offset
+            self._data.write(data)
+            # Data before index, so a record never points past the data
+            self._data.flush()
+            self._index.write(INDEX_RECORD.pack(offset, len(data), digest, encoded_name))
+            self._index.flush()
+            self._offset += len(data)
+            self.images += 1
+
+    def add_image(self, name, image, quality=95):
+        """Encode ``image`` (by the extension of ``name``) and append it."""
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality] if name.lower().endswith(('.jpg', '.jpeg')) else []
+        ok, data = cv2.imencode(os.path.splitext(name)[1] or '.jpg', image, params)
+        if not ok:
+            raise ValueError(f"Could not encode {name}")
+        self.add(name, data)
+
+    def close(self):
+        with self._lock:
+            if not self._data.closed:
+                self._data.close()
+                self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PackSlice:
+    """Read-only file over one image of a pack, for ``wsgi.file_wrapper``.
+
+    Its descriptor is positioned at the image, so a sendfile file wrapper
+    sends ``length`` bytes (the response's Content-Length) from there.
+    """
+
+    def __init__(self, pack_path, offset, length):
+        self._file = open(pack_path, 'rb', buffering=0)
+        self._file.seek(offset)
+        self._remaining = length
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class FramePack:
+    """Memory-mapped reader of a pack; ``refresh`` picks up images appended since."""
+
+    def __init__(self, pack_path):
+        self.pack_path = pack_path
+        self.entries = {}
+        self._file = open(pack_path, 'rb')
+        self._identity = os.fstat(self._file.fileno()).st_ino
+        self._size = 0
+        self._map = None
+        self._lock = threading.Lock()
+        if self._file.read(len(PACK_MAGIC)) != PACK_MAGIC:
+            self._file.close()
+            raise ValueError(f"Not a frame pack: {pack_path}")
+        self._index_file = open(_index_path(pack_path), 'rb')
+        self._index_read = len(INDEX_MAGIC)
+        self.refresh()
+
+    def refresh(self):
+        """Load index records appended since the last call and remap a grown pack."""
+        with self._lock:
+            self._index_file.seek(self._index_read)
+            data = self._index_file.read()
+            # A torn trailing record is read again once it is complete
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            # Data is flushed before its record, so a record past the end is damage, not a race
+            size = os.fstat(self._file.fileno()).st_size
+            for offset, length, digest, name in INDEX_RECORD.iter_unpack(data[:usable]):
+                if offset + length <= size:
+                    self.entries[name.rstrip(b'\0').decode('utf-8')] = (offset, length, digest)
+            self._index_read += usable
+            if self._map is None or self._size < size:
+                # Views handed out keep the old map alive until they are released
+                self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+                self._size = size
+
+    def is_stale(self):
+        """True if the pack file was replaced (e.g. deleted and written again)."""
+        try:
+            stat = os.stat(self.pack_path)
+        except FileNotFoundError:
+            return True
+        return stat.st_ino != self._identity or stat.st_size < self._size
+
+    def lookup(self, name):
+        """(offset, length, digest) of ``name``, or None; records appended since are loaded first."""
+        if os.fstat(self._index_file.fileno()).st_size >= self._index_read + INDEX_RECORD.size:
+            self.refresh()
+        return self.entries.get(name)
+
+    def read(self, name):
+        """Zero-copy view of the encoded bytes of ``name``; raises KeyError if missing."""
+        entry = self.lookup(name)
+        if entry is None:
+            raise KeyError(name)
+        offset, length, _ = entry
+        return memoryview(self._map)[offset:offset + length]
+
+    def image(self, name, flags=cv2.IMREAD_COLOR):
+        """Decoded image of ``name``."""
+        return cv2.imdecode(np.frombuffer(self.read(name), dtype=np.uint8), flags)
+
+    def etag(self, name):
+        """Strong ETag of ``name``: the content digest stored with it."""
+        return self.lookup(name)[2].hex()
+
+    def open_slice(self, name):
+        """(``PackSlice`` of ``name``, its length) for streaming it out."""
+        offset, length, _ = self.lookup(name)
+        return PackSlice(self.pack_path, offset, length), length
+
+    def names(self):
+        return sorted(self.entries)
+
+    def __contains__(self, name):
+        return self.lookup(name) is not None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def close(self):
+        # Closing the map while views exist raises; the GC closes it once they are gone
+        self._map = None
+        self._file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_images(directory):
+    """Relative paths (with ``/``) of the images under ``directory``, sorted."""
+    names = []
+    for dirpath, _, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                names.append(os.path.relpath(os.path.join(dirpath, filename), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def pack_directory(directory, pack_path=None, remove=False):
+    """Append every image under ``directory`` to its pack; returns (images, bytes).
+
+    Images are copied byte for byte, not re-encoded. With ``remove`` the
+    loose files are deleted once the pack holds them.
+    """
+    pack_path = pack_path or pack_path_for(directory)
+    names = iter_images(directory)
+    total = 0
+    with FramePackWriter(pack_path) as writer:
+        for name in names:
+            with open(os.path.join(directory, name), 'rb') as f:
+                data = f.read()
+            writer.add(name, data)
+            total += len(data)
+    if remove:
+        with FramePack(pack_path) as pack:
+            for name in names:
+                if name in pack:
+                    os.remove(os.path.join(directory, name))
+    return len(names), total
+
+
+def unpack(pack_path, directory):
+    """Write every image of a pack back to loose files; returns the number written."""
+    count = 0
+    root = os.path.abspath(directory)
+    with FramePack(pack_path) as pack:
+        for name in pack.names():
+            target = os.path.abspath(os.path.join(root, *name.split('/')))
+            # Packs written elsewhere are not trusted to stay inside ``directory``
+            if target == root or os.path.commonpath([root, target]) != root:
+                raise ValueError(f"Frame pack name outside the target directory: {name}")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(pack.read(name))
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack frame directories into append-only pack files and back')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack_parser = subparsers.add_parser('pack', help='Append the images of directories to their packs')
+    pack_parser.add_argument('directories', nargs='+', help='Frame directories (each gets <directory>.pack)')
+    pack_parser.add_argument('--remove', action='store_true', help='Delete the loose images once packed')
+
+    unpack_parser = subparsers.add_parser('unpack', help='Extract a pack into loose files')
+    unpack_parser.add_argument('pack', help='Pack file')
+    unpack_parser.add_argument('directory', help='Directory to write the images to')
+
+    info_parser = subparsers.add_parser('info', help='Show pack contents')
+    info_parser.add_argument('pack', help='Pack file')
+
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        for directory in args.directories:
+            images, total = pack_directory(directory, remove=args.remove)
+            print(f"{directory}: {images} images ({total / 1024 ** 2:.1f} MB) -> {pack_path_for(directory)}")
+    elif args.command == 'unpack':
+        print(f"Extracted {unpack(args.pack, args.directory)} images to {args.directory}")
+    else:
+        with FramePack(args.pack) as pack:
+            stored = os.path.getsize(args.pack) - len(PACK_MAGIC)
+            live = sum(length for _, length, _ in pack.entries.values())
+            print(f"Images: {len(pack)}")
+            print(f"Stored: {stored / 1024 ** 2:.1f} MB ({(stored - live) / 1024 ** 2:.1f} MB superseded)")
+
+
+if __name__ == '__main__':
+    main()
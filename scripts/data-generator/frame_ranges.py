@@ -0,0 +1,104 @@
+"""Time/frame ranges for partial reprocessing.
+
+Ranges are given as ``[start, end]`` pairs. Endpoints can be
+
+- numbers, read as seconds (or frames with ``unit='frames'``),
+- ``'HH:MM:SS(.mmm)'`` / ``'MM:SS(.mmm)'`` time strings,
+- ``'1234f'`` frame numbers,
+- ``None`` / ``''`` for the start or end of the video.
+
+On the command line they are written as ``1:00-2:30,4000f-4500f``.
+``normalize_ranges`` turns them into sorted, merged, half-open
+``(start_frame, end_frame)`` tuples.
+"""
+import bisect
+import math
+
+def parse_endpoint(value, fps, unit='seconds', is_end=False):
+    """Frame number for one range endpoint, or None for an open end.
+
+    Time ends are rounded outward (start down, end up) so the whole
+    interval is covered; a frame end is inclusive.
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    frame = seconds = None
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text.endswith('f'):
+            frame = int(text[:-1])
+        elif ':' in text:
+            seconds = 0.0
+            for part in text.split(':'):
+                seconds = seconds * 60 + float(part)
+        else:
+            value = float(text)
+    if frame is None and seconds is None:
+        if unit == 'frames':
+            frame = int(value)
+        else:
+            seconds = float(value)
+
+    if frame is not None:
+        if frame < 0:
+            raise ValueError(f"Negative frame in range: {frame}")
+        return frame + 1 if is_end else frame
+    if seconds < 0:
+        raise ValueError(f"Negative time in range: {seconds}")
+    return math.ceil(seconds * fps) if is_end else math.floor(seconds * fps)
+
+def normalize_ranges(ranges, fps, unit='seconds', total_frames=None):
+    """Sorted, merged ``(start_frame, end_frame)`` half-open ranges.
+
+    ``end_frame`` is None for a range open to the end of the video unless
+    ``total_frames`` is known. Raises ``ValueError`` for malformed or
+    empty ranges.
+    """
+    if unit not in ('seconds', 'frames'):
+        raise ValueError(f"Unknown range unit: {unit} (expected 'seconds' or 'frames')")
+    frame_ranges = []
+    for item in ranges:
+        if len(item) != 2:
+            raise ValueError(f"Range must be [start, end]: {item!r}")
+        start = parse_endpoint(item[0], fps, unit) or 0
+        end = parse_endpoint(item[1], fps, unit, is_end=True)
+        if total_frames is not None:
+            end = total_frames if end is None else min(end, total_frames)
+        if end is not None and end <= start:
+            raise ValueError(f"Empty range: {item!r}")
+        frame_ranges.append((start, end))
+
+    frame_ranges.sort(key=lambda r: r[0])
+    merged = []
+    for start, end in frame_ranges:
+        if merged and (merged[-1][1] is None or start <= merged[-1][1]):
+            last_start, last_end = merged[-1]
+            merged[-1] = (last_start, None if end is None or last_end is None else max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def parse_range_spec(text):
+    """Split a ``START-END,START-END`` command-line spec into [start, end] pairs."""
+    ranges = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition('-')
+        if not sep:
+            raise ValueError(f"Range must be START-END: {part!r}")
+        ranges.append([start.strip() or None, end.strip() or None])
+    return ranges
+
+def in_ranges(frame, frame_ranges):
+    """Whether ``frame`` falls inside one of the normalized ``frame_ranges``."""
+    index = bisect.bisect_right([start for start, _ in frame_ranges], frame) - 1
+    if index < 0:
+        return False
+    end = frame_ranges[index][1]
+    return end is None or frame < end
+
+def overlaps_ranges(first, last, frame_ranges):
+    """Whether frames ``first..last`` (inclusive) overlap one of ``frame_ranges``."""
+    return any(first < (end if end is not None else math.inf) and last >= start for start, end in frame_ranges)
@@ -0,0 +1,117 @@
+"""Streaming merge of near-duplicate subtitle detections.
+
+OCR jitter (a dropped comma, one misread character) splits a single on-screen
+line into several detections. ``merge_near_duplicates`` collapses detections
+whose normalized texts are within a small edit distance of a recent one,
+keeping the highest-confidence variant. Only a small sliding window of recent
+lines is held in memory.
+"""
+import unicodedata
+
+
+def normalize_text(text):
+    """NFKC-normalize and drop whitespace, punctuation and control characters."""
+    return ''.join(
+        ch for ch in unicodedata.normalize('NFKC', text or '')
+        if not unicodedata.category(ch).startswith(('P', 'Z', 'C'))
+    )
+
+
+def banded_edit_distance(a, b, max_distance):
+    """Levenshtein distance, computed only within a diagonal band.
+
+    Returns ``max_distance + 1`` as soon as the distance is known to exceed
+    ``max_distance``, so the cost is O(len * max_distance).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - max_distance)
+        hi = min(len(b), i + max_distance)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= max_distance else over
+        row_min = current[0] if lo == 1 else over
+        for j in range(lo, hi + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j - 1] + cost, previous[j] + 1, current[j - 1] + 1)
+            current[j] = value if value <= max_distance else over
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return over
+        previous = current
+    return previous[len(b)]
+
+
+def is_near_duplicate(a, b, max_ratio=0.2, max_distance=4):
+    """Check whether two normalized texts are OCR variants of the same line.
+
+    The allowed distance scales with line length, so two-character lines
+    must match exactly while longer lines tolerate a few misreads.
+    """
+    if a == b:
+        return True
+    allowed = min(int(max(len(a), len(b)) * max_ratio), max_distance)
+    if allowed == 0:
+        return False
+    return banded_edit_distance(a, b, allowed) <= allowed
+
+
+def _best_text(result):
+    return max(result['texts'], key=lambda x: x['confidence'])
+
+
+def merge_near_duplicates(results, window=4, max_gap=3.0, max_ratio=0.2, max_distance=4, on_merge=None,
+                          pending=None):
+    """Collapse near-duplicate detections in a stream of process_video results.
+
+    A detection is merged into one of the last ``window`` lines if it appeared
+    within ``max_gap`` seconds of it and their normalized texts are near
+    duplicates. The merged line keeps the first frame and timestamp (the start
+    of the span) and the texts of its highest-confidence variant.
+
+    ``on_merge(dropped, kept)`` is called for every detection folded into an
+    earlier one, so callers can update rows they have already stored.
+
+    ``pending`` is the window of lines not yet emitted, as a JSON-able list
+    that is updated in place. Pass a list saved from an interrupted run to
+    carry its unmerged lines over into this one.
+    """
+    if pending is None:
+        pending = []  # [kept result, normalized text, confidence, last timestamp]
+
+    for result in results:
+        if not result.get('texts'):
+            continue
+        best = _best_text(result)
+        norm = normalize_text(best['text']) or best['text']
+        timestamp = result['timestamp']
+
+        # Emit lines that can no longer be merged with anything
+        while pending and (len(pending) >= window or timestamp - pending[0][3] > max_gap):
+            yield pending.pop(0)[0]
+
+        match = None
+        for group in reversed(pending):
+            if timestamp - group[3] <= max_gap and is_near_duplicate(norm, group[1], max_ratio, max_distance):
+                match = group
+                break
+
+        if match is None:
+            pending.append([result, norm, best['confidence'], timestamp])
+            continue
+
+        kept = match[0]
+        match[3] = timestamp
+        if best['confidence'] > match[2]:
+            kept = dict(kept, texts=result['texts'])
+            match[0], match[1], match[2] = kept, norm, best['confidence']
+        if on_merge:
+            on_merge(result, kept)
+
+    while pending:
+        yield pending.pop(0)[0]
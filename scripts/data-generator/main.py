@@ -1,16 +1,18 @@
 import os
 import argparse
 import cv2
-import easyocr
-import pandas as pd
-import torch
 from urllib.parse import urlparse, parse_qs
 from source_dl import download_playlist, download_video
+from ocr_backends import BACKENDS, LANGUAGE_SETS, create_backend
+from phash_index import PHashIndex
 
 class ImageBattleGenerator:
-    def __init__(self, similarity_threshold=0.4, output_dir='contents'):
+    def __init__(self, similarity_threshold=0.4, output_dir='contents', ocr_backend='easyocr'):
         self.similarity_threshold = similarity_threshold
         self.output_dir = os.path.abspath(output_dir)
+        # torch is only needed once OCR is set up, keep it out of --help and imports
+        import torch
+
         # Use GPU if available
         gpu = 'cuda' if torch.cuda.is_available() else 'cpu'
         print(f"Using device: {gpu}")
@@ -18,8 +20,10 @@ class ImageBattleGenerator:
         if torch.cuda.is_available():
             print(f"CUDA device count: {torch.cuda.device_count()}")
             print(f"CUDA device name: {torch.cuda.get_device_name(0)}")
-        # Initialize EasyOCR with Chinese Traditional and English
-        self.reader = easyocr.Reader(['ch_tra', 'en'], gpu=gpu == 'cuda')
+        # Initialize the OCR backend with Chinese Traditional and English
+        self.reader = create_backend(ocr_backend, LANGUAGE_SETS['ch_tra'], gpu=gpu == 'cuda')
+        # Perceptual hashes of saved frames across every series in output_dir
+        self.frame_index = PHashIndex(os.path.join(self.output_dir, 'phash_index.tsv'))
         
     def compare_frames(self, image1, image2):
         """Compare two frames using template matching."""
@@ -91,6 +95,7 @@ class ImageBattleGenerator:
                     # Save frame
                     frame_path = os.path.join(frames_dir, f'frame_{frame_count:06d}.jpg')
                     cv2.imwrite(frame_path, frame)
+                    self.frame_index.add_image(f'{series_name}/ep_{episode}/{os.path.basename(frame_path)}', frame)
                     saved_count += 1
                     
                     # Store frame data with absolute path for storage but relative path for web UI
@@ -122,6 +127,8 @@ def main():
     parser.add_argument('--series', required=True, help='Series name')
     parser.add_argument('--threshold', type=float, default=0.4, help='Frame similarity threshold')
     parser.add_argument('--output', default='contents', help='Output directory')
+    parser.add_argument('--ocr-backend', default='easyocr', choices=sorted(BACKENDS), help='OCR backend')
+    parser.add_argument('--download-profile', default='ocr', choices=['ocr', 'source'], help='Download profile (ocr: smallest format >= 720p)')
     
     args = parser.parse_args()
     
@@ -130,14 +137,15 @@ def main():
     
     # Download video(s)
     if 'playlist' in args.url or 'list=' in args.url:
-        download_playlist(args.url)
+        download_playlist(args.url, profile=args.download_profile)
     else:
-        download_video(args.url)
+        download_video(args.url, profile=args.download_profile)
     
     # Process videos
     generator = ImageBattleGenerator(
         similarity_threshold=args.threshold,
-        output_dir=args.output
+        output_dir=args.output,
+        ocr_backend=args.ocr_backend
     )
     
     all_frames_data = []
@@ -151,6 +159,8 @@ def main():
     
     # Save to CSV
     if all_frames_data:
+        import pandas as pd
+
         df = pd.DataFrame(all_frames_data)
         csv_path = os.path.join(args.output, f'{args.series}_frames.csv')
         df.to_csv(csv_path, index=False)
@@ -0,0 +1,316 @@
+"""Prebuilt CJK bigram index of a table CSV, written next to it for the search service.
+
+The server tokenizes every ``tables/*.csv`` row with Bleve's CJK analyzer
+on each start. ``<table>.csv.ngram`` holds the result instead, so a loader
+can map the postings rather than re-tokenize:
+
+    header        magic, version, counts, CSV size and SHA-256, section offsets
+    row_offsets   u64[rows + 1]   byte offset of each data record in the CSV
+    text_offsets  u32[rows + 1]   into texts
+    texts         normalized text of each row (UTF-8)
+    term_offsets  u32[terms + 1]  into terms
+    terms         UTF-8 terms, sorted bytewise, for binary search
+    post_offsets  u32[terms + 1]  into postings
+    postings      u32[]           ascending row numbers of each term
+
+Integers are little-endian and every section starts 8-byte aligned, so
+each array is a zero-copy view of the mapped file. Terms follow the CJK
+analyzer: NFKC (full/half width folding) and lower case, bigrams of each
+run of Han/kana/Hangul characters (a lone character is kept as is), and
+whole words elsewhere. An index whose CSV size or SHA-256 does not match
+the CSV next to it is stale and must be ignored.
+
+``batch.py`` writes the index whenever it rebuilds a table. By hand:
+
+    python ngram_index.py build tables/mygo.csv tables/ave.csv
+    python ngram_index.py info tables/mygo.csv.ngram
+    python ngram_index.py search tables/mygo.csv 春日影
+"""
+import argparse
+import csv
+import hashlib
+import mmap
+import os
+import re
+import struct
+import unicodedata
+
+import numpy as np
+
+MAGIC = b'CJKNGRAM'
+VERSION = 1
+SUFFIX = '.ngram'
+# magic, version, rows, terms, postings, CSV size, CSV SHA-256, 7 section offsets, reserved
+HEADER = struct.Struct('<8sIIIIQ32s7Q8x')
+ALIGNMENT = 8
+
+# Hangul Jamo, kana, Hangul compatibility Jamo, CJK ideographs (and extensions), Hangul syllables
+CJK_CHARS = (
+    '\u1100-\u11ff\u3040-\u309f\u30a0-\u30ff\u3130-\u318f\u31f0-\u31ff'
+    '\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\U00020000-\U0002fa1f'
+)
+TOKEN = re.compile(f'([{CJK_CHARS}]+)|((?:(?![{CJK_CHARS}])[^\\W_])+)')
+
+
+def index_path_for(csv_path):
+    """Index file of a table: ``tables/mygo.csv`` -> ``tables/mygo.csv.ngram``."""
+    return csv_path + SUFFIX
+
+
+def normalize(text):
+    """Text as it is indexed: NFKC (folds full-width Latin and half-width kana) and lower case."""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def terms(text):
+    """Terms of normalized ``text``, in order: CJK bigrams and non-CJK words."""
+    result = []
+    for cjk, word in TOKEN.findall(text):
+        if word:
+            result.append(word)
+        elif len(cjk) == 1:
+            result.append(cjk)
+        else:
+            result.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+    return result
+
+
+def _contains(sequence, part):
+    """True if ``part`` occurs in ``sequence`` as a contiguous run."""
+    return any(sequence[i:i + len(part)] == part for i in range(len(sequence) - len(part) + 1))
+
+
+def csv_digest(data):
+    return hashlib.sha256(data).digest()
+
+
+def read_rows(data, column='text'):
+    """(byte offset, ``column`` value) of every data record of CSV bytes, and the end offset."""
+    position = len(b'\xef\xbb\xbf') if data.startswith(b'\xef\xbb\xbf') else 0
+    physical = data[position:].splitlines(keepends=True)
+
+    def lines():
+        nonlocal position
+        for line in physical:
+            position += len(line)
+            yield line.decode('utf-8')
+
+    reader = csv.reader(lines())
+    header = next(reader, None)
+    if header is None:
+        raise ValueError('Empty CSV')
+    try:
+        text_column = header.index(column)
+    except ValueError:
+        raise ValueError(f"Required column '{column}' not found in CSV") from None
+    rows = []
+    while True:
+        start = position
+        record = next(reader, None)
+        if record is None:
+            return rows, position
+        if record:
+            rows.append((start, record[text_column] if text_column < len(record) else ''))
+
+
+def _section(buffer, array):
+    """Append ``array`` to ``buffer`` at the next aligned offset; returns the offset."""
+    buffer.extend(b'\0' * (-len(buffer) % ALIGNMENT))
+    offset = len(buffer)
+    buffer.extend(array.tobytes())
+    return offset
+
+
+def _blob(items):
+    """(u32 offsets[len + 1], concatenated bytes) of a list of byte strings."""
+    offsets = np.zeros(len(items) + 1, dtype='<u4')
+    np.cumsum([len(item) for item in items], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(items), dtype=np.uint8)
+
+
+def build_index(csv_path, index_path=None):
+    """Write the index of a table CSV, atomically; returns (rows, terms)."""
+    index_path = index_path or index_path_for(csv_path)
+    with open(csv_path, 'rb') as f:
+        data = f.read()
+    rows, end = read_rows(data)
+
+    texts = []
+    postings = {}
+    for row, (_, text) in enumerate(rows):
+        text = normalize(text)
+        texts.append(text.encode('utf-8'))
+        for term in dict.fromkeys(terms(text)):
+            postings.setdefault(term.encode('utf-8'), []).append(row)
+    vocabulary = sorted(postings)
+
+    row_offsets = np.array([offset for offset, _ in rows] + [end], dtype='<u8')
+    text_offsets, text_blob = _blob(texts)
+    term_offsets, term_blob = _blob(vocabulary)
+    post_offsets = np.zeros(len(vocabulary) + 1, dtype='<u4')
+    np.cumsum([len(postings[term]) for term in vocabulary], out=post_offsets[1:])
+    post_array = np.fromiter((row for term in vocabulary for row in postings[term]),
+                             dtype='<u4', count=int(post_offsets[-1]))
+
+    buffer = bytearray(HEADER.size)
+    sections = [_section(buffer, array) for array in (
+        row_offsets, text_offsets, text_blob, term_offsets, term_blob, post_offsets, post_array)]
+    buffer[:HEADER.size] = HEADER.pack(MAGIC, VERSION, len(rows), len(vocabulary), len(post_array),
+                                       len(data), csv_digest(data), *sections)
+
+    tmp_path = f'{index_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer)
+    os.replace(tmp_path, index_path)
+    return len(rows), len(vocabulary)
+
+
+class NgramIndex:
+    """Memory-mapped reader of a ``.ngram`` file."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        with open(index_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size or self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not an n-gram index: {index_path}")
+        (_, version, self.rows, self.terms, self.postings, self.csv_size, self.csv_sha256,
+         *sections) = HEADER.unpack_from(self._map)
+        if version != VERSION:
+            raise ValueError(f"Unsupported n-gram index version {version} (expected {VERSION}): {index_path}")
+
+        counts = [self.rows + 1, self.rows + 1, None, self.terms + 1, None, self.terms + 1, self.postings]
+        types = ['<u8', '<u4', np.uint8, '<u4', np.uint8, '<u4', '<u4']
+        ends = sections[1:] + [len(self._map)]
+        arrays = []
+        for offset, end, count, dtype in zip(sections, ends, counts, types):
+            if count is None:
+                count = end - offset
+            if offset % ALIGNMENT or not HEADER.size <= offset <= end <= len(self._map) \
+                    or count * np.dtype(dtype).itemsize > end - offset:
+                raise ValueError(f"Damaged n-gram index: {index_path}")
+            arrays.append(np.frombuffer(self._map, dtype=dtype, offset=offset, count=count))
+        (self.row_offsets, self._text_offsets, texts, self._term_offsets, self._term_blob,
+         self._post_offsets, self._postings) = arrays
+        # Blobs end at the last offset; anything after is alignment padding
+        self._texts = texts[:int(self._text_offsets[-1])]
+        if (len(self._texts) != self._text_offsets[-1] or len(self._term_blob) < self._term_offsets[-1]
+                or self._post_offsets[-1] != self.postings):
+            raise ValueError(f"Damaged n-gram index: {index_path}")
+
+    def matches(self, csv_path):
+        """True if the index was built from the CSV as it is now."""
+        if os.path.getsize(csv_path) != self.csv_size:
+            return False
+        with open(csv_path, 'rb') as f:
+            return csv_digest(f.read()) == self.csv_sha256
+
+    def term(self, i):
+        return bytes(self._term_blob[self._term_offsets[i]:self._term_offsets[i + 1]]).decode('utf-8')
+
+    def row_text(self, row):
+        """Normalized text of data row ``row``."""
+        return bytes(self._texts[self._text_offsets[row]:self._text_offsets[row + 1]]).decode('utf-8')
+
+    def postings_of(self, term):
+        """Ascending row numbers of ``term`` (a view of the file), empty if it is not indexed."""
+        encoded = term.encode('utf-8')
+        low, high = 0, self.terms
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(self._term_blob[self._term_offsets[middle]:self._term_offsets[middle + 1]]) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.terms or self.term(low) != term:
+            return self._postings[:0]
+        return self._postings[self._post_offsets[low]:self._post_offsets[low + 1]]
+
+    def search(self, query, limit=None):
+        """Rows whose terms contain the terms of ``query`` in order (a phrase match), in table order.
+        
+        A query of one CJK character matches every row containing it; it
+        is only a term where it stands alone, so every row is checked.
+        """
+        query = normalize(query)
+        query_terms = terms(query)
+        if not query_terms:
+            return []
+        if len(query_terms) == 1 and len(query) == 1 and TOKEN.fullmatch(query)[1]:
+            rows, matches = range(self.rows), lambda text: query in text
+        else:
+            # Intersect from the rarest term; the phrase check then only sees rows with every term
+            ordered = sorted(set(query_terms), key=lambda term: len(self.postings_of(term)))
+            rows = self.postings_of(ordered[0])
+            for term in ordered[1:]:
+                rows = np.intersect1d(rows, self.postings_of(term), assume_unique=True)
+            rows, matches = rows.tolist(), lambda text: _contains(terms(text), query_terms)
+        result = []
+        for row in rows:
+            if matches(self.row_text(row)):
+                result.append(row)
+                if limit is not None and len(result) == limit:
+                    break
+        return result
+
+    def close(self):
+        # Views handed out keep the map alive; the GC closes it once they are gone
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_index(csv_path):
+    """The index of a table CSV, or None if it is missing or stale."""
+    index_path = index_path_for(csv_path)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        index = NgramIndex(index_path)
+    except ValueError:
+        return None
+    return index if index.matches(csv_path) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build and inspect prebuilt CJK n-gram indexes of table CSVs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Write <table>.csv.ngram next to each table')
+    build_parser.add_argument('tables', nargs='+', help='Table CSVs')
+
+    info_parser = subparsers.add_parser('info', help='Show index counts')
+    info_parser.add_argument('index', help='Index file')
+
+    search_parser = subparsers.add_parser('search', help='Find rows of a table through its index')
+    search_parser.add_argument('table', help='Table CSV')
+    search_parser.add_argument('query', help='Text to find')
+    search_parser.add_argument('--limit', type=int, default=20)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        for table in args.tables:
+            rows, vocabulary = build_index(table)
+            print(f"{table}: {rows} rows, {vocabulary} terms -> {index_path_for(table)}")
+    elif args.command == 'info':
+        with NgramIndex(args.index) as index:
+            print(f"Version: {VERSION}")
+            print(f"Rows: {index.rows}  Terms: {index.terms}  Postings: {index.postings}")
+            print(f"CSV: {index.csv_size} bytes, sha256 {index.csv_sha256.hex()}")
+    else:
+        index = open_index(args.table)
+        if index is None:
+            parser.error(f"No current index for {args.table} (run: python ngram_index.py build {args.table})")
+        with index, open(args.table, 'rb') as f:
+            for row in index.search(args.query, args.limit):
+                f.seek(int(index.row_offsets[row]))
+                print(f.read(int(index.row_offsets[row + 1] - index.row_offsets[row])).decode('utf-8').rstrip())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""OCR backend interface and implementations.
+
+Every backend exposes ``detect``, ``recognize``, ``readtext`` and
+``readtext_batch`` with EasyOCR's output format, ``[(bbox, text, prob), ...]``.
+
+- ``easyocr``: the EasyOCR reader (PyTorch), GPU if available.
+- ``onnx``: the same detector and recognizer exported to ONNX and run with
+  ONNX Runtime on CPU, int8-quantized by default. EasyOCR's pre- and
+  post-processing is reused as is, so only the network inference changes.
+
+Export the ONNX models once with:
+    python ocr_backends.py export
+"""
+import argparse
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_cache')
+ONNX_MODEL_DIR = os.path.join(MODEL_DIR, 'onnx')
+
+# Reader name -> EasyOCR language list
+LANGUAGE_SETS = {
+    'ch_tra': ['ch_tra', 'en'],
+    'ja': ['ja', 'en'],
+}
+
+BACKENDS = ('easyocr', 'onnx')
+
+
+class OCRBackend(ABC):
+    """Interface shared by all OCR backends."""
+
+    name = None
+
+    @abstractmethod
+    def detect(self, image):
+        """Return (horizontal_list, free_list) text boxes for one image."""
+
+    @abstractmethod
+    def recognize(self, image, horizontal_list, free_list):
+        """Recognize text inside the given boxes."""
+
+    def readtext(self, image):
+        """Detect and recognize text in one image."""
+        horizontal_list, free_list = self.detect(image)
+        return self.recognize(image, horizontal_list, free_list)
+
+    def readtext_batch(self, images):
+        """Run readtext on several images."""
+        return [self.readtext(image) for image in images]
+
+
+class EasyOCRBackend(OCRBackend):
+    """OCR backend running an EasyOCR Reader."""
+
+    name = 'easyocr'
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    @classmethod
+    def create(cls, lang_list, gpu=False, model_dir=MODEL_DIR, **reader_config):
+        import easyocr
+        reader_config.setdefault('verbose', False)
+        return cls(easyocr.Reader(lang_list, gpu=gpu, model_storage_directory=model_dir, **reader_config))
+
+    def detect(self, image):
+        horizontal_list, free_list = self.reader.detect(image)
+        return horizontal_list[0], free_list[0]
+
+    def recognize(self, image, horizontal_list, free_list):
+        from easyocr.utils import reformat_input
+        _, img_cv_grey = reformat_input(image)
+        return self.reader.recognize(img_cv_grey, horizontal_list, free_list, reformat=False)
+
+    def readtext(self, image, **kwargs):
+        return self.reader.readtext(image, **kwargs)
+
+    def readtext_batch(self, images):
+        # EasyOCR batches the detector only for same-sized inputs
+        if len(images) > 1 and len({image.shape for image in images}) == 1:
+            return self.reader.readtext_batched(list(images))
+        return [self.readtext(image) for image in images]
+
+
+class ONNXModule:
+    """Make an ONNX Runtime session callable like the torch module it replaced."""
+
+    def __init__(self, session):
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    def eval(self):
+        return self
+
+    def __call__(self, x, *args):
+        import torch
+        outputs = self.session.run(None, {self.input_name: x.detach().cpu().numpy().astype(np.float32)})
+        tensors = [torch.from_numpy(output) for output in outputs]
+        return tensors[0] if len(tensors) == 1 else tuple(tensors)
+
+
+def onnx_paths(name, model_dir=ONNX_MODEL_DIR, quantized=True):
+    """Detector and recognizer model paths for a reader name."""
+    suffix = '.int8.onnx' if quantized else '.onnx'
+    return (
+        os.path.join(model_dir, 'craft' + suffix),
+        os.path.join(model_dir, f'recognizer_{name}' + suffix)
+    )
+
+
+def create_session(path, threads=None):
+    """Create a CPU ONNX Runtime session."""
+    import onnxruntime as ort
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Missing ONNX model {path}; run `python ocr_backends.py export` first")
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+
+
+class ONNXBackend(EasyOCRBackend):
+    """EasyOCR pipeline with detector and recognizer run by ONNX Runtime."""
+
+    name = 'onnx'
+
+    @classmethod
+    def create(cls, lang_list, gpu=False, model_dir=ONNX_MODEL_DIR, quantized=True, threads=None,
+               reader_model_dir=MODEL_DIR):
+        import easyocr
+        from easyocr.detection import get_textbox
+        from easyocr.utils import CTCLabelConverter
+
+        name = next((key for key, langs in LANGUAGE_SETS.items() if langs == list(lang_list)), lang_list[0])
+        detector_path, recognizer_path = onnx_paths(name, model_dir, quantized)
+
+        # A Reader without networks still knows the character set and language filters
+        reader = easyocr.Reader(
+            lang_list, gpu=False, model_storage_directory=reader_model_dir,
+            detector=False, recognizer=False, verbose=False
+        )
+        reader.device = 'cpu'
+        reader.get_textbox = get_textbox
+        reader.detector = ONNXModule(create_session(detector_path, threads))
+        reader.recognizer = ONNXModule(create_session(recognizer_path, threads))
+        dict_list = {
+            lang: os.path.join(os.path.dirname(easyocr.__file__), 'dict', lang + '.txt')
+            for lang in lang_list
+        }
+        reader.converter = CTCLabelConverter(reader.character, {}, dict_list)
+        return cls(reader)
+
+
+def create_backend(backend, lang_list, gpu=False, **kwargs):
+    """Create an OCR backend by name."""
+    if backend == 'easyocr':
+        return EasyOCRBackend.create(lang_list, gpu=gpu, **kwargs)
+    if backend == 'onnx':
+        return ONNXBackend.create(lang_list, **kwargs)
+    raise ValueError(f"Unknown OCR backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+def recognizer_for_export(recognizer):
+    """Wrap the recognizer for ONNX export.
+
+    The forward pass is EasyOCR's, minus the unused ``text`` input, with
+    ``AdaptiveAvgPool2d((None, 1))`` written as a mean: ONNX cannot export
+    adaptive pooling when the image width is dynamic.
+    """
+    import torch
+
+    class RecognizerExport(torch.nn.Module):
+        def __init__(self, module):
+            super().__init__()
+            self.module = module
+
+        def forward(self, image):
+            feature = self.module.FeatureExtraction(image).permute(0, 3, 1, 2).mean(dim=3)
+            feature = self.module.SequenceModeling(feature)
+            return self.module.Prediction(feature.contiguous())
+
+    return RecognizerExport(recognizer).eval()
+
+
+def export_detector(reader, path):
+    """Export EasyOCR's CRAFT detector to ONNX with dynamic batch and size."""
+    import torch
+    dummy = torch.randn(1, 3, 320, 1280)
+    torch.onnx.export(
+        reader.detector, dummy, path,
+        input_names=['image'], output_names=['scores', 'feature'],
+        dynamic_axes={
+            'image': {0: 'batch', 2: 'height', 3: 'width'},
+            'scores': {0: 'batch', 1: 'out_height', 2: 'out_width'},
+            'feature': {0: 'batch', 2: 'out_height', 3: 'out_width'},
+        },
+        opset_version=17, dynamo=False
+    )
+
+
+def export_recognizer(reader, path):
+    """Export EasyOCR's recognizer to ONNX with dynamic batch and width."""
+    import torch
+    dummy = torch.randn(1, 1, 64, 256)
+    torch.onnx.export(
+        recognizer_for_export(reader.recognizer), dummy, path,
+        input_names=['image'], output_names=['preds'],
+        dynamic_axes={'image': {0: 'batch', 3: 'width'}, 'preds': {0: 'batch', 1: 'steps'}},
+        opset_version=17, dynamo=False
+    )
+
+
+def quantize(path):
+    """Write an int8 dynamically-quantized copy of an ONNX model next to it."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    target = path[:-len('.onnx')] + '.int8.onnx'
+    quantize_dynamic(path, target, weight_type=QuantType.QInt8)
+    return target
+
+
+def export_models(output_dir=ONNX_MODEL_DIR, names=tuple(LANGUAGE_SETS), reader_model_dir=MODEL_DIR):
+    """Export the detector and recognizers used by the pipeline, plus int8 variants."""
+    import easyocr
+
+    os.makedirs(output_dir, exist_ok=True)
+    for i, name in enumerate(names):
+        # quantize=False: export the float model, ONNX Runtime quantizes it below
+        reader = easyocr.Reader(
+            LANGUAGE_SETS[name], gpu=False, model_storage_directory=reader_model_dir,
+            quantize=False, verbose=False
+        )
+        detector_path, recognizer_path = onnx_paths(name, output_dir, quantized=False)
+        if i == 0:
+            print(f"Exporting detector to {detector_path}")
+            export_detector(reader, detector_path)
+            print(f"Quantized detector: {quantize(detector_path)}")
+        print(f"Exporting {name} recognizer to {recognizer_path}")
+        export_recognizer(reader, recognizer_path)
+        print(f"Quantized recognizer: {quantize(recognizer_path)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage OCR backends')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Export EasyOCR models to ONNX and quantize them to int8')
+    export_parser.add_argument('--output', default=ONNX_MODEL_DIR, help='Output directory')
+    export_parser.add_argument('--names', default=','.join(LANGUAGE_SETS), help='Reader names to export')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_models(args.output, args.names.split(','))
+
+
+if __name__ == '__main__':
+    main()
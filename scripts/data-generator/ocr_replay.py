@@ -0,0 +1,247 @@
+"""Record and replay OCR results so the pipeline can run without EasyOCR.
+
+A recording run wraps the real readers and writes every ``readtext`` output,
+keyed by reader name and frame index, into a gzip-compressed JSON-lines trace.
+A replay run serves those outputs back instantly, which lets decode, gating,
+deduplication, storage and export be benchmarked and profiled on their own,
+and makes CPU-only CI runs deterministic.
+
+Usage:
+    python ocr_replay.py record <video> <trace.jsonl.gz>
+    python ocr_replay.py replay <video> <trace.jsonl.gz> [--db replay.db]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+
+TRACE_VERSION = 1
+
+
+def fingerprint(image):
+    """Cheap content fingerprint of an OCR input image."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr(image.shape).encode('ascii'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def _to_json_output(results):
+    """Convert EasyOCR output (NumPy scalars in bboxes) to plain JSON types."""
+    return [
+        [[[int(x), int(y)] for x, y in bbox], text, float(prob)]
+        for bbox, text, prob in results
+    ]
+
+
+class OCRTrace:
+    """A recorded set of OCR outputs keyed by (reader name, frame index)."""
+
+    def __init__(self, path, mode='r', metadata=None):
+        if mode not in ('r', 'w'):
+            raise ValueError(f"Unsupported trace mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.metadata = metadata or {}
+        self.entries = {}
+        self._file = None
+
+        if mode == 'w':
+            self._file = gzip.open(path, 'wt', encoding='utf-8')
+            header = {'version': TRACE_VERSION, **self.metadata}
+            self._file.write(json.dumps(header, ensure_ascii=False) + '\n')
+        else:
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != TRACE_VERSION:
+                raise ValueError(f"Unsupported trace version: {header.get('version')}")
+            self.metadata = header
+            for line in f:
+                entry = json.loads(line)
+                self.entries[(entry['r'], entry['f'])] = (entry['h'], entry['o'])
+
+    def record(self, name, frame_index, image_fingerprint, results):
+        """Append one readtext output to the trace."""
+        output = _to_json_output(results)
+        self.entries[(name, frame_index)] = (image_fingerprint, output)
+        self._file.write(json.dumps(
+            {'r': name, 'f': frame_index, 'h': image_fingerprint, 'o': output},
+            ensure_ascii=False, separators=(',', ':')
+        ) + '\n')
+
+    def lookup(self, name, frame_index):
+        """Return (fingerprint, output) for a frame, or None if not recorded."""
+        return self.entries.get((name, frame_index))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordingReader:
+    """Pass-through reader that records every readtext call into a trace."""
+
+    def __init__(self, reader, trace, name):
+        self.reader = reader
+        self.trace = trace
+        self.name = name
+        self.frame_index = None
+
+    def seek_frame(self, frame_index):
+        """Called by process_video before the reader is used on a frame."""
+        self.frame_index = frame_index
+        if hasattr(self.reader, 'seek_frame'):
+            self.reader.seek_frame(frame_index)
+
+    def readtext(self, image, *args, **kwargs):
+        results = self.reader.readtext(image, *args, **kwargs)
+        self.trace.record(self.name, self.frame_index, fingerprint(image), results)
+        return results
+
+
+class ReplayReader:
+    """Reader that serves recorded outputs instead of running OCR."""
+
+    def __init__(self, trace, name, verify=False):
+        self.trace = trace
+        self.name = name
+        self.verify = verify
+        self.frame_index = None
+        self.misses = 0
+        self.mismatches = 0
+
+    def seek_frame(self, frame_index):
+        """Called by process_video before the reader is used on a frame."""
+        self.frame_index = frame_index
+
+    def readtext(self, image, *args, **kwargs):
+        entry = self.trace.lookup(self.name, self.frame_index)
+        if entry is None:
+            self.misses += 1
+            return []
+        recorded_fingerprint, output = entry
+        if self.verify and fingerprint(image) != recorded_fingerprint:
+            self.mismatches += 1
+        return [(bbox, text, prob) for bbox, text, prob in output]
+
+
+def recording_readers(trace, readers=None):
+    """Wrap the (Chinese, Japanese) readers so their outputs are recorded."""
+    if readers is None:
+        from video_ocr import init_readers
+        readers = init_readers()
+    ch_reader, ja_reader = readers
+    return RecordingReader(ch_reader, trace, 'ch'), RecordingReader(ja_reader, trace, 'ja')
+
+
+def replay_readers(trace, verify=False):
+    """Build (Chinese, Japanese) readers that replay a recorded trace."""
+    return ReplayReader(trace, 'ch', verify), ReplayReader(trace, 'ja', verify)
+
+
+def record(video_path, trace_path, frame_skip=8, confidence_threshold=0.6):
+    """Run the pipeline with real OCR and record every readtext output."""
+    from video_ocr import process_video
+    from result_store import ResultStore
+
+    os.makedirs('frames', exist_ok=True)
+    metadata = {
+        'video': os.path.basename(video_path),
+        'frame_skip': frame_skip,
+        'confidence_threshold': confidence_threshold,
+    }
+    with OCRTrace(trace_path, 'w', metadata) as trace:
+        results = ResultStore.from_results(process_video(
+            video_path,
+            frame_skip=frame_skip,
+            confidence_threshold=confidence_threshold,
+            readers=recording_readers(trace)
+        ))
+    print(f"Recorded {len(trace.entries)} OCR calls to {trace_path}")
+    return results
+
+
+def replay(video_path, trace_path, output='replay_results', db_path=None, verify=False):
+    """Run the full pipeline against a recorded trace and report stage timings."""
+    from video_ocr import process_video, save_results
+    from result_store import ResultStore
+    from storage import Storage
+
+    trace = OCRTrace(trace_path)
+    readers = replay_readers(trace, verify)
+    os.makedirs('frames', exist_ok=True)
+
+    timings = {}
+    start = time.perf_counter()
+    results = ResultStore.from_results(process_video(
+        video_path,
+        frame_skip=trace.metadata.get('frame_skip', 8),
+        confidence_threshold=trace.metadata.get('confidence_threshold', 0.6),
+        readers=readers
+    ))
+    timings['process_video'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    save_results(results, output)
+    timings['save_results'] = time.perf_counter() - start
+
+    if db_path:
+        storage = Storage(db_path)
+        youtube_id = os.path.basename(video_path)
+        start = time.perf_counter()
+        for result in results:
+            best_text = max(result['texts'], key=lambda x: x['confidence'])
+            storage.save_frame(youtube_id, {
+                'frame': result['frame'],
+                'text': best_text['text'],
+                'timestamp': result['timestamp'],
+                'confidence': best_text['confidence']
+            })
+        timings['storage'] = time.perf_counter() - start
+
+    misses = sum(reader.misses for reader in readers)
+    mismatches = sum(reader.mismatches for reader in readers)
+    print(f"\nReplayed {len(results)} results ({misses} missing frames, {mismatches} fingerprint mismatches)")
+    for stage, seconds in timings.items():
+        print(f"  {stage:14s} {seconds:8.3f}s")
+    return results, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record or replay OCR outputs for a video')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help='Run real OCR and record its outputs')
+    record_parser.add_argument('video', help='Video file to process')
+    record_parser.add_argument('trace', help='Trace file to write (.jsonl.gz)')
+    record_parser.add_argument('--frame-skip', type=int, default=8, help='Frame skip rate')
+    record_parser.add_argument('--threshold', type=float, default=0.6, help='Confidence threshold')
+
+    replay_parser = subparsers.add_parser('replay', help='Run the pipeline against a recorded trace')
+    replay_parser.add_argument('video', help='Video file to process')
+    replay_parser.add_argument('trace', help='Trace file to read (.jsonl.gz)')
+    replay_parser.add_argument('--output', default='replay_results', help='Base filename for the CSV')
+    replay_parser.add_argument('--db', default=None, help='Also write frames to this Storage database')
+    replay_parser.add_argument('--verify', action='store_true', help='Check input fingerprints against the trace')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.video, args.trace, args.frame_skip, args.threshold)
+    else:
+        replay(args.video, args.trace, args.output, args.db, args.verify)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""Perceptual-hash index of saved frames with Hamming radius search.
+
+Every saved frame gets a 64-bit DCT perceptual hash. Hashes live in an
+append-only text file (``<hash hex>\\t<key>`` per line, keys are usually
+``<collection>/<episode>/<frame file>``) and are loaded into multi-index
+hash tables, so "frames that look like this one" is a radius query in
+Hamming distance instead of a ``matchTemplate`` against every frame.
+
+    python phash_index.py build contents/mygo --index phash_index.tsv --workers 8
+    python phash_index.py query frames/frame_001234.jpg --radius 8
+    python phash_index.py dupes --radius 4
+
+``process_video(..., on_frame_saved=index.frame_saved_callback(prefix))``
+adds frames as they are written.
+"""
+import argparse
+import os
+import threading
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+INDEX_PATH = 'phash_index.tsv'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+HASH_SIZE = 8
+DCT_SIZE = 32
+
+def phash(image):
+    """64-bit perceptual hash: sign of the low 8x8 DCT coefficients against their median."""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (DCT_SIZE, DCT_SIZE), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(np.float32(small))[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term only tracks overall brightness; keep it out of the median
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+def hash_file(path):
+    """Hash an image file, or None if it cannot be decoded."""
+    data = np.fromfile(path, dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE) if data.size else None
+    return phash(image) if image is not None else None
+
+def _hash_file_job(path):
+    return path, hash_file(path)
+
+class MultiIndexHash:
+    """Multi-index hashing over 64-bit hashes for exact Hamming radius queries.
+
+    Each hash is split into ``chunks`` substrings with one table per
+    substring. By pigeonhole, anything within ``radius`` of the query matches
+    it within ``radius // chunks`` bits on at least one substring, so a query
+    only probes those nearby buckets and checks the candidates it finds.
+    (A BK-tree degrades to a near-linear scan at the radii near-duplicate
+    frames need.)
+    """
+
+    def __init__(self, chunks=4):
+        self.chunks = chunks
+        self.bits = 64 // chunks
+        self.mask = (1 << self.bits) - 1
+        self.tables = [{} for _ in range(chunks)]
+        self._flip_masks = {}
+        self.size = 0
+
+    def _substrings(self, value):
+        return [(value >> (i * self.bits)) & self.mask for i in range(self.chunks)]
+
+    def _masks(self, distance):
+        """Every substring mask with at most ``distance`` bits set."""
+        masks = self._flip_masks.get(distance)
+        if masks is None:
+            masks = [
+                sum(1 << bit for bit in bits)
+                for count in range(distance + 1)
+                for bits in combinations(range(self.bits), count)
+            ]
+            self._flip_masks[distance] = masks
+        return masks
+
+    def add(self, value, key):
+        self.size += 1
+        for table, substring in zip(self.tables, self._substrings(value)):
+            table.setdefault(substring, []).append((value, key))
+
+    def search(self, value, radius):
+        """All (distance, hash, key) within ``radius`` of ``value``, nearest first."""
+        masks = self._masks(min(radius // self.chunks, self.bits))
+        seen = set()
+        matches = []
+        for table, substring in zip(self.tables, self._substrings(value)):
+            for mask in masks:
+                for stored, key in table.get(substring ^ mask, ()):
+                    if (stored, key) in seen:
+                        continue
+                    seen.add((stored, key))
+                    distance = hamming(value, stored)
+                    if distance <= radius:
+                        matches.append((distance, stored, key))
+        matches.sort(key=lambda match: (match[0], match[2]))
+        return matches
+
+    def __len__(self):
+        return self.size
+
+class PHashIndex:
+    """Persisted perceptual-hash index: an append-only hash file plus in-memory lookup tables."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.tree = MultiIndexHash()
+        self.hashes = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                value, sep, key = line.rstrip('\n').partition('\t')
+                # A torn last line from an interrupted append has no key
+                if not sep or not key or len(value) != 16:
+                    continue
+                self._insert(key, int(value, 16))
+
+    def _insert(self, key, value):
+        previous = self.hashes.get(key)
+        if previous == value:
+            return False
+        # A re-saved frame leaves its old tree entry behind; query() skips it
+        self.hashes[key] = value
+        self.tree.add(value, key)
+        return True
+
+    def add(self, key, value):
+        """Add or update ``key``; appends to the index file only when its hash changed."""
+        with self._lock:
+            if self._insert(key, value):
+                self._append([f'{value:016x}\t{key}\n'])
+
+    def _append(self, lines):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.writelines(lines)
+
+    def add_image(self, key, image):
+        self.add(key, phash(image))
+
+    def add_many(self, items):
+        """Bulk add (key, hash) pairs with a single append."""
+        with self._lock:
+            lines = [f'{value:016x}\t{key}\n' for key, value in items if self._insert(key, value)]
+            if lines:
+                self._append(lines)
+        return len(lines)
+
+    def query(self, value, radius=8, exclude=None):
+        """(key, distance) of indexed frames within ``radius`` bits of ``value``, nearest first."""
+        with self._lock:
+            matches = {}
+            for distance, stored, key in self.tree.search(value, radius):
+                if self.hashes.get(key) == stored and key != exclude:
+                    matches.setdefault(key, distance)
+            return list(matches.items())
+
+    def query_image(self, image, radius=8):
+        return self.query(phash(image), radius)
+
+    def query_key(self, key, radius=8):
+        """Frames similar to an already indexed frame (excluding itself)."""
+        value = self.hashes.get(key)
+        return [] if value is None else self.query(value, radius, exclude=key)
+
+    def duplicate_groups(self, radius=4, prefix=''):
+        """Groups of keys (under ``prefix``) whose hashes chain within ``radius`` bits."""
+        keys = sorted(key for key in self.hashes if key.startswith(prefix))
+        parent = {key: key for key in keys}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for key in keys:
+            for other, _ in self.query_key(key, radius):
+                if other in parent:
+                    parent[find(other)] = find(key)
+
+        groups = {}
+        for key in keys:
+            groups.setdefault(find(key), []).append(key)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def frame_saved_callback(self, prefix):
+        """``on_frame_saved`` callback for ``process_video`` that indexes under ``prefix/``."""
+        def on_frame_saved(frame_path, image):
+            try:
+                self.add_image(f'{prefix}/{os.path.basename(frame_path)}', image)
+            except Exception as e:
+                print(f"Could not index {frame_path}: {str(e)}")
+        return on_frame_saved
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, key):
+        return key in self.hashes
+
+def iter_images(root):
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(dirpath, filename)
+
+def build_index(roots, index_path=INDEX_PATH, workers=None, base=None, rebuild=False):
+    """Hash every image under ``roots`` with a process pool and add it to the index.
+
+    Keys are paths relative to ``base`` (default: the common parent of the
+    roots, so ``contents/<collection>/<episode>/frame.jpg`` is keyed as
+    ``<collection>/<episode>/frame.jpg``). Frames already indexed are skipped
+    unless ``rebuild`` is set.
+    """
+    if rebuild and os.path.exists(index_path):
+        os.remove(index_path)
+    index = PHashIndex(index_path)
+    base = base or os.path.commonpath([os.path.dirname(os.path.abspath(root)) for root in roots])
+
+    paths = {}
+    for root in roots:
+        for path in iter_images(root):
+            key = os.path.relpath(os.path.abspath(path), base).replace(os.sep, '/')
+            if key not in index:
+                paths[path] = key
+
+    added = 0
+    if paths:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk = max(1, len(paths) // ((workers or os.cpu_count() or 1) * 8))
+            batch = []
+            for path, value in pool.map(_hash_file_job, paths, chunksize=chunk):
+                if value is None:
+                    print(f"Could not decode {path}")
+                    continue
+                batch.append((paths[path], value))
+                if len(batch) >= 1000:
+                    added += index.add_many(batch)
+                    batch = []
+            added += index.add_many(batch)
+
+    print(f"Indexed {added} new frames ({len(index)} total) in {index_path}")
+    return index
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Perceptual-hash index of saved frames')
+    parser.add_argument('--index', default=INDEX_PATH, help='Index file')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Hash every frame under the given directories')
+    build_parser.add_argument('roots', nargs='+', help='Directories of frames (e.g. contents/<collection>)')
+    build_parser.add_argument('--workers', type=int, default=None, help='Hashing processes')
+    build_parser.add_argument('--base', default=None, help='Directory keys are relative to')
+    build_parser.add_argument('--rebuild', action='store_true', help='Discard the existing index first')
+
+    query_parser = subparsers.add_parser('query', help='Find indexed frames similar to an image')
+    query_parser.add_argument('image', help='Image file')
+    query_parser.add_argument('--radius', type=int, default=8, help='Maximum Hamming distance')
+
+    dupes_parser = subparsers.add_parser('dupes', help='List groups of near-identical frames')
+    dupes_parser.add_argument('--radius', type=int, default=4, help='Maximum Hamming distance')
+    dupes_parser.add_argument('--prefix', default='', help='Only keys under this prefix (e.g. a collection)')
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        build_index(args.roots, args.index, args.workers, args.base, args.rebuild)
+    elif args.command == 'query':
+        value = hash_file(args.image)
+        if value is None:
+            parser.error(f'could not decode {args.image}')
+        for key, distance in PHashIndex(args.index).query(value, args.radius):
+            print(f'{distance:2d}  {key}')
+    else:
+        for group in PHashIndex(args.index).duplicate_groups(args.radius, args.prefix):
+            print('  '.join(group))
@@ -0,0 +1,312 @@
+"""Compact columnar store for process_video results.
+
+A result dict (``{'frame', 'timestamp', 'texts': [{'text', 'confidence',
+'bbox', 'lang'}, ...]}``) costs around a kilobyte of Python objects, most of
+it EasyOCR bboxes made of NumPy scalars. ``ResultStore`` keeps the same data
+in growable NumPy columns instead:
+
+- one row per result: frame number, timestamp, optional cue end, and the
+  offset of its first text,
+- one row per text: interned text id, language id, confidence and an
+  int16 ``(4, 2)`` bbox.
+
+Spans, de-duplication and CSV export then run on the arrays, and the store
+pickles to a few flat buffers (``cpu_planner`` workers return one per
+segment). ``iter_results()`` rebuilds the dicts for code that wants them.
+"""
+import os
+
+import numpy as np
+
+from id_generator import generate_frame_id
+from line_merge import normalize_text
+from result_writer import CSV_HEADER, format_row, format_time
+
+NO_BBOX = np.iinfo(np.int16).min
+NO_END = -1
+
+
+def frame_number(frame_name):
+    """``frame_001234.jpg`` -> 1234."""
+    return int(frame_name.split('_')[1].split('.')[0])
+
+
+def frame_name(number):
+    return f'frame_{number:06d}.jpg'
+
+
+class _Columns:
+    """Named NumPy arrays sharing one row count, grown by doubling."""
+
+    def __init__(self, dtypes, capacity=1024):
+        self.size = 0
+        self.arrays = {
+            name: np.empty((capacity,) + shape, dtype)
+            for name, (dtype, shape) in dtypes.items()
+        }
+
+    def reserve(self, count):
+        capacity = len(next(iter(self.arrays.values())))
+        if self.size + count <= capacity:
+            return
+        capacity = max(capacity * 2, self.size + count)
+        for name, array in self.arrays.items():
+            grown = np.empty((capacity,) + array.shape[1:], array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.arrays[name] = grown
+
+    def __getitem__(self, name):
+        return self.arrays[name][:self.size]
+
+    def trim(self):
+        self.arrays = {name: array[:self.size].copy() for name, array in self.arrays.items()}
+
+    @property
+    def nbytes(self):
+        return sum(array[:self.size].nbytes for array in self.arrays.values())
+
+
+RESULT_COLUMNS = {
+    'frame': (np.int32, ()),
+    'timestamp': (np.float64, ()),
+    'end_frame': (np.int32, ()),
+    'end_timestamp': (np.float64, ()),
+    'first_text': (np.int64, ()),
+}
+TEXT_COLUMNS = {
+    'text_id': (np.int32, ()),
+    'lang_id': (np.int8, ()),
+    'confidence': (np.float64, ()),
+    'bbox': (np.int16, (4, 2)),
+}
+
+
+class ResultStore:
+    """Append-only columnar store of process_video results.
+
+    Results without texts are not stored (nothing downstream uses them).
+    Bboxes are rounded to integer pixels.
+    """
+
+    def __init__(self, capacity=1024):
+        self.results = _Columns(RESULT_COLUMNS, capacity)
+        self.texts = _Columns(TEXT_COLUMNS, capacity)
+        self.strings = []
+        self._string_ids = {}
+        self.langs = []
+
+    @classmethod
+    def from_results(cls, results):
+        store = cls()
+        for result in results:
+            store.append(result)
+        return store
+
+    def _intern(self, text):
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def _lang_id(self, lang):
+        if lang not in self.langs:
+            self.langs.append(lang)
+        return self.langs.index(lang)
+
+    def append(self, result):
+        texts = result.get('texts')
+        if not texts:
+            return
+        results, rows = self.results, self.texts
+        results.reserve(1)
+        rows.reserve(len(texts))
+
+        index = results.size
+        end_timestamp = result.get('end_timestamp')
+        arrays = results.arrays
+        arrays['frame'][index] = frame_number(result['frame'])
+        arrays['timestamp'][index] = result['timestamp']
+        arrays['end_frame'][index] = frame_number(result.get('end_frame', result['frame'])) if end_timestamp is not None else NO_END
+        arrays['end_timestamp'][index] = end_timestamp if end_timestamp is not None else np.nan
+        arrays['first_text'][index] = rows.size
+        results.size += 1
+
+        arrays = rows.arrays
+        for text in texts:
+            row = rows.size
+            arrays['text_id'][row] = self._intern(text['text'])
+            arrays['lang_id'][row] = self._lang_id(text.get('lang'))
+            arrays['confidence'][row] = text['confidence']
+            if text.get('bbox') is None:
+                arrays['bbox'][row] = NO_BBOX
+            else:
+                arrays['bbox'][row] = np.rint(np.asarray(text['bbox'], dtype=np.float64))
+            rows.size += 1
+
+    def extend(self, results):
+        for result in results:
+            self.append(result)
+
+    def __len__(self):
+        return self.results.size
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns (the interned strings come on top)."""
+        return self.results.nbytes + self.texts.nbytes
+
+    def _owners(self):
+        """Result index of every text row."""
+        counts = np.diff(np.append(self.results['first_text'], self.texts.size))
+        return np.repeat(np.arange(len(self), dtype=np.int64), counts)
+
+    def best_rows(self):
+        """Text row of each result's highest-confidence text (first one on ties)."""
+        if not len(self):
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(self.texts.size)
+        order = np.lexsort((rows, -self.texts['confidence'], self._owners()))
+        return order[self.results['first_text']]
+
+    def _normalized_ids(self):
+        """Id of each string's ``normalize_text`` form, by string id."""
+        keys = {}
+        return np.array([keys.setdefault(normalize_text(text) or text, len(keys)) for text in self.strings], dtype=np.int64)
+
+    def take(self, indices):
+        """New store with the results at ``indices``, in that order."""
+        store = ResultStore(capacity=max(1, len(indices)))
+        store.strings, store._string_ids, store.langs = list(self.strings), dict(self._string_ids), list(self.langs)
+        first = self.results['first_text']
+        ends = np.append(first[1:], self.texts.size)
+        counts = (ends - first)[indices]
+        new_first = np.cumsum(counts) - counts
+        rows = np.arange(counts.sum()) + np.repeat(first[indices] - new_first, counts)
+
+        store.results.reserve(len(indices))
+        store.texts.reserve(len(rows))
+        for name in RESULT_COLUMNS:
+            store.results.arrays[name][:len(indices)] = self.results[name][indices]
+        store.results.arrays['first_text'][:len(indices)] = new_first
+        for name in TEXT_COLUMNS:
+            store.texts.arrays[name][:len(rows)] = self.texts[name][rows]
+        store.results.size, store.texts.size = len(indices), len(rows)
+        return store
+
+    def unique(self):
+        """One result per distinct first text: the highest-confidence one, in frame order.
+
+        The columnar equivalent of ``video_ocr.remove_duplicates``.
+        """
+        if not len(self):
+            return self.take(np.empty(0, dtype=np.int64))
+        keys = self._normalized_ids()[self.texts['text_id'][self.results['first_text']]]
+        max_confidence = np.maximum.reduceat(self.texts['confidence'], self.results['first_text'])
+        order = np.lexsort((np.arange(len(self)), -max_confidence, keys))
+        first_of_key = np.flatnonzero(np.r_[True, keys[order][1:] != keys[order][:-1]])
+        chosen = order[first_of_key]
+        chosen = chosen[np.lexsort((chosen, self.results['frame'][chosen]))]
+        return self.take(chosen)
+
+    def span_arrays(self):
+        """Consecutive results with the same best text, as arrays.
+
+        Returns ``(text_id, confidence, start_frame, start_time, end_frame,
+        end_time)``, matching ``result_writer.SpanBuilder``: a span ends at
+        the next span's first result, the last one at its own last result,
+        and a result with a cue end (subtitle streams) ends its span there.
+        """
+        best = self.best_rows()
+        text_ids = self.texts['text_id'][best]
+        confidence = self.texts['confidence'][best]
+        frames, timestamps = self.results['frame'], self.results['timestamp']
+        if not len(self):
+            empty = np.empty(0)
+            return text_ids, confidence, frames, timestamps, frames, empty
+
+        starts = np.flatnonzero(np.r_[True, text_ids[1:] != text_ids[:-1]])
+        lasts = np.r_[starts[1:] - 1, len(self) - 1]
+        next_starts = np.r_[starts[1:], len(self) - 1]
+        end_frame = frames[next_starts].copy()
+        end_time = timestamps[next_starts].copy()
+        end_frame[-1], end_time[-1] = frames[-1], timestamps[-1]
+
+        explicit = self.results['end_frame'][lasts] != NO_END
+        end_frame[explicit] = self.results['end_frame'][lasts][explicit]
+        end_time[explicit] = self.results['end_timestamp'][lasts][explicit]
+        return (
+            text_ids[starts],
+            np.maximum.reduceat(confidence, starts),
+            frames[starts],
+            timestamps[starts],
+            end_frame,
+            end_time,
+        )
+
+    def spans(self, collection='mygo', episode='1'):
+        """CSV rows (``result_writer.CSV_HEADER`` fields) of every span."""
+        rows = []
+        for text_id, confidence, start_frame, start_time, end_frame, end_time in zip(*self.span_arrays()):
+            text = self.strings[text_id]
+            start_name = frame_name(int(start_frame))
+            rows.append({
+                'id': generate_frame_id(collection, start_name, float(start_time), text),
+                'score': float(confidence),
+                'text': text,
+                'episode': episode,
+                'start_time': format_time(float(start_time)),
+                'end_time': format_time(float(end_time)),
+                'start_frame': start_name,
+                'end_frame': frame_name(int(end_frame))
+            })
+        return rows
+
+    def write_csv(self, path, collection='mygo', episode='1'):
+        """Write the spans as a results CSV in one pass; returns the row count."""
+        rows = self.spans(collection, episode)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write((','.join(CSV_HEADER) + '\r\n').encode('utf-8'))
+            f.writelines(format_row(row) for row in rows)
+        os.replace(tmp_path, path)
+        return len(rows)
+
+    def iter_results(self):
+        """Rebuild process_video result dicts, in insertion order."""
+        first = self.results['first_text']
+        ends = np.append(first[1:], self.texts.size)
+        text_ids, lang_ids = self.texts['text_id'], self.texts['lang_id']
+        confidences, bboxes = self.texts['confidence'], self.texts['bbox']
+        for index in range(len(self)):
+            result = {
+                'frame': frame_name(int(self.results['frame'][index])),
+                'timestamp': float(self.results['timestamp'][index]),
+                'texts': [
+                    {
+                        'text': self.strings[text_ids[row]],
+                        'confidence': float(confidences[row]),
+                        'bbox': None if bboxes[row][0, 0] == NO_BBOX else bboxes[row].tolist(),
+                        'lang': self.langs[lang_ids[row]]
+                    }
+                    for row in range(first[index], ends[index])
+                ]
+            }
+            if self.results['end_frame'][index] != NO_END:
+                result['end_frame'] = frame_name(int(self.results['end_frame'][index]))
+                result['end_timestamp'] = float(self.results['end_timestamp'][index])
+            yield result
+
+    __iter__ = iter_results
+
+    def __getstate__(self):
+        # Pickle only the filled part of the columns
+        self.results.trim()
+        self.texts.trim()
+        state = dict(self.__dict__)
+        del state['_string_ids']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._string_ids = {text: index for index, text in enumerate(self.strings)}
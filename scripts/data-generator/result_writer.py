@@ -0,0 +1,222 @@
+"""Incremental, crash-safe CSV output for OCR results.
+
+``SpanBuilder`` turns the stream of process_video results into subtitle span
+rows: a span is final as soon as the next change of text confirms its end.
+``IncrementalCSVWriter`` appends each finished row with a single ``write``
+call and fsyncs periodically, so the file on disk is always a valid CSV. If a
+crash tears the last row, it is dropped the next time the file is opened.
+"""
+import csv
+import io
+import os
+import time
+
+from frame_ranges import in_ranges
+from id_generator import generate_frame_id
+
+CSV_HEADER = ['id', 'score', 'text', 'episode', 'start_time', 'end_time', 'start_frame', 'end_frame']
+
+
+def format_time(seconds):
+    """Format seconds as MM:SS,mmm."""
+    return f"{int(seconds//60):02d}:{int(seconds%60):02d},{int((seconds%1)*1000):03d}"
+
+
+class SpanBuilder:
+    """Group consecutive results with the same best text into CSV rows."""
+
+    def __init__(self, collection='mygo', episode='1'):
+        self.collection = collection
+        self.episode = episode
+        # [text, confidence, start_frame, start_time, last_frame, last_time, explicit_end]
+        self.current = None
+
+    def _row(self, end_frame, end_time):
+        text, confidence, start_frame, start_time = self.current[:4]
+        if self.current[6] is not None:
+            # Results from subtitle streams know exactly when the line ends
+            end_frame, end_time = self.current[6]
+        return {
+            'id': generate_frame_id(self.collection, start_frame, start_time, text),
+            'score': confidence,
+            'text': text,
+            'episode': self.episode,
+            'start_time': format_time(start_time),
+            'end_time': format_time(end_time),
+            'start_frame': start_frame,
+            'end_frame': end_frame
+        }
+
+    def add(self, result):
+        """Add one result; return the row it finalizes, if any."""
+        best_text = max(result['texts'], key=lambda x: x['confidence'])
+        frame_name = result['frame']
+        timestamp = result['timestamp']
+        explicit_end = None
+        if result.get('end_timestamp') is not None:
+            explicit_end = (result.get('end_frame', frame_name), result['end_timestamp'])
+
+        if self.current is not None and self.current[0] == best_text['text']:
+            self.current[1] = max(self.current[1], best_text['confidence'])
+            self.current[4], self.current[5] = frame_name, timestamp
+            self.current[6] = explicit_end
+            return None
+
+        row = self._row(frame_name, timestamp) if self.current is not None else None
+        self.current = [best_text['text'], best_text['confidence'], frame_name, timestamp, frame_name, timestamp, explicit_end]
+        return row
+
+    def finish(self):
+        """Return the row for the last open span, ending at its last result."""
+        if self.current is None:
+            return None
+        row = self._row(self.current[4], self.current[5])
+        self.current = None
+        return row
+
+
+def format_row(row):
+    """Encode one result row as a complete CSV record."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([
+        row['id'],
+        f"{float(row['score']):.1f}",
+        row['text'],
+        row['episode'],
+        row['start_time'],
+        row['end_time'],
+        row['start_frame'],
+        row['end_frame']
+    ])
+    return buffer.getvalue().encode('utf-8')
+
+
+def repair_csv(path, columns=len(CSV_HEADER)):
+    """Truncate a CSV to its last complete record. Returns bytes removed."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    # Drop a trailing line without newline, then any last line that is not a full record
+    end = data.rfind(b'\n') + 1
+    while end > 0:
+        line_start = data.rfind(b'\n', 0, end - 1) + 1
+        fields = next(csv.reader([data[line_start:end].decode('utf-8', errors='replace')]), [])
+        if len(fields) == columns:
+            break
+        end = line_start
+    if end < len(data):
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+    return len(data) - end
+
+
+def frame_number(value):
+    """Frame number of a ``start_frame``/``end_frame`` cell: ``123`` or ``frame_000123.jpg``."""
+    return int(str(value).split('_')[-1].split('.')[0])
+
+
+def splice_ranges(path, range_path, frame_ranges):
+    """Replace the rows of ``path`` that start inside ``frame_ranges`` with the rows of ``range_path``.
+
+    Both are CSVs with the table header; the result is rewritten atomically
+    in start frame order, and ``range_path`` is removed. Returns the rows
+    written.
+    """
+    rows = []
+    if os.path.exists(path):
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = [row for row in csv.DictReader(f) if not in_ranges(frame_number(row['start_frame']), frame_ranges)]
+    with open(range_path, encoding='utf-8', newline='') as f:
+        rows.extend(csv.DictReader(f))
+    rows.sort(key=lambda row: frame_number(row['start_frame']))
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        header = io.StringIO()
+        csv.writer(header).writerow(CSV_HEADER)
+        f.write(header.getvalue().encode('utf-8'))
+        f.writelines(format_row(row) for row in rows)
+    os.replace(tmp_path, path)
+    os.remove(range_path)
+    return len(rows)
+
+
+class IncrementalCSVWriter:
+    """Append-only CSV writer that keeps the file valid after a crash."""
+
+    def __init__(self, path, fsync_every=20, fsync_interval=5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.rows_written = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            removed = repair_csv(path)
+            if removed:
+                print(f"Dropped {removed} bytes of a partial row from {path}")
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if os.fstat(self.fd).st_size == 0:
+            header = io.StringIO()
+            csv.writer(header).writerow(CSV_HEADER)
+            self._write(header.getvalue().encode('utf-8'))
+            self.sync()
+
+    def _write(self, data):
+        # One write per record: a crash can only tear the final row
+        written = os.write(self.fd, data)
+        while written < len(data):
+            written += os.write(self.fd, data[written:])
+
+    def write_row(self, row):
+        """Append a finished row and fsync if the batch or interval is due."""
+        self._write(format_row(row))
+        self.rows_written += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.fd)
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self.fd is not None:
+            self.sync()
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class IncrementalResultWriter:
+    """Write subtitle spans to CSV as soon as they are final."""
+
+    def __init__(self, path, collection='mygo', episode='1', **writer_kwargs):
+        self.spans = SpanBuilder(collection, episode)
+        self.writer = IncrementalCSVWriter(path, **writer_kwargs)
+
+    def add(self, result):
+        row = self.spans.add(result)
+        if row is not None:
+            self.writer.write_row(row)
+
+    def close(self):
+        """Write the last open span and close the file."""
+        row = self.spans.finish()
+        if row is not None:
+            self.writer.write_row(row)
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
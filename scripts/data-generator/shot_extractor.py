@@ -0,0 +1,237 @@
+"""Save one screenshot per shot of an episode, for reaction images without subtitles.
+
+The successor of ``refernce_codes/chop_clips.py``: every sampled frame is
+downscaled to a 100x100 thumbnail and compared with the sampled frame
+before it (``TM_CCOEFF_NORMED``, as ``chop_clips.py`` did). A frame whose
+similarity falls below ``--threshold`` starts a new shot and is saved at
+full resolution. Similarities are computed for blocks of thumbnails at
+once instead of one ``matchTemplate`` call per frame.
+
+Episodes come from ``tables/schema.yml`` (as in ``batch.py``) or the
+command line, one process per episode:
+
+    python shot_extractor.py
+    python shot_extractor.py --collections MyGO --workers 4 --frame-skip 2 --decoder ffmpeg
+    python shot_extractor.py episode.mkv --output shots/
+
+Shots go to ``contents/<collection>/<episode>/shots/frame_<n>.jpg`` with a
+``shots.csv`` index of frame numbers and timestamps. An episode whose index
+exists is skipped unless ``--force`` is given.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+
+import cv2
+import numpy as np
+
+from batch import SCHEMA_PATH, find_episodes, load_schema
+from ffmpeg_decode import FFmpegFrameReader
+from subtitle_streams import format_table_time
+from video_ocr import iter_sampled_frames
+
+THUMB_SIZE = (100, 100)
+DEFAULT_THRESHOLD = 0.4
+SHOTS_DIR = 'shots'
+INDEX_FILE = 'shots.csv'
+INDEX_HEADER = ['file', 'frame', 'timestamp', 'time', 'similarity']
+
+
+def iter_thumbnail_blocks(video_path, frame_skip=1, decoder='opencv', block_size=256, size=THUMB_SIZE):
+    """Yield (frame indices, timestamps, thumbnails) for blocks of up to ``block_size`` sampled frames.
+
+    ``decoder='opencv'`` only grabs the skipped frames; ``'ffmpeg'`` drops
+    them and downscales inside ffmpeg, so only small frames cross the pipe.
+    The thumbnail array is reused for the next block; copy it to keep it.
+    """
+    width, height = size
+    thumbs = np.empty((block_size, height, width, 3), dtype=np.uint8)
+    indices = np.empty(block_size, dtype=np.int64)
+    timestamps = np.empty(block_size, dtype=np.float64)
+
+    if decoder == 'ffmpeg':
+        frame_reader = FFmpegFrameReader(video_path, frame_skip=frame_skip, crop_top=0.0,
+                                         scale_width=2 * width, gray=False)
+        frames = ((index, timestamp, frame) for index, timestamp, frame in frame_reader)
+    else:
+        frame_reader = None
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise Exception(f"Could not open video file: {video_path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frames = ((index, index / fps, frame) for index, frame in iter_sampled_frames(cap, frame_skip))
+
+    count = 0
+    try:
+        for index, timestamp, frame in frames:
+            # Bilinear, like chop_clips.py: the threshold keeps its meaning, and INTER_AREA costs ~70x more
+            thumbs[count] = cv2.resize(frame, size)
+            indices[count], timestamps[count] = index, timestamp
+            count += 1
+            if count == block_size:
+                yield indices, timestamps, thumbs
+                count = 0
+        if count:
+            yield indices[:count], timestamps[:count], thumbs[:count]
+    finally:
+        if frame_reader is not None:
+            frame_reader.close()
+        else:
+            cap.release()
+
+
+def consecutive_similarity(thumbs):
+    """``TM_CCOEFF_NORMED`` of each thumbnail with the one before it (``len(thumbs) - 1`` values).
+
+    Equal-size template matching is the correlation of the two images with
+    each channel's mean removed, so a block is one batched dot product. Two
+    flat images count as the same shot; a flat and a textured one do not.
+    """
+    x = thumbs.reshape(len(thumbs), -1, thumbs.shape[-1]).astype(np.float32)
+    x -= x.mean(axis=1, keepdims=True)
+    x = x.reshape(len(thumbs), -1)
+    norms = np.sqrt(np.einsum('ij,ij->i', x, x))
+    dots = np.einsum('ij,ij->i', x[1:], x[:-1])
+    flat = norms < 1e-3
+    either_flat = flat[1:] | flat[:-1]
+    similarity = dots / np.where(either_flat, 1.0, norms[1:] * norms[:-1])
+    similarity[either_flat] = (flat[1:] & flat[:-1])[either_flat]
+    return similarity
+
+
+def write_index(path, rows):
+    """Atomically write a shot index; its presence marks the episode as done."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=INDEX_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def extract_shots(video_path, output_dir, threshold=DEFAULT_THRESHOLD, frame_skip=1, decoder='opencv',
+                  block_size=256, jpeg_quality=90):
+    """Save the first sampled frame of every new shot to ``output_dir``; returns the index rows."""
+    os.makedirs(output_dir, exist_ok=True)
+    full_capture = cv2.VideoCapture(video_path)
+    rows = []
+    previous = None
+    try:
+        for indices, timestamps, thumbs in iter_thumbnail_blocks(video_path, frame_skip, decoder, block_size):
+            if previous is None:
+                # The first sampled frame has nothing to be a cut from
+                block, offset = thumbs, 1
+            else:
+                block, offset = np.concatenate([previous[None], thumbs]), 0
+            similarity = consecutive_similarity(block)
+            for position in np.flatnonzero(similarity < threshold):
+                frame_index = int(indices[position + offset])
+                # Cuts are sparse: seek to them instead of keeping full frames of the block
+                full_capture.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                ret, frame = full_capture.read()
+                if not ret:
+                    continue
+                filename = f'frame_{frame_index:06d}.jpg'
+                cv2.imwrite(os.path.join(output_dir, filename), frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+                timestamp = float(timestamps[position + offset])
+                rows.append({
+                    'file': filename,
+                    'frame': frame_index,
+                    'timestamp': f'{timestamp:.3f}',
+                    'time': format_table_time(timestamp),
+                    'similarity': f'{float(similarity[position]):.4f}'
+                })
+            previous = thumbs[-1].copy()
+    finally:
+        full_capture.release()
+    write_index(os.path.join(output_dir, INDEX_FILE), rows)
+    return rows
+
+
+def _extract_job(task):
+    video_path, output_dir, settings = task
+    start = time.perf_counter()
+    rows = extract_shots(video_path, output_dir, **settings)
+    return video_path, len(rows), time.perf_counter() - start
+
+
+def schema_tasks(collections):
+    """(video path, shot directory) of every episode of ``collections``."""
+    tasks = []
+    for collection in collections:
+        for episode, video_path in find_episodes(collection.content_dir, collection.naming_pattern):
+            tasks.append((video_path, os.path.join(collection.content_dir, str(episode), SHOTS_DIR)))
+    return tasks
+
+
+def run_episodes(tasks, workers=None, force=False, **settings):
+    """Extract the shots of every (video path, output dir) task, one process per episode."""
+    if not force:
+        done = [task for task in tasks if os.path.exists(os.path.join(task[1], INDEX_FILE))]
+        tasks = [task for task in tasks if task not in done]
+        if done:
+            print(f"Skipping {len(done)} episode(s) with a shot index (--force to redo them)")
+    jobs = [(video_path, output_dir, settings) for video_path, output_dir in tasks]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+
+    if workers == 1:
+        results = map(_extract_job, jobs)
+    else:
+        pool = multiprocessing.get_context('spawn').Pool(workers)
+        # Longest episodes first keeps the pool busy until the end
+        results = pool.imap_unordered(_extract_job, sorted(jobs, key=lambda job: -os.path.getsize(job[0])))
+    try:
+        for video_path, shots, seconds in results:
+            print(f"{video_path}: {shots} shots in {seconds:.1f}s")
+    finally:
+        if workers > 1:
+            pool.close()
+            pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Save one screenshot per shot of each episode')
+    parser.add_argument('videos', nargs='*', help='Videos to process instead of the schema collections')
+    parser.add_argument('--output', default='shots', help='Output root for videos given on the command line')
+    parser.add_argument('--schema', default=SCHEMA_PATH, help='Schema file listing the collections')
+    parser.add_argument('--collections', nargs='+', default=None, help='Only these collections (schema names)')
+    parser.add_argument('--workers', type=int, default=None, help='Episode processes (default: one per CPU)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Similarity to the previous sampled frame below which a new shot starts')
+    parser.add_argument('--frame-skip', type=int, default=1, help='Compare every n-th frame')
+    parser.add_argument('--decoder', default='opencv', choices=('opencv', 'ffmpeg'), help='Decode path')
+    parser.add_argument('--block-size', type=int, default=256, help='Thumbnails compared per batch')
+    parser.add_argument('--force', action='store_true', help='Redo episodes that already have a shot index')
+    args = parser.parse_args()
+
+    if args.videos:
+        tasks = [
+            (video, os.path.join(args.output, os.path.splitext(os.path.basename(video))[0]))
+            for video in args.videos
+        ]
+    else:
+        collections = load_schema(args.schema)
+        if args.collections:
+            unknown = set(args.collections) - {collection.name for collection in collections}
+            if unknown:
+                parser.error(f"unknown collection(s): {', '.join(sorted(unknown))}")
+            collections = [collection for collection in collections if collection.name in args.collections]
+        tasks = schema_tasks(collections)
+    if not tasks:
+        parser.error('No episodes found')
+
+    run_episodes(
+        tasks,
+        workers=args.workers,
+        force=args.force,
+        threshold=args.threshold,
+        frame_skip=args.frame_skip,
+        decoder=args.decoder,
+        block_size=args.block_size
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -25,50 +25,86 @@ def run_subprocess(cmd, **kwargs):
         raise RuntimeError(f"命令失敗：{' '.join(cmd)}\n{result.stderr}")
     return result
 
-def download_video(url):
-    downloads = ensure_downloads_dir()
-    print(f"→ 下載到：{downloads}")
-    # 列出可用格式
-    info = run_subprocess([YT_DLP_PATH, '-F', url, '--no-playlist'], capture_output=True)
-    print(info.stdout)
-    # 只抓最佳 MP4 影片（無音軌）
-    dl = run_subprocess([
+# 下載設定檔：target_height 為 OCR 需要的最低高度，None 表示最高畫質
+PROFILES = {
+    # OCR 與預覽只需要 720p：選不低於 720p 的最小解析度，沒有的話取低於它的最高解析度
+    'ocr': {'target_height': 720, 'concurrent_fragments': 8},
+    # 保留原始最高畫質
+    'source': {'target_height': None, 'concurrent_fragments': 8},
+}
+DEFAULT_PROFILE = 'ocr'
+
+# 檔名帶上影片 ID，已下載過的影片會被 yt-dlp 直接跳過
+OUTPUT_TEMPLATE = '%(title).150B [%(id)s].%(ext)s'
+PLAYLIST_OUTPUT_TEMPLATE = '%(playlist_index)03d-%(title).150B [%(id)s].%(ext)s'
+
+def format_args(profile=DEFAULT_PROFILE):
+    """依設定檔產生 yt-dlp 的格式選擇參數（-f 分層選擇 + -S 排序）。"""
+    settings = PROFILES[profile]
+    # 優先 MP4 純影像，其次任何純影像，最後才是含音軌的合併格式
+    args = ['-f', 'bv*[ext=mp4]/bv*/b']
+    if settings['target_height']:
+        # "+res:N"：不低於 N 的最小解析度，若都低於 N 則取最高者
+        args += ['-S', f"+res:{settings['target_height']},ext:mp4:m4a"]
+    else:
+        args += ['-S', 'res,ext:mp4:m4a']
+    return args
+
+def build_command(url, downloads, profile=DEFAULT_PROFILE, playlist=False):
+    """組出單次 yt-dlp 指令（不需要先用 -F 列出格式）。"""
+    settings = PROFILES[profile]
+    template = PLAYLIST_OUTPUT_TEMPLATE if playlist else OUTPUT_TEMPLATE
+    return [
         YT_DLP_PATH,
-        '--no-playlist',
-        '-f', 'bestvideo[ext=mp4]',
-        '-o', os.path.join(downloads, '%(title)s.%(ext)s'),
+        '--yes-playlist' if playlist else '--no-playlist',
+        *format_args(profile),
+        '-N', str(settings['concurrent_fragments']),
+        # 中斷後可從 .part 續傳
+        '--continue',
+        '--retries', '10',
+        '--fragment-retries', '10',
+        '--no-overwrites',
+        # 只輸出最終檔案路徑，已存在的檔案也會印出
+        '--print', 'after_move:filepath',
+        '-o', os.path.join(downloads, template),
         url
-    ], capture_output=True)
-    print(dl.stdout)
-    print("影片下載完成！")
+    ]
 
-def download_playlist(url):
+def download(url, profile=DEFAULT_PROFILE, playlist=False):
+    """下載影片或播放清單，回傳下載（或先前已下載）的檔案路徑列表。"""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown download profile: {profile} (expected one of {', '.join(PROFILES)})")
     downloads = ensure_downloads_dir()
-    print(f"→ 下載到：{downloads}")
-    # 列出可用格式
-    info = run_subprocess([YT_DLP_PATH, '-F', url, '--yes-playlist'], capture_output=True)
-    print(info.stdout)
-    # 只抓最佳 MP4 影片（無音軌）
-    dl = run_subprocess([
-        YT_DLP_PATH,
-        '--yes-playlist',
-        '-f', 'bestvideo[ext=mp4]',
-        '-o', os.path.join(downloads, '%(playlist_index)03d-%(title)s.%(ext)s'),
-        url
-    ], capture_output=True)
-    print(dl.stdout)
+    print(f"→ 下載到：{downloads}（設定檔：{profile}）")
+    dl = run_subprocess(build_command(url, downloads, profile, playlist), capture_output=True)
+    paths = [line.strip() for line in (dl.stdout or '').splitlines() if line.strip()]
+    for path in paths:
+        print(path)
+    return paths
+
+def download_video(url, profile=DEFAULT_PROFILE):
+    paths = download(url, profile)
+    print("影片下載完成！")
+    return paths
+
+def download_playlist(url, profile=DEFAULT_PROFILE):
+    paths = download(url, profile, playlist=True)
     print("清單下載完成！")
+    return paths
 
 if __name__ == '__main__':
-    if len(sys.argv) != 2:
-        print("Usage: python source_dl.py <video_or_playlist_url>")
-        sys.exit(1)
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Download a video or playlist with yt-dlp')
+    parser.add_argument('url', help='Video or playlist URL')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(PROFILES), help='Download profile')
+    args = parser.parse_args()
+
     if shutil.which(YT_DLP_PATH) is None:
         print(f"Error: `{YT_DLP_PATH}` not found. Please install yt-dlp.")
         sys.exit(1)
 
-    target = sys.argv[1]
-    if 'playlist' in target or 'list=' in target:
-        download_playlist(target)
+    if 'playlist' in args.url or 'list=' in args.url:
+        download_playlist(args.url, args.profile)
     else:
-        download_video(target)
+        download_video(args.url, args.profile)
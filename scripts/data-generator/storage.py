@@ -4,9 +4,16 @@ from datetime import datetime
 import os
 from id_generator import generate_frame_id
 
+# Trigram queries need at least three characters; shorter ones are scanned with LIKE
+MIN_INDEXED_QUERY = 3
+# Markers snippet() puts around a match; private-use characters never appear in OCR text
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+
 class Storage:
     def __init__(self, db_path='processing_state.db'):
         self.db_path = db_path
+        self.full_text = False
         self.init_db()
     
     def init_db(self):
@@ -27,12 +34,20 @@ class Storage:
                     processed_frames INTEGER,
                     last_timestamp REAL,
                     created_at TIMESTAMP,
-                    updated_at TIMESTAMP
+                    updated_at TIMESTAMP,
+                    checkpoint TEXT
                 )
             ''')
+            job_columns = {row[1] for row in cursor.execute('PRAGMA table_info(processing_jobs)')}
+            if 'checkpoint' not in job_columns:
+                cursor.execute('ALTER TABLE processing_jobs ADD COLUMN checkpoint TEXT')
             
-            # Drop existing frames table if exists
-            cursor.execute('DROP TABLE IF EXISTS frames')
+            # Rebuild frames tables from before TEXT ids and frame_index; keep current ones,
+            # so a restarted server can resume its jobs
+            frame_columns = {row[1]: row[2] for row in cursor.execute('PRAGMA table_info(frames)')}
+            if frame_columns and (frame_columns.get('id') != 'TEXT' or 'frame_index' not in frame_columns):
+                cursor.execute('DROP TABLE frames')
+                cursor.execute('DROP TABLE IF EXISTS frames_fts')
             
             # Create frames table with TEXT id
             cursor.execute('''
@@ -45,13 +60,62 @@ class Storage:
                     confidence REAL,
                     is_deleted BOOLEAN DEFAULT 0,
                     modified_text TEXT,
+                    frame_index INTEGER,
                     FOREIGN KEY (youtube_id) REFERENCES processing_jobs(youtube_id),
                     UNIQUE(youtube_id, frame_number)
                 )
             ''')
             
+            # Frame listings page through a job in frame order
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS frames_job_index
+                ON frames (youtube_id, frame_index)
+            ''')
+            
+            self.full_text = self._init_full_text(cursor)
             conn.commit()
     
+    @staticmethod
+    def _init_full_text(cursor):
+        """Create the trigram index over frame texts and its sync triggers; False if FTS5 is unavailable.
+        
+        The index stores no text of its own (``content='frames'``): it maps
+        trigrams to frame rowids, and the triggers keep it in step with every
+        insert, delete and text edit. An index created over existing frames
+        is built from them once.
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'frames_fts'"
+        ).fetchone()
+        try:
+            cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS frames_fts
+                USING fts5(text, modified_text, content='frames', content_rowid='rowid', tokenize='trigram')
+            ''')
+        except sqlite3.OperationalError as e:
+            # SQLite without FTS5, or older than 3.34 (no trigram tokenizer)
+            print(f"Full-text search disabled: {e}")
+            return False
+        cursor.executescript('''
+            CREATE TRIGGER IF NOT EXISTS frames_fts_insert AFTER INSERT ON frames BEGIN
+                INSERT INTO frames_fts (rowid, text, modified_text)
+                VALUES (new.rowid, new.text, new.modified_text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS frames_fts_delete AFTER DELETE ON frames BEGIN
+                INSERT INTO frames_fts (frames_fts, rowid, text, modified_text)
+                VALUES ('delete', old.rowid, old.text, old.modified_text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS frames_fts_update AFTER UPDATE OF text, modified_text ON frames BEGIN
+                INSERT INTO frames_fts (frames_fts, rowid, text, modified_text)
+                VALUES ('delete', old.rowid, old.text, old.modified_text);
+                INSERT INTO frames_fts (rowid, text, modified_text)
+                VALUES (new.rowid, new.text, new.modified_text);
+            END;
+        ''')
+        if not exists:
+            cursor.execute("INSERT INTO frames_fts (frames_fts) VALUES ('rebuild')")
+        return True
+    
     def extract_youtube_id(self, url):
         """Extract YouTube video ID from URL."""
         if 'youtu.be/' in url:
@@ -61,10 +125,20 @@ class Storage:
             return parse_qs(urlparse(url).query)['v'][0]
         return url  # Return as is if not a YouTube URL
     
-    def save_job_state(self, url, status, frame_skip, confidence_threshold, current_progress):
-        """Save or update job processing state"""
+    def save_job_state(self, url, status, frame_skip, confidence_threshold, current_progress, checkpoint=None):
+        """Save or update job processing state
+        
+        A ``checkpoint`` (see ``process_video``'s ``on_checkpoint``) is stored
+        in the same row update, so the row and its checkpoint always match;
+        without one the stored checkpoint is kept.
+        """
         youtube_id = self.extract_youtube_id(url)
         now = datetime.now()
+        checkpoint_json = None
+        if checkpoint is not None:
+            # NumPy scalars and arrays (OCR confidences, bboxes) as plain JSON
+            checkpoint_json = json.dumps(checkpoint, ensure_ascii=False,
+                                         default=lambda value: value.tolist())
         
         with sqlite3.connect(self.db_path) as conn:
             cursor = conn.cursor()
@@ -79,7 +153,7 @@ class Storage:
                     UPDATE processing_jobs
                     SET status = ?, frame_skip = ?, confidence_threshold = ?,
                         current_frame = ?, total_frames = ?, processed_frames = ?,
-                        last_timestamp = ?, updated_at = ?
+                        last_timestamp = ?, updated_at = ?, checkpoint = COALESCE(?, checkpoint)
                     WHERE youtube_id = ?
                 ''', (
                     status,
@@ -90,6 +164,7 @@ class Storage:
                     current_progress.get('processed_frames', 0),
                     current_progress.get('timestamp'),
                     now,
+                    checkpoint_json,
                     youtube_id
                 ))
             else:
@@ -98,8 +173,8 @@ class Storage:
                     INSERT INTO processing_jobs
                     (youtube_id, url, status, frame_skip, confidence_threshold,
                      current_frame, total_frames, processed_frames, last_timestamp,
-                     created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     created_at, updated_at, checkpoint)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     youtube_id,
                     url,
@@ -111,14 +186,26 @@ class Storage:
                     current_progress.get('processed_frames', 0),
                     current_progress.get('timestamp'),
                     now,
-                    now
+                    now,
+                    checkpoint_json
                 ))
             
             conn.commit()
     
+    @staticmethod
+    def frame_index(frame_number):
+        """Frame number of a 'frame_XXXXXX.jpg' name, or None."""
+        try:
+            return int(frame_number.split('_')[1].split('.')[0])
+        except (IndexError, ValueError):
+            return None
+    
     def save_frame(self, youtube_id, frame_data):
         """Save frame information"""
         with sqlite3.connect(self.db_path) as conn:
+            # REPLACE only fires the delete trigger of the row it replaces with recursive triggers on;
+            # without it the full-text index would keep the old text
+            conn.execute('PRAGMA recursive_triggers = ON')
             cursor = conn.cursor()
             
             # Generate frame ID
@@ -143,15 +230,16 @@ class Storage:
             
             cursor.execute('''
                 INSERT OR REPLACE INTO frames
-                (id, youtube_id, frame_number, text, timestamp, confidence)
-                VALUES (?, ?, ?, ?, ?, ?)
+                (id, youtube_id, frame_number, text, timestamp, confidence, frame_index)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (
                 frame_id,
                 youtube_id,
                 frame_data['frame'],
                 frame_data.get('text'),
                 timestamp,
-                frame_data.get('confidence', 0.0)
+                frame_data.get('confidence', 0.0),
+                self.frame_index(frame_number)
             ))
             
             conn.commit()
@@ -182,8 +270,44 @@ class Storage:
                 cursor.execute(query, params)
                 conn.commit()
     
-    def get_job_state(self, url):
-        """Get job state by YouTube URL"""
+    def delete_frames_in_ranges(self, youtube_id, frame_ranges):
+        """Delete a job's frames inside half-open (start, end) frame ranges before they are reprocessed."""
+        with sqlite3.connect(self.db_path) as conn:
+            cursor = conn.cursor()
+            deleted = 0
+            
+            for start, end in frame_ranges:
+                query = """
+                    DELETE FROM frames
+                    WHERE youtube_id = ?
+                    AND frame_index >= ?
+                """
+                params = [youtube_id, start]
+                if end is not None:
+                    query += " AND frame_index < ?"
+                    params.append(end)
+                cursor.execute(query, params)
+                deleted += cursor.rowcount
+            
+            conn.commit()
+            return deleted
+    
+    def frame_edits(self, youtube_id):
+        """Reviewer edits of a job's frames: {frame_index: (modified_text, is_deleted)}."""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute("""
+                SELECT frame_index, modified_text, is_deleted
+                FROM frames
+                WHERE youtube_id = ? AND (COALESCE(modified_text, '') != '' OR is_deleted)
+            """, (youtube_id,)).fetchall()
+        return {row[0]: (row[1], bool(row[2])) for row in rows}
+    
+    def get_job_state(self, url, include_frames=True):
+        """Get job state by YouTube URL.
+        
+        Without ``include_frames`` only the job row is loaded; use
+        ``list_frames`` to page through the frames.
+        """
         youtube_id = self.extract_youtube_id(url)
         
         with sqlite3.connect(self.db_path) as conn:
@@ -199,6 +323,11 @@ class Storage:
             job = cursor.fetchone()
             if not job:
                 return None
+            job = dict(job)
+            if job.get('checkpoint'):
+                job['checkpoint'] = json.loads(job['checkpoint'])
+            if not include_frames:
+                return {'job': job}
             
             # Get frames
             cursor.execute('''
@@ -211,7 +340,7 @@ class Storage:
             frames = cursor.fetchall()
             
             return {
-                'job': dict(job),
+                'job': job,
                 'frames': [dict(frame) for frame in frames]
             }
     
@@ -243,14 +372,12 @@ class Storage:
                 
                 if last_frame_number:
                     # Extract frame number from the format 'frame_XXXXXX.jpg'
-                    try:
-                        last_number = int(last_frame_number.split('_')[1].split('.')[0])
-                        query += " AND CAST(SUBSTR(frame_number, 7, 6) AS INTEGER) > ?"
+                    last_number = self.frame_index(last_frame_number)
+                    if last_number is not None:
+                        query += " AND frame_index > ?"
                         params.append(last_number)
-                    except (IndexError, ValueError):
-                        pass
                 
-                query += " ORDER BY CAST(SUBSTR(frame_number, 7, 6) AS INTEGER)"
+                query += " ORDER BY frame_index"
                 
                 cursor = conn.execute(query, params)
                 frames = []
@@ -267,4 +394,189 @@ class Storage:
                 return frames
         except Exception as e:
             print(f"Error getting new frames: {str(e)}")
-            return [] 
\ No newline at end of file
+            return [] 
+    
+    def count_frames(self, youtube_id):
+        """Number of stored frames of a job."""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute('SELECT COUNT(*) FROM frames WHERE youtube_id = ?', (youtube_id,)).fetchone()[0]
+    
+    def list_frames(self, youtube_id, cursor=None, limit=100, descending=False,
+                    deleted=None, edited=None, min_confidence=None, max_confidence=None):
+        """One page of a job's frames in frame order, keyed on ``frame_index``.
+        
+        ``cursor`` is the ``next_cursor`` of the previous page (the last
+        frame index it returned); the next page continues strictly after it
+        in the requested direction. ``deleted``/``edited`` filter on the
+        deleted flag and on having a modified text, the confidence bounds
+        are inclusive. Returns ``(frames, next_cursor)``; ``next_cursor`` is
+        None on the last page.
+        """
+        query = """
+            SELECT id, frame_number, text, modified_text, timestamp, confidence, is_deleted, frame_index
+            FROM frames
+            WHERE youtube_id = ?
+        """
+        params = [youtube_id]
+        
+        if cursor is not None:
+            query += " AND frame_index < ?" if descending else " AND frame_index > ?"
+            params.append(cursor)
+        if deleted is not None:
+            query += " AND is_deleted = ?"
+            params.append(1 if deleted else 0)
+        if edited is not None:
+            query += " AND COALESCE(modified_text, '') != ''" if edited else " AND COALESCE(modified_text, '') = ''"
+        if min_confidence is not None:
+            query += " AND confidence >= ?"
+            params.append(min_confidence)
+        if max_confidence is not None:
+            query += " AND confidence <= ?"
+            params.append(max_confidence)
+        
+        # One extra row tells whether another page follows
+        query += f" ORDER BY frame_index {'DESC' if descending else 'ASC'} LIMIT ?"
+        params.append(limit + 1)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(query, params).fetchall()
+        
+        frames = [
+            {
+                'id': row[0],
+                'frame_number': row[1],
+                'text': row[2],
+                'modified_text': row[3],
+                'timestamp': row[4],
+                'confidence': row[5],
+                'is_deleted': bool(row[6])
+            }
+            for row in rows[:limit]
+        ]
+        next_cursor = rows[limit - 1][7] if len(rows) > limit else None
+        return frames, next_cursor
+    
+    @staticmethod
+    def _phrase(query):
+        """``query`` as one FTS5 phrase: matches it as a substring, operators and all."""
+        return '"' + query.replace('"', '""') + '"'
+    
+    @staticmethod
+    def _mark(text, query):
+        """``text`` with the first case-insensitive occurrence of ``query`` between the match markers."""
+        start = (text or '').lower().find(query.lower())
+        if start < 0:
+            return text
+        end = start + len(query)
+        return text[:start] + MATCH_START + text[start:end] + MATCH_END + text[end:]
+    
+    def search_frames(self, query, youtube_id=None, limit=50, offset=0, include_deleted=False):
+        """Frames of every job (or of ``youtube_id``) whose text or edited text contains ``query``.
+        
+        Best matches first. Each frame carries a ``snippet`` of the matching
+        text with the match between ``MATCH_START`` and ``MATCH_END``. Queries
+        shorter than three characters cannot use the trigram index and are
+        answered by a scan in frame order.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        columns = """
+            f.id, f.youtube_id, f.frame_number, f.text, f.modified_text,
+            f.timestamp, f.confidence, f.is_deleted
+        """
+        params = []
+        if self.full_text and len(query) >= MIN_INDEXED_QUERY:
+            sql = f"""
+                SELECT {columns}, snippet(frames_fts, -1, '{MATCH_START}', '{MATCH_END}', '…', 24)
+                FROM frames_fts
+                JOIN frames f ON f.rowid = frames_fts.rowid
+                WHERE frames_fts MATCH ?
+            """
+            params.append(self._phrase(query))
+            order = "rank"
+        else:
+            pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            sql = f"""
+                SELECT {columns}, NULL
+                FROM frames f
+                WHERE (f.text LIKE ? ESCAPE '\\' OR f.modified_text LIKE ? ESCAPE '\\')
+            """
+            params.extend([pattern, pattern])
+            order = "f.youtube_id, f.frame_index"
+        if youtube_id is not None:
+            sql += " AND f.youtube_id = ?"
+            params.append(youtube_id)
+        if not include_deleted:
+            sql += " AND f.is_deleted = 0"
+        sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(sql, params).fetchall()
+        
+        results = []
+        for row in rows:
+            snippet = row[8]
+            if snippet is None:
+                matching = row[4] if row[4] and query.lower() in row[4].lower() else row[3]
+                snippet = self._mark(matching, query)
+            results.append({
+                'id': row[0],
+                'youtube_id': row[1],
+                'frame_number': row[2],
+                'text': row[3],
+                'modified_text': row[4],
+                'timestamp': row[5],
+                'confidence': row[6],
+                'is_deleted': bool(row[7]),
+                'snippet': snippet
+            })
+        return results
+    
+    def find_duplicate_lines(self, youtube_id):
+        """Lines of a job that other jobs already have, to catch an episode exported twice.
+        
+        A line is the edited text if there is one, else the OCR text, as
+        in the CSV export; deleted frames and lines shorter than three
+        characters (interjections) are ignored. Returns one entry per line,
+        in frame order, with the ``youtube_id``/``frame_number`` of each
+        frame that has it elsewhere.
+        """
+        line = "COALESCE(NULLIF(f.modified_text, ''), f.text)"
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(f"""
+                SELECT f.frame_number, {line}
+                FROM frames f
+                WHERE f.youtube_id = ? AND f.is_deleted = 0
+                ORDER BY f.frame_index
+            """, (youtube_id,)).fetchall()
+            
+            duplicates = []
+            for frame_number, text in rows:
+                if not text or len(text) < MIN_INDEXED_QUERY:
+                    continue
+                if self.full_text:
+                    # The index narrows the candidates to frames containing the line
+                    matches = conn.execute(f"""
+                        SELECT f.youtube_id, f.frame_number
+                        FROM frames_fts
+                        JOIN frames f ON f.rowid = frames_fts.rowid
+                        WHERE frames_fts MATCH ? AND {line} = ?
+                        AND f.youtube_id != ? AND f.is_deleted = 0
+                        ORDER BY f.youtube_id, f.frame_index
+                    """, (self._phrase(text), text, youtube_id)).fetchall()
+                else:
+                    matches = conn.execute(f"""
+                        SELECT f.youtube_id, f.frame_number
+                        FROM frames f
+                        WHERE {line} = ? AND f.youtube_id != ? AND f.is_deleted = 0
+                        ORDER BY f.youtube_id, f.frame_index
+                    """, (text, youtube_id)).fetchall()
+                if matches:
+                    duplicates.append({
+                        'frame_number': frame_number,
+                        'text': text,
+                        'matches': [{'youtube_id': match[0], 'frame_number': match[1]} for match in matches]
+                    })
+            return duplicates
@@ -0,0 +1,161 @@
+"""Cheap subtitle-presence test on the subtitle band, run before OCR.
+
+Our subtitles are white (low-saturation, bright) glyphs with a dark
+outline. ``subtitle_score`` measures that stroke pattern on a downscaled
+band with a handful of whole-array NumPy/OpenCV operations:
+
+- *outlined fill*: bright, grey pixels within a couple of pixels of a dark
+  one; the white fill of outlined text is almost all like that, a white
+  shirt or sky is not,
+- *stroke width*: how much of the fill survives an erosion wider than a
+  glyph stroke (text strokes vanish, large bright areas do not),
+- *edge density*: strong horizontal gradients in the rows holding the
+  outlined fill, which glyphs produce many of,
+- *row concentration*: the outlined fill of a subtitle sits in one
+  horizontal strip of about a text line's height.
+
+The score is the outlined fill inside the best strip, per band width,
+scaled by the thin-stroke fraction and edge density. Frames scoring below
+the detector's threshold skip OCR.
+
+The threshold is set from a target false-negative rate. ``python -m
+benchmarks.bench_subtitle_detector --save`` scores synthetic episodes,
+stores the score distribution of frames with a subtitle, and
+``SubtitleDetector.load(false_negative_rate=...)`` picks the threshold
+that rejects at most that fraction of them.
+"""
+import json
+import os
+
+import cv2
+import numpy as np
+
+CALIBRATION_PATH = os.path.join('model_cache', 'subtitle_detector.json')
+# Band width features are computed at; sizes below are in these pixels
+BAND_WIDTH = 480
+FILL_LEVEL = 185
+FILL_MAX_CHROMA = 60
+OUTLINE_LEVEL = 90
+OUTLINE_REACH = 2
+MAX_STROKE = 7
+EDGE_LEVEL = 80
+# Conservative threshold when no calibration is available
+DEFAULT_THRESHOLD = 0.0006
+
+_outline_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * OUTLINE_REACH + 1, 2 * OUTLINE_REACH + 1))
+_stroke_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (MAX_STROKE, MAX_STROKE))
+
+
+def band_features(band):
+    """Feature values of one subtitle band (BGR or grayscale crop)."""
+    height, width = band.shape[:2]
+    if width > BAND_WIDTH:
+        height = max(1, round(height * BAND_WIDTH / width))
+        band = cv2.resize(band, (BAND_WIDTH, height), interpolation=cv2.INTER_AREA)
+        width = BAND_WIDTH
+    if band.ndim == 3:
+        gray = cv2.cvtColor(band, cv2.COLOR_BGR2GRAY)
+        chroma = band.max(axis=2).astype(np.int16) - band.min(axis=2)
+        fill = (gray >= FILL_LEVEL) & (chroma <= FILL_MAX_CHROMA)
+    else:
+        gray = band
+        fill = gray >= FILL_LEVEL
+
+    dark = (gray <= OUTLINE_LEVEL).view(np.uint8)
+    outlined = fill & cv2.dilate(dark, _outline_kernel).view(bool)
+    fill_count = int(np.count_nonzero(fill))
+    if not fill_count:
+        return {'outlined': 0.0, 'thin': 0.0, 'edges': 0.0, 'strip': 0.0}
+
+    # Fill that survives an erosion wider than a stroke is not text
+    thick = cv2.erode(fill.view(np.uint8), _stroke_kernel)
+    thin = 1.0 - np.count_nonzero(thick) / fill_count
+
+    # Best strip of about a text line's height
+    rows = np.count_nonzero(outlined, axis=1).astype(np.float64)
+    strip_height = max(3, height // 3)
+    windows = np.convolve(rows, np.ones(strip_height), mode='valid') if len(rows) >= strip_height else rows.sum(keepdims=True)
+    top = int(np.argmax(windows))
+    strip = slice(top, top + strip_height)
+
+    gradient = np.abs(np.diff(gray[strip].astype(np.int16), axis=1))
+    edges = np.count_nonzero(gradient >= EDGE_LEVEL) / max(1, gradient.size)
+    return {
+        'outlined': float(np.count_nonzero(outlined)) / width,
+        'thin': float(thin),
+        'edges': float(edges),
+        'strip': float(windows[top]) / width,
+    }
+
+
+def subtitle_score(band):
+    """Subtitle-presence score of a band; higher means more subtitle-like."""
+    features = band_features(band)
+    return features['strip'] * features['thin'] * min(1.0, features['edges'] * 10)
+
+
+class SubtitleDetector:
+    """Decide whether a subtitle band is worth OCR.
+
+    ``detector(band)`` is True when the band may hold a subtitle. ``seen``
+    and ``rejected`` count the calls, for logging how much OCR was saved.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self.seen = 0
+        self.rejected = 0
+
+    def __call__(self, band):
+        self.seen += 1
+        if subtitle_score(band) >= self.threshold:
+            return True
+        self.rejected += 1
+        return False
+
+    @classmethod
+    def load(cls, false_negative_rate=0.01, path=CALIBRATION_PATH):
+        """Detector whose threshold rejects about ``false_negative_rate`` of subtitle frames.
+
+        Falls back to ``DEFAULT_THRESHOLD`` without a calibration file.
+        """
+        if not 0 <= false_negative_rate < 1:
+            raise ValueError(f"False-negative rate must be in [0, 1): {false_negative_rate}")
+        try:
+            with open(path, encoding='utf-8') as f:
+                calibration = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        return cls(threshold_for(calibration['positive_quantiles'], false_negative_rate))
+
+    def __repr__(self):
+        return f'SubtitleDetector(threshold={self.threshold:.4f})'
+
+
+def threshold_for(positive_quantiles, false_negative_rate):
+    """Threshold at the ``false_negative_rate`` quantile of the positive scores.
+
+    ``positive_quantiles`` are the 0%..100% percentiles of the scores of
+    bands that do hold a subtitle; the threshold is rounded down so the
+    rejected fraction never exceeds the target.
+    """
+    quantiles = np.asarray(positive_quantiles, dtype=np.float64)
+    position = false_negative_rate * (len(quantiles) - 1)
+    return float(quantiles[int(np.floor(position))])
+
+
+def save_calibration(positive_scores, negative_scores, path=CALIBRATION_PATH, points=1001):
+    """Store the score percentiles of positive (and, for reference, negative) bands."""
+    levels = np.linspace(0, 100, points)
+    calibration = {
+        'positives': len(positive_scores),
+        'negatives': len(negative_scores),
+        'positive_quantiles': np.percentile(positive_scores, levels).tolist(),
+        'negative_quantiles': np.percentile(negative_scores, levels).tolist() if len(negative_scores) else [],
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(calibration, f)
+    os.replace(tmp_path, path)
+    return calibration
@@ -0,0 +1,306 @@
+"""Fast path for videos that carry text subtitle streams (ASS, SRT, mov_text).
+
+When a video has a text subtitle track there is nothing to OCR: the cues are
+extracted with ffmpeg and turned directly into result rows, with frame numbers
+derived from the video frame rate. OCR stays the fallback for hardsubbed video.
+
+Usage:
+    python subtitle_streams.py <video> <output.csv> [--episode 1] [--collection mygo]
+"""
+import argparse
+import json
+import math
+import os
+import re
+import subprocess
+from fractions import Fraction
+
+from id_generator import generate_frame_id
+from frame_ranges import overlaps_ranges
+
+FFMPEG_PATH = "ffmpeg"
+FFPROBE_PATH = "ffprobe"
+
+TEXT_SUBTITLE_CODECS = {'ass', 'ssa', 'subrip', 'srt', 'mov_text', 'webvtt', 'text'}
+
+# Languages and title hints in order of preference (Traditional Chinese first)
+PREFERRED_LANGUAGES = ('cht', 'zht', 'chi', 'zho', 'chs', 'zh', 'jpn', 'ja')
+TRADITIONAL_HINTS = ('cht', 'tc', '繁', 'big5', 'hant', 'traditional')
+
+SRT_TIME = r'(\d+):(\d{2}):(\d{2})[,.](\d{3})'
+SRT_CUE_PATTERN = re.compile(
+    SRT_TIME + r'\s*-->\s*' + SRT_TIME + r'[^\n]*\n(.*?)(?:\n\s*\n|\Z)', re.S
+)
+FFMPEG_STREAM_PATTERN = re.compile(
+    r'Stream #0:(\d+)(?:\[\w+\])?(?:\((\w+)\))?: (Video|Subtitle): (\w+)(.*)'
+)
+TAG_PATTERN = re.compile(r'\{[^}]*\}|<[^>]+>')
+
+
+def _probe_with_ffprobe(video_path):
+    result = subprocess.run([
+        FFPROBE_PATH, '-v', 'error', '-print_format', 'json', '-show_streams', video_path
+    ], capture_output=True, encoding='utf-8', errors='replace')
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout).get('streams', [])
+
+
+def _probe_with_ffmpeg(video_path):
+    """Parse the stream list that `ffmpeg -i` prints when ffprobe is missing."""
+    result = subprocess.run(
+        [FFMPEG_PATH, '-hide_banner', '-i', video_path],
+        capture_output=True, encoding='utf-8', errors='replace'
+    )
+    streams = []
+    lines = result.stderr.splitlines()
+    for i, line in enumerate(lines):
+        match = FFMPEG_STREAM_PATTERN.search(line)
+        if not match:
+            continue
+        index, language, kind, codec, rest = match.groups()
+        stream = {'index': int(index), 'codec_type': kind.lower(), 'codec_name': codec, 'tags': {}}
+        if language:
+            stream['tags']['language'] = language
+        fps = re.search(r'([\d.]+) fps', rest)
+        if fps:
+            stream['avg_frame_rate'] = fps.group(1)
+        # Stream metadata (e.g. title) follows on indented lines
+        for meta in lines[i + 1:]:
+            if not meta.startswith('      ') or 'Stream #' in meta:
+                break
+            key, _, value = meta.strip().partition(':')
+            if value.strip():
+                stream['tags'][key.strip().lower()] = value.strip()
+        streams.append(stream)
+    return streams
+
+
+def probe_streams(video_path):
+    """Return ffprobe-style stream descriptions for a video."""
+    try:
+        return _probe_with_ffprobe(video_path)
+    except (OSError, RuntimeError, ValueError):
+        return _probe_with_ffmpeg(video_path)
+
+
+def parse_frame_rate(value):
+    """Parse an ffprobe rate such as '24000/1001' or '23.98'."""
+    try:
+        rate = float(Fraction(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return rate or None
+
+
+def video_frame_rate(streams):
+    """Frame rate of the first video stream, if known."""
+    for stream in streams:
+        if stream.get('codec_type') == 'video':
+            return parse_frame_rate(stream.get('avg_frame_rate')) or parse_frame_rate(stream.get('r_frame_rate'))
+    return None
+
+
+def text_subtitle_streams(streams):
+    """Filter the text (not bitmap) subtitle streams."""
+    return [
+        s for s in streams
+        if s.get('codec_type') == 'subtitle' and s.get('codec_name') in TEXT_SUBTITLE_CODECS
+    ]
+
+
+def choose_subtitle_stream(streams, preferred_languages=PREFERRED_LANGUAGES):
+    """Pick the best text subtitle stream, preferring Traditional Chinese."""
+    candidates = text_subtitle_streams(streams)
+    if not candidates:
+        return None
+
+    def rank(stream):
+        tags = {k.lower(): str(v).lower() for k, v in stream.get('tags', {}).items()}
+        language = tags.get('language', '')
+        title = tags.get('title', '')
+        traditional = any(hint in title for hint in TRADITIONAL_HINTS)
+        try:
+            language_rank = preferred_languages.index(language)
+        except ValueError:
+            language_rank = len(preferred_languages)
+        return (not traditional, language_rank, stream['index'])
+
+    return min(candidates, key=rank)
+
+
+def clean_cue_text(text):
+    """Strip ASS override blocks and HTML-style tags, and join lines."""
+    text = TAG_PATTERN.sub('', text.replace('\\N', '\n').replace('\\n', '\n'))
+    return ' '.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def parse_srt(data):
+    """Parse SRT text into [(start_seconds, end_seconds, text)]."""
+    data = data.replace('\r\n', '\n').replace('\r', '\n')
+    cues = []
+    for match in SRT_CUE_PATTERN.finditer(data):
+        h1, m1, s1, ms1, h2, m2, s2, ms2, body = match.groups()
+        start = int(h1) * 3600 + int(m1) * 60 + int(s1) + int(ms1) / 1000
+        end = int(h2) * 3600 + int(m2) * 60 + int(s2) + int(ms2) / 1000
+        text = clean_cue_text(body)
+        if text:
+            cues.append((start, end, text))
+    return cues
+
+
+def merge_simultaneous_cues(cues):
+    """Join events shown at the same time (e.g. a two-line subtitle split in two)."""
+    merged = []
+    for start, end, text in sorted(cues, key=lambda c: (c[0], c[1])):
+        if merged and merged[-1][0] == start and merged[-1][1] == end:
+            if text not in merged[-1][2]:
+                merged[-1] = (start, end, f"{merged[-1][2]} {text}")
+            continue
+        merged.append((start, end, text))
+    return merged
+
+
+def extract_cues(video_path, stream_index):
+    """Extract the cues of one subtitle stream through ffmpeg's SRT encoder."""
+    result = subprocess.run([
+        FFMPEG_PATH, '-v', 'error', '-nostdin', '-i', video_path,
+        '-map', f'0:{stream_index}', '-f', 'srt', 'pipe:1'
+    ], capture_output=True, encoding='utf-8', errors='replace')
+    if result.returncode != 0:
+        raise RuntimeError(f"Subtitle extraction failed: {result.stderr}")
+    return merge_simultaneous_cues(parse_srt(result.stdout))
+
+
+def cue_frames(start, end, fps):
+    """First and last frame on which a cue is shown."""
+    start_frame = math.ceil(start * fps - 1e-6)
+    end_frame = max(start_frame, math.ceil(end * fps - 1e-6) - 1)
+    return start_frame, end_frame
+
+
+def format_table_time(seconds):
+    """Format seconds as HH:MM:SS,mmm like tables/*.csv."""
+    ms = int(round(seconds * 1000))
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def parse_table_time(value):
+    """Parse HH:MM:SS,mmm from tables/*.csv into seconds."""
+    clock, _, millis = value.strip().partition(',')
+    hours, minutes, seconds = (int(part) for part in clock.split(':'))
+    return hours * 3600 + minutes * 60 + seconds + int(millis or 0) / 1000
+
+
+def cues_to_rows(cues, fps, collection='mygo', episode='1'):
+    """Convert cues to id,score,text,episode,start_time,end_time,start_frame,end_frame rows."""
+    rows = []
+    for start, end, text in cues:
+        start_frame, end_frame = cue_frames(start, end, fps)
+        rows.append({
+            'id': generate_frame_id(collection, start_frame, start, text),
+            'score': 1.0,
+            'text': text,
+            'episode': episode,
+            'start_time': format_table_time(start),
+            'end_time': format_table_time(end),
+            'start_frame': start_frame,
+            'end_frame': end_frame
+        })
+    return rows
+
+
+def find_subtitle_track(video_path):
+    """Return (stream, fps) for the preferred text subtitle stream, or (None, fps)."""
+    streams = probe_streams(video_path)
+    return choose_subtitle_stream(streams), video_frame_rate(streams)
+
+
+def iter_cue_results(video_path, stream, fps, start_frame=0, progress_callback=None,
+                     total_frames=None, save_frames=True, on_frame_saved=None, ranges=None,
+                     frames_dir='frames'):
+    """Yield process_video-style results for each cue of a subtitle stream.
+
+    Results carry ``end_frame``/``end_timestamp`` so spans end with the cue
+    instead of at the next line. A full frame is saved for each cue so the
+    review grid has something to show (in ``frames_dir``);
+    ``on_frame_saved(frame_path, image)`` is called after each one is written. ``ranges`` (normalized, see
+    ``frame_ranges``) keeps only cues overlapping them.
+    """
+    import cv2
+
+    language = stream.get('tags', {}).get('language', 'und')
+    cues = extract_cues(video_path, stream['index'])
+    print(f"Using embedded subtitle stream #{stream['index']} ({stream.get('codec_name')}, {language}): {len(cues)} cues")
+
+    cap = cv2.VideoCapture(video_path) if save_frames else None
+    try:
+        for start, end, text in cues:
+            first, last = cue_frames(start, end, fps)
+            if first < start_frame:
+                continue
+            if ranges and not overlaps_ranges(first, last, ranges):
+                continue
+            frame_name = f'frame_{first:06d}.jpg'
+            if cap is not None:
+                # Grab a frame from the middle of the cue for the review grid
+                cap.set(cv2.CAP_PROP_POS_FRAMES, (first + last) // 2)
+                ret, frame = cap.read()
+                if ret:
+                    frame_path = os.path.join(frames_dir, frame_name)
+                    cv2.imwrite(frame_path, frame)
+                    if on_frame_saved:
+                        on_frame_saved(frame_path, frame)
+
+            if progress_callback:
+                progress_callback(
+                    frame=frame_name,
+                    text=text,
+                    timestamp=start,
+                    total_frames=total_frames,
+                    processed_frames=last
+                )
+            yield {
+                'frame': frame_name,
+                'timestamp': start,
+                'end_frame': f'frame_{last:06d}.jpg',
+                'end_timestamp': end,
+                'texts': [{'text': text, 'confidence': 1.0, 'bbox': None, 'lang': language}]
+            }
+    finally:
+        if cap is not None:
+            cap.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export embedded text subtitles as result rows')
+    parser.add_argument('video', help='Video file with a text subtitle stream')
+    parser.add_argument('output', help='CSV file to write')
+    parser.add_argument('--episode', default='1', help='Episode number')
+    parser.add_argument('--collection', default='mygo', help='Collection name used for IDs')
+    parser.add_argument('--stream', type=int, default=None, help='Stream index (default: best text stream)')
+    args = parser.parse_args()
+
+    from result_writer import IncrementalCSVWriter
+
+    streams = probe_streams(args.video)
+    fps = video_frame_rate(streams)
+    if args.stream is not None:
+        stream = next((s for s in streams if s['index'] == args.stream), None)
+    else:
+        stream = choose_subtitle_stream(streams)
+    if stream is None or fps is None:
+        print("No text subtitle stream found; use OCR instead.")
+        raise SystemExit(1)
+
+    rows = cues_to_rows(extract_cues(args.video, stream['index']), fps, args.collection, args.episode)
+    if os.path.exists(args.output):
+        os.remove(args.output)
+    with IncrementalCSVWriter(args.output) as writer:
+        for row in rows:
+            writer.write_row(row)
+    print(f"Wrote {len(rows)} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
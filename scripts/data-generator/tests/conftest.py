@@ -1,13 +1,55 @@
 import pytest
+import numpy as np
+import cv2
 import sys
 from pathlib import Path
 
 # Add parent directory to Python path for all tests
 sys.path.append(str(Path(__file__).parent.parent))
 
+BOX = [[0, 0], [10, 0], [10, 10], [0, 10]]
+
+class FakeReader:
+    """OCR reader stand-in: ``line(frame_index)`` gives the (text, confidence) read on a frame.
+
+    ``process_video`` seeks it to each frame before ``readtext``; ``frames``
+    records the seeked frames and ``calls`` counts ``readtext`` calls.
+    """
+    def __init__(self, line=lambda frame_index: (f'line {frame_index}', 0.9)):
+        self.line = line
+        self.frame_index = 0
+        self.frames = []
+        self.calls = 0
+
+    def seek_frame(self, frame_index):
+        self.frame_index = frame_index
+        self.frames.append(frame_index)
+
+    def readtext(self, image):
+        self.calls += 1
+        text, confidence = self.line(self.frame_index)
+        return [(BOX, text, np.float64(confidence))]
+
+def write_video(path, frames=120, value=lambda i: i * 2):
+    """Write a 64x48 30 fps clip whose frame ``i`` is solid gray ``value(i)``."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), 30, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), value(i), dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+@pytest.fixture
+def sample_video(tmp_path):
+    """Factory: ``sample_video(frames=..., value=...)`` writes tmp_path/sample.mp4 and returns its path."""
+    def make(frames=120, value=lambda i: i * 2):
+        return write_video(tmp_path / 'sample.mp4', frames, value)
+    return make
+
 @pytest.fixture(autouse=True)
 def setup_test_env():
     """Setup test environment for all tests."""
     # You can add any common setup code here
     yield
-    # You can add any common cleanup code here 
\ No newline at end of file
+    # You can add any common cleanup code here
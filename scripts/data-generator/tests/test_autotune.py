@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from autotune import cheapest, load_truth, pareto_front, settings_grid, sweep
+from tests.conftest import FakeReader
+
+LINES = ['傳訊息也都沒有回', '我要退出 CRYCHIC', '為什麼要演奏春日影']
+
+def line(frame_index):
+    """A new line every 30 frames."""
+    return LINES[frame_index // 30], 0.9
+
+def test_load_truth_clips_and_shifts(tmp_path):
+    table = tmp_path / 'table.csv'
+    table.write_text(
+        'id,score,text,episode,start_time,end_time,start_frame,end_frame\n'
+        'a,1.0,first,1,"00:09:58,000","00:10:01,500",14352,14436\n'
+        'b,1.0,second,1,"00:10:05,000","00:10:07,000",14520,14568\n'
+        'c,1.0,other episode,2,"00:10:05,000","00:10:07,000",14520,14568\n'
+        'd,1.0,later,1,"00:11:00,000","00:11:02,000",15840,15888\n',
+        encoding='utf-8'
+    )
+    lines = load_truth(str(table), 1, clip_start=600, clip_end=660)
+    assert [(line['text'], line['start_time'], line['end_time']) for line in lines] == [
+        ('first', -2.0, 1.5), ('second', 5.0, 7.0)
+    ]
+
+def test_sweep_shares_ocr_between_grid_points(sample_video):
+    truth = [{'text': text, 'start_time': i, 'end_time': i + 1} for i, text in enumerate(LINES)]
+    ch, ja = FakeReader(line), FakeReader(line)
+    grid = settings_grid([2, 4], [0.5, 0.95])
+    points = sweep(sample_video(frames=90), truth, grid, (ch, ja))
+
+    by_settings = {(p['frame_skip'], p['confidence_threshold']): p for p in points}
+    assert by_settings[2, 0.5]['recall'] == 1.0
+    assert by_settings[2, 0.95]['recall'] == 0.0
+    # Every threshold re-reads the frames of its frame skip from the cache
+    assert ch.calls + ja.calls < sum(p['ocr_calls'] for p in points)
+    assert sum(p['cache_hits'] for p in points) == sum(p['ocr_calls'] for p in points) - (ch.calls + ja.calls)
+
+def test_pareto_front_and_cheapest():
+    def point(recall, start_error, ocr_seconds):
+        return {'recall': recall, 'start_error': start_error, 'ocr_seconds': ocr_seconds}
+    points = [point(1.0, 0.2, 50), point(0.9, 0.3, 20), point(0.9, 0.4, 30), point(0.7, 0.1, 10)]
+    assert pareto_front(points) == [points[3], points[1], points[0]]
+    assert cheapest(points, 0.85) is points[1]
+    assert cheapest(points, 1.1) is None
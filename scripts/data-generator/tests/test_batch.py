@@ -0,0 +1,98 @@
+import csv
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import batch
+from batch import find_episodes, load_schema, pattern_regex, run_batch, source_hash
+from ngram_index import open_index
+from tests.conftest import FakeReader, write_video
+
+LINES = ['傳訊息也都沒有回', '我要退出 CRYCHIC', '為什麼要演奏春日影']
+
+def line(frame_index):
+    """A new line every 30 frames."""
+    return LINES[frame_index // 30], 0.9
+
+@pytest.fixture
+def schema(tmp_path):
+    (tmp_path / 'tables').mkdir()
+    path = tmp_path / 'tables' / 'schema.yml'
+    path.write_text('''collections:
+  MyGO:
+    table_file: "tables/mygo.csv"
+    content_dir: "contents/mygo"
+    video_format:
+      extension: "mp4"
+      naming_pattern: "{episode}.mp4"
+''', encoding='utf-8')
+    return path
+
+def read_rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.DictReader(f))
+
+def test_find_episodes_by_pattern(tmp_path):
+    for name in ('1.mp4', '12.mp4', 'notes.mp4', 'ep3/video.mp4', '2.mkv'):
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(b'x')
+    assert [e for e, _ in find_episodes(str(tmp_path), '{episode}.mp4')] == [1, 12]
+    assert [e for e, _ in find_episodes(str(tmp_path), 'ep{episode}/video.mp4')] == [3]
+    assert pattern_regex('[{episode}] (1080p).mp4').match('[04] (1080p).mp4').group('episode') == '04'
+    with pytest.raises(ValueError):
+        pattern_regex('episode.mp4')
+
+def test_source_hash_samples_large_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, 'HASH_BLOCK', 16)
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(bytes(range(256)) * 8)
+    first = source_hash(str(path))
+    assert source_hash(str(path)) == first
+    path.write_bytes(bytes(range(256)) * 8 + b'!')
+    assert source_hash(str(path)) != first
+
+def test_batch_writes_numbered_tables_and_skips_unchanged(schema, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_video(tmp_path / 'contents' / 'mygo' / '1.mp4', frames=90)
+    write_video(tmp_path / 'contents' / 'mygo' / '2.mp4', frames=60)
+    # A curated table: episode 1 is re-OCR'd, episode 3 has no video and is kept as is
+    curated = ('id,score,text,episode,start_time,end_time,start_frame,end_frame\n'
+               'old1,1.0,舊的一行,1,"00:00:01,000","00:00:02,000",30,60\n'
+               'cur3,1.0,"手寫的,一行",3,"00:00:01,000","00:00:02,000",30,60\n')
+    (tmp_path / 'tables' / 'mygo.csv').write_text(curated, encoding='utf-8')
+    collections = load_schema(str(schema))
+    assert collections[0].key == 'mygo'
+
+    totals = run_batch(collections, frame_skip=2, readers=(FakeReader(line), FakeReader(line)))
+    rows = read_rows(tmp_path / 'tables' / 'mygo.csv')
+    assert totals == {'MyGO': len(rows)}
+    assert [(r['episode'], r['text'], r['start_frame'], r['end_frame']) for r in rows] == [
+        ('1', LINES[0], '16', '32'), ('1', LINES[1], '32', '60'), ('1', LINES[2], '60', '62'),
+        ('2', LINES[0], '16', '32'), ('2', LINES[1], '32', '34'), ('3', '手寫的,一行', '30', '60'),
+    ]
+    # Kept rows are copied byte for byte
+    assert (tmp_path / 'tables' / 'mygo.csv').read_bytes().endswith(curated.splitlines(keepends=True)[-1].encode('utf-8'))
+    assert rows[0]['start_time'] == '00:00:00,533' and rows[2]['start_time'] == '00:00:02,000'
+    assert len({r['id'] for r in rows}) == len(rows)
+    assert (tmp_path / 'contents' / 'mygo' / '1' / 'frame_000032.jpg').exists()
+
+    # Nothing changed: no OCR at all, same table
+    def failing(frame_index):
+        raise AssertionError('unchanged episode was processed again')
+    run_batch(collections, frame_skip=2, readers=(FakeReader(failing), FakeReader(failing)))
+    assert read_rows(tmp_path / 'tables' / 'mygo.csv') == rows
+
+    # A replaced video is reprocessed, a removed one drops out of the table (batch wrote its rows)
+    write_video(tmp_path / 'contents' / 'mygo' / '2.mp4', frames=40)
+    (tmp_path / 'contents' / 'mygo' / '1.mp4').unlink()
+    run_batch(collections, frame_skip=2, readers=(FakeReader(line), FakeReader(line)))
+    rows_after = read_rows(tmp_path / 'tables' / 'mygo.csv')
+    assert [(r['episode'], r['text'], r['end_frame']) for r in rows_after] == [
+        ('2', LINES[0], '32'), ('2', LINES[1], '34'), ('3', '手寫的,一行', '60')]
+    assert rows_after[0]['id'] == rows[3]['id']
+    # The table's prebuilt index follows it
+    index = open_index(str(tmp_path / 'tables' / 'mygo.csv'))
+    assert index.rows == len(rows_after) and index.search('CRYCHIC') == [1]
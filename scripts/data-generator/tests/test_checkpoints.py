@@ -0,0 +1,79 @@
+import json
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from line_merge import merge_near_duplicates
+from storage import Storage
+from video_ocr import process_video
+from tests.conftest import FakeReader
+
+LINES = ['good morning everyone', 'the rain will stop soon', 'where did you put it',
+         'we play again tonight', 'that song was ours', 'nobody is listening',
+         'open the window please', 'one more time from the top', 'i never said that', 'see you tomorrow']
+
+def jitter_line(frame_index):
+    """A new line every 24 frames, with an OCR jitter variant on some frames."""
+    text = LINES[frame_index // 24]
+    if frame_index % 24 == 20:
+        text += '!'
+    return text, 0.8 + (frame_index % 24) / 240
+
+def run(video_path, tmp_path, stop_after=None, resume=None):
+    """process_video + merge as the web UI runs them; returns (lines, reader, last checkpoint)."""
+    reader = FakeReader(jitter_line)
+    pending = json.loads(json.dumps(resume['merge_pending'])) if resume else []
+    lines = []
+    checkpoints = []
+
+    def on_checkpoint(state):
+        # Round-trip through JSON the way the job row stores it
+        checkpoints.append(json.loads(json.dumps({
+            'tracker': state, 'merge_pending': pending, 'lines': len(lines)
+        }, default=lambda value: value.tolist())))
+
+    detections = process_video(video_path, frame_skip=4, readers=(reader, reader), use_subtitle_streams=False,
+                               frames_dir=str(tmp_path / 'frames'), resume_state=resume and resume['tracker'],
+                               on_checkpoint=on_checkpoint)
+    merged = merge_near_duplicates(detections, pending=pending)
+    for result in merged:
+        lines.append((result['frame'], result['timestamp'], result['texts'][0]['text']))
+        if stop_after is not None and len(lines) == stop_after:
+            merged.close()
+            break
+    return lines, reader, checkpoints[-1] if checkpoints else None
+
+def test_resume_from_checkpoint_matches_uninterrupted_run(sample_video, tmp_path):
+    video_path = sample_video(frames=240, value=lambda i: i)
+    (tmp_path / 'frames').mkdir()
+    full, _, _ = run(video_path, tmp_path)
+    assert len(full) >= 6
+
+    partial, first_reader, checkpoint = run(video_path, tmp_path, stop_after=4)
+    # Lines emitted after the checkpoint are lost with the crash and come again
+    done = partial[:checkpoint['lines']]
+    resumed, reader, _ = run(video_path, tmp_path, resume=checkpoint)
+
+    assert done + resumed == full
+    assert min(reader.frames) == checkpoint['tracker']['next_frame']
+
+def test_storage_keeps_checkpoint_and_frames(tmp_path):
+    db_path = str(tmp_path / 'state.db')
+    url = 'https://www.youtube.com/watch?v=abc123'
+    storage = Storage(db_path)
+    storage.save_frame('abc123', {'frame': 'frame_000016.jpg', 'text': 'hello', 'timestamp': 0.5, 'confidence': 0.9})
+    progress = {'frame': 'frame_000016.jpg', 'total_frames': 100, 'processed_frames': 16, 'timestamp': 0.5}
+    checkpoint = {'tracker': {'next_frame': 20, 'last_text': 'hello', 'last_text_frame': 16},
+                  'merge_pending': [[{'texts': [{'confidence': np.float64(0.9)}]}, 'hello', 0.9, 0.5]]}
+    storage.save_job_state(url, 'processing', 4, 0.6, progress, checkpoint=checkpoint)
+    # Progress updates without a checkpoint keep the stored one
+    storage.save_job_state(url, 'processing', 4, 0.6, dict(progress, frame='frame_000020.jpg'))
+
+    job = Storage(db_path).get_job_state(url)
+    assert job['job']['checkpoint']['tracker'] == checkpoint['tracker']
+    assert job['job']['checkpoint']['merge_pending'][0][0]['texts'][0]['confidence'] == 0.9
+    assert job['job']['current_frame'] == 'frame_000020.jpg'
+    assert [frame['text'] for frame in job['frames']] == ['hello']
@@ -0,0 +1,58 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import cpu_planner
+from cpu_planner import (
+    ExecutionPlan, WORKER_MEMORY, RESERVED_MEMORY,
+    plan_execution, candidate_plans, video_segments, save_plan, load_plan
+)
+
+GIB = 1024 ** 3
+
+def test_plan_uses_all_cores_without_oversubscribing():
+    plan = plan_execution(cpus=16, memory=64 * GIB)
+    assert plan.workers == 4
+    assert plan.workers * plan.torch_threads == 16
+    assert plan.cv2_threads == 1
+
+def test_plan_is_limited_by_memory():
+    plan = plan_execution(cpus=16, memory=RESERVED_MEMORY + 2 * WORKER_MEMORY)
+    assert plan.workers == 2
+    assert plan.torch_threads == 8
+
+def test_small_machine_runs_one_process():
+    plan = plan_execution(cpus=2, memory=GIB)
+    assert plan.layout() == (1, 2, 2)
+
+def test_candidates_include_single_process():
+    plans = candidate_plans(cpus=8, memory=64 * GIB)
+    assert plans[0].workers == 1
+    assert len({plan.layout() for plan in plans}) == len(plans)
+
+def test_segments_stay_on_frame_skip_grid():
+    segments = video_segments(1000, workers=3, frame_skip=8, start_frame=16)
+    assert segments[0][0] == 16 and segments[-1][1] == 1000
+    for (_, end), (start, _) in zip(segments, segments[1:]):
+        assert end == start
+        assert (start - 16) % 8 == 0
+
+def test_cgroup_quota_caps_cpus(monkeypatch):
+    monkeypatch.setattr(cpu_planner, '_cgroup_cpu_quota', lambda: 2.5)
+    assert cpu_planner.available_cpus() <= 2
+
+def test_calibrated_plan_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(cpu_planner, 'available_cpus', lambda: 8)
+    monkeypatch.setattr(cpu_planner, 'available_memory', lambda: 64 * GIB)
+    path = tmp_path / 'plan.json'
+    saved = ExecutionPlan(2, 4, 1, cpus=8, memory=64 * GIB, source='calibrated', frames_per_second=3.5)
+    save_plan(saved, str(path))
+    loaded = load_plan(str(path))
+    assert loaded == saved and loaded.source == 'calibrated'
+
+    # A plan measured under different limits is ignored
+    monkeypatch.setattr(cpu_planner, 'available_cpus', lambda: 4)
+    assert load_plan(str(path)).source == 'heuristic'
@@ -0,0 +1,173 @@
+import pytest
+import numpy as np
+import cv2
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from crop_archive import INDEX_RECORD, CropArchive, CropArchiveWriter, evaluate, save_missing_frames
+from video_ocr import process_video
+from tests.conftest import FakeReader
+
+SENTENCES = ['good morning everyone', 'the rain will stop soon', 'where did you put it',
+             'we play again tonight', 'that song was ours', 'nobody is listening']
+
+def confidence(frame_index):
+    # Alternates between lines
+    return 0.95 if frame_index // 20 % 2 == 0 else 0.7
+
+def numbered_line(lang):
+    """A new line every 20 frames."""
+    return lambda frame_index: (f'{lang} line {frame_index // 20}', confidence(frame_index))
+
+def sentence_line(frame_index):
+    """A new line every 20 frames, different enough from the others not to be merged."""
+    return SENTENCES[frame_index // 20], confidence(frame_index)
+
+@pytest.fixture
+def held_video(sample_video):
+    # Static for 20 frames at a time, like a held shot
+    return sample_video(value=lambda i: (i // 20) * 40)
+
+@pytest.fixture
+def archived_run(held_video, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'frames').mkdir()
+    archive_dir = str(tmp_path / 'archive')
+    readers = (FakeReader(numbered_line('ch')), FakeReader(numbered_line('ja')))
+    results = list(process_video(
+        held_video, frame_skip=2, readers=readers, confidence_threshold=0.6,
+        use_subtitle_streams=False, archive_dir=archive_dir
+    ))
+    return archive_dir, results, readers
+
+def test_every_sampled_crop_is_archived(archived_run):
+    archive_dir, results, _ = archived_run
+    with CropArchive(archive_dir) as archive:
+        assert archive.frames() == list(range(0, 120, 2))
+        crop = archive.crop(40)
+        assert crop.ndim == 2 and crop.shape[1] == 64
+        assert archive.fps == pytest.approx(30)
+        # Static shots are stored once
+        stored = sum(os.path.getsize(p) for p in Path(archive_dir).glob('*.crops'))
+        assert stored < len(archive) * len(cv2.imencode('.png', crop)[1]) / 2
+
+def test_rethreshold_reuses_stored_candidates(archived_run):
+    archive_dir, results, readers = archived_run
+    calls = readers[0].calls
+    with CropArchive(archive_dir) as archive:
+        same = list(evaluate(archive, 0.6))
+        assert [r['frame'] for r in same] == [r['frame'] for r in results]
+        assert [[(t['text'], t['lang'], t['confidence']) for t in r['texts']] for r in same] == \
+            [[(t['text'], t['lang'], t['confidence']) for t in r['texts']] for r in results]
+
+        # Odd lines (confidence 0.7) drop out at 0.8: Chinese misses and Japanese was never run on them
+        strict = list(evaluate(archive, 0.8))
+        assert {r['texts'][0]['text'] for r in strict} == {'ch line 0', 'ch line 2', 'ch line 4'}
+    assert readers[0].calls == calls
+
+def test_reocr_reads_crops_not_video(archived_run, held_video):
+    archive_dir, results, _ = archived_run
+    os.remove(held_video)
+    new_reader = FakeReader(numbered_line('new'))
+    with CropArchive(archive_dir) as archive:
+        reocr = list(evaluate(archive, 0.6, languages=['ch_tra'], readers={'ch_tra': new_reader}, reocr=True))
+        assert new_reader.calls > 0
+        assert all(r['texts'][0]['text'].startswith('new line') for r in reocr)
+
+        # Frames missing from frames/ are filled from the crops when the video is gone
+        for r in reocr:
+            path = os.path.join('frames', r['frame'])
+            if os.path.exists(path):
+                os.remove(path)
+        saved = list(save_missing_frames(reocr, archive))
+        assert all(os.path.exists(os.path.join('frames', r['frame'])) for r in saved)
+
+def test_later_shard_wins_and_torn_records_are_ignored(tmp_path):
+    directory = str(tmp_path / 'archive')
+    with CropArchiveWriter(directory, {'fps': 10}) as first:
+        first.add_crop(0, 0.0, np.zeros((8, 8), dtype=np.uint8))
+        first.add_candidates(0, 'ch_tra', [([[0, 0]] * 4, 'old', 0.9)])
+    with CropArchiveWriter(directory, {'fps': 10}) as second:
+        second.add_crop(0, 0.0, np.full((8, 8), 255, dtype=np.uint8))
+        second.add_candidates(0, 'ch_tra', [([[0, 0]] * 4, 'new', 0.9)])
+        name = second.name
+    with open(os.path.join(directory, f'{name}.index'), 'ab') as f:
+        f.write(INDEX_RECORD.pack(2, 0.2, 0, 10 ** 6, 8, 8)[:10])
+
+    with CropArchive(directory) as archive:
+        assert archive.frames() == [0]
+        assert archive.crop(0).max() == 255
+        assert archive.candidates[(0, 'ch_tra')][0][1] == 'new'
+
+def test_rethreshold_route_keeps_reviewer_edits(held_video, tmp_path, monkeypatch):
+    import importlib
+    from crop_archive import job_archive_dir
+    from line_merge import merge_near_duplicates
+    from storage import Storage
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'frames').mkdir()
+    web_ui = importlib.import_module('web_ui')
+    storage = Storage(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(web_ui, 'storage', storage)
+    monkeypatch.setattr(web_ui, 'current_progress', {'status': 'completed', 'current_url': 'abc123'})
+    results = list(merge_near_duplicates(process_video(
+        held_video, frame_skip=2, readers=(FakeReader(sentence_line), FakeReader(sentence_line)), confidence_threshold=0.6,
+        use_subtitle_streams=False, archive_dir=job_archive_dir('abc123')
+    )))
+    for result in results:
+        storage.save_frame('abc123', {'frame': result['frame'], 'text': result['texts'][0]['text'],
+                                      'timestamp': result['timestamp'], 'confidence': 0.9})
+    assert len(results) >= 2
+    edited, deleted = results[0]['frame'], results[-1]['frame']
+    storage.update_frame('abc123', edited, modified_text='good morning, everyone')
+    storage.update_frame('abc123', deleted, is_deleted=True)
+
+    response = web_ui.app.test_client().post('/rethreshold', json={'confidence_threshold': 0.6})
+    assert response.status_code == 200
+    assert response.get_json()['edits_kept'] == 2
+    frames = {frame['frame_number']: frame for frame in storage.get_new_frames('abc123')}
+    assert frames[edited]['modified_text'] == 'good morning, everyone' and not frames[edited]['is_deleted']
+    assert frames[deleted]['is_deleted']
+
+def test_rethreshold_route_ocrs_or_refuses_missing_candidates(held_video, tmp_path, monkeypatch):
+    import importlib
+    from crop_archive import job_archive_dir
+    from storage import Storage
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'frames').mkdir()
+    web_ui = importlib.import_module('web_ui')
+    storage = Storage(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(web_ui, 'storage', storage)
+    monkeypatch.setattr(web_ui, 'current_progress', {'status': 'completed', 'current_url': 'abc123'})
+    results = list(process_video(
+        held_video, frame_skip=2, readers=(FakeReader(sentence_line), FakeReader(sentence_line)), confidence_threshold=0.6,
+        use_subtitle_streams=False, archive_dir=job_archive_dir('abc123')
+    ))
+    for result in results:
+        storage.save_frame('abc123', {'frame': result['frame'], 'text': result['texts'][0]['text'],
+                                      'timestamp': result['timestamp'], 'confidence': 0.9})
+    before = storage.get_new_frames('abc123')
+    client = web_ui.app.test_client()
+
+    # Chinese passed on every frame, so Japanese never ran: nothing to re-select from
+    response = client.post('/rethreshold', json={'languages': ['ja', 'ch_tra'], 'ocr_misses': False})
+    assert response.status_code == 409
+    assert response.get_json()['misses'] > 0
+    assert storage.get_new_frames('abc123') == before
+
+    loaded = []
+    def create_backend(backend, lang_list):
+        loaded.append(lang_list[0])
+        return FakeReader(sentence_line)
+    monkeypatch.setattr(web_ui, 'create_backend', create_backend)
+    response = client.post('/rethreshold', json={'languages': ['ja', 'ch_tra']})
+    assert response.status_code == 200
+    assert response.get_json()['misses'] > 0
+    assert loaded == ['ja']
+    assert len(storage.get_new_frames('abc123')) == len(before)
@@ -0,0 +1,55 @@
+import shutil
+import pytest
+import numpy as np
+import cv2
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import ffmpeg_decode
+from ffmpeg_decode import FFmpegFrameReader
+from video_ocr import iter_sampled_frames
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+
+@pytest.fixture
+def clip(tmp_path):
+    video_path = str(tmp_path / 'clip.mp4')
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (128, 96))
+    for i in range(45):
+        writer.write(np.full((96, 128, 3), i * 5, dtype=np.uint8))
+    writer.release()
+    return video_path
+
+def opencv_frames(video_path, frame_skip, start_frame):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return [(index, index / cap.get(cv2.CAP_PROP_FPS)) for index, _ in iter_sampled_frames(cap, frame_skip, start_frame)]
+    finally:
+        cap.release()
+
+@requires_ffmpeg
+@pytest.mark.parametrize('frame_skip,start_frame', [(1, 0), (4, 0), (1, 7), (4, 7)])
+def test_frames_line_up_with_opencv(clip, frame_skip, start_frame):
+    expected = opencv_frames(clip, frame_skip, start_frame)
+    frames = [(index, timestamp) for index, timestamp, _ in FFmpegFrameReader(clip, frame_skip=frame_skip, start_frame=start_frame)]
+    assert [index for index, _ in frames] == [index for index, _ in expected]
+    assert [timestamp for _, timestamp in frames] == pytest.approx([timestamp for _, timestamp in expected], abs=1e-3)
+
+@requires_ffmpeg
+def test_band_shape(clip):
+    _, _, band = next(iter(FFmpegFrameReader(clip)))
+    # Bottom 30%, rounded down to an even height
+    assert band.shape == (28, 128) and band.dtype == np.uint8
+    _, _, band = next(iter(FFmpegFrameReader(clip, scale_width=64)))
+    assert band.shape == (14, 64)
+    _, _, band = next(iter(FFmpegFrameReader(clip, gray=False)))
+    assert band.shape == (28, 128, 3)
+
+def test_old_ffmpeg_uses_vsync(monkeypatch):
+    monkeypatch.setattr(ffmpeg_decode, 'ffmpeg_version', lambda path: (4, 4))
+    assert ffmpeg_decode.passthrough_args() == ['-vsync', 'passthrough']
+    monkeypatch.setattr(ffmpeg_decode, 'ffmpeg_version', lambda path: None)
+    assert ffmpeg_decode.passthrough_args() == ['-fps_mode', 'passthrough']
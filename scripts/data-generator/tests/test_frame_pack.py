@@ -0,0 +1,97 @@
+import hashlib
+import importlib
+import pytest
+import numpy as np
+import cv2
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from frame_pack import FramePack, FramePackWriter, INDEX_RECORD, pack_directory, pack_path_for, unpack
+
+def jpeg(seed, shape=(72, 128)):
+    image = np.random.default_rng(seed).integers(0, 255, shape + (3,), dtype=np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+def test_append_override_and_torn_records(tmp_path):
+    pack_path = str(tmp_path / 'episode.pack')
+    with FramePackWriter(pack_path) as writer:
+        writer.add('frame_000008.jpg', jpeg(0))
+        writer.add('frame_000016.jpg', jpeg(1))
+    pack = FramePack(pack_path)
+    assert pack.names() == ['frame_000008.jpg', 'frame_000016.jpg']
+    assert bytes(pack.read('frame_000016.jpg')) == jpeg(1)
+
+    # Re-saving appends; the later record wins and a running reader picks it up
+    with FramePackWriter(pack_path) as writer:
+        writer.add('frame_000008.jpg', jpeg(2))
+        writer.add_image('.sizes/thumb/frame_000008.jpg', np.zeros((9, 16, 3), dtype=np.uint8))
+    assert bytes(pack.read('frame_000008.jpg')) == jpeg(2)
+    assert pack.image('.sizes/thumb/frame_000008.jpg').shape == (9, 16, 3)
+
+    # An interrupted writer: half an index record, and a record whose data never arrived
+    with open(pack_path + '.idx', 'ab') as f:
+        f.write(INDEX_RECORD.pack(1 << 40, 10, b'\0' * 16, b'frame_999999.jpg'))
+        f.write(b'\1' * (INDEX_RECORD.size // 2))
+    reopened = FramePack(pack_path)
+    assert len(reopened) == 3 and 'frame_999999.jpg' not in reopened
+    with pytest.raises(KeyError):
+        reopened.read('frame_999999.jpg')
+    # The next writer drops the torn half record and appends aligned records again
+    with FramePackWriter(pack_path) as writer:
+        writer.add('frame_000024.jpg', jpeg(3))
+    assert bytes(reopened.read('frame_000024.jpg')) == jpeg(3)
+
+def test_pack_and_unpack_directory(tmp_path):
+    frames = tmp_path / 'frames'
+    (frames / '.sizes' / 'thumb').mkdir(parents=True)
+    originals = {'frame_000008.jpg': jpeg(0), 'frame_000016.jpg': jpeg(1), '.sizes/thumb/frame_000008.jpg': jpeg(2)}
+    for name, data in originals.items():
+        (frames / name).write_bytes(data)
+
+    assert pack_directory(str(frames), remove=True) == (3, sum(map(len, originals.values())))
+    assert not (frames / 'frame_000008.jpg').exists()
+    assert unpack(pack_path_for(str(frames)), str(tmp_path / 'loose')) == 3
+    for name, data in originals.items():
+        assert (tmp_path / 'loose' / name).read_bytes() == data
+
+def test_names_cannot_leave_the_directory(tmp_path):
+    pack_path = str(tmp_path / 'episode.pack')
+    with FramePackWriter(pack_path) as writer:
+        for name in ('../frame_000008.jpg', '/tmp/frame_000008.jpg', 'a/../../frame_000008.jpg'):
+            with pytest.raises(ValueError):
+                writer.add(name, jpeg(0))
+        writer.add('frame_000008.jpg', jpeg(0))
+    # A pack written by something else
+    data = jpeg(0)
+    with open(pack_path + '.idx', 'ab') as f:
+        f.write(INDEX_RECORD.pack(0, len(data), hashlib.blake2b(data, digest_size=16).digest(), b'../escaped.jpg'))
+    with pytest.raises(ValueError):
+        unpack(pack_path, str(tmp_path / 'loose'))
+    assert not (tmp_path / 'escaped.jpg').exists()
+
+def test_frames_route_serves_from_pack(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    web_ui = importlib.import_module('web_ui')
+    monkeypatch.setattr(web_ui, 'frame_pack_writer', None)
+    image = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+    with FramePackWriter(web_ui.FRAMES_PACK) as writer:
+        writer.add_image('frame_000024.jpg', image)
+    client = web_ui.app.test_client()
+
+    response = client.get('/frames/frame_000024.jpg?v=abc123')
+    assert response.status_code == 200
+    assert response.data == bytes(FramePack(web_ui.FRAMES_PACK).read('frame_000024.jpg'))
+    assert 'immutable' in response.headers['Cache-Control']
+    revalidated = client.get('/frames/frame_000024.jpg?v=abc123', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+    # Sizes are rendered from the packed frame into the pack
+    thumb = client.get('/frames/frame_000024.jpg?size=thumb')
+    assert cv2.imdecode(np.frombuffer(thumb.data, np.uint8), cv2.IMREAD_COLOR).shape[1] == 320
+    assert '.sizes/thumb/frame_000024.jpg' in FramePack(web_ui.FRAMES_PACK)
+    assert client.get('/frames/missing.jpg').status_code == 404
+    web_ui.cleanup_temp_files()
+    assert not (tmp_path / web_ui.FRAMES_PACK).exists()
@@ -0,0 +1,95 @@
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from frame_ranges import in_ranges, normalize_ranges, overlaps_ranges, parse_endpoint, parse_range_spec
+from storage import Storage
+from video_ocr import process_video
+from tests.conftest import FakeReader
+
+def test_parse_endpoints():
+    assert parse_endpoint('1:30', 24) == 2160
+    assert parse_endpoint('00:01:30.5', 24) == 2172
+    assert parse_endpoint('1200f', 24) == 1200
+    assert parse_endpoint('1200f', 24, is_end=True) == 1201
+    assert parse_endpoint(1.5, 24) == 36
+    assert parse_endpoint(1.51, 24, is_end=True) == 37
+    assert parse_endpoint(10, 24, unit='frames') == 10
+    assert parse_endpoint('', 24) is None
+    with pytest.raises(ValueError):
+        parse_endpoint(-1, 24)
+
+def test_normalize_sorts_merges_and_clips():
+    ranges = parse_range_spec('2:00-2:10, 0:00-0:05, 0:04-0:06, 100f-, ')
+    assert ranges[-1] == ['100f', None]
+    assert normalize_ranges(ranges, 10) == [(0, 60), (100, None)]
+    assert normalize_ranges([[0, 1], [3, 4]], 10, total_frames=35) == [(0, 10), (30, 35)]
+    assert normalize_ranges([[5, 9]], 10, unit='frames') == [(5, 10)]
+    with pytest.raises(ValueError):
+        normalize_ranges([[5, 2]], 10)
+    with pytest.raises(ValueError):
+        normalize_ranges([[1, 2, 3]], 10)
+    with pytest.raises(ValueError):
+        parse_range_spec('1:00')
+
+def test_membership():
+    ranges = [(0, 10), (30, None)]
+    assert in_ranges(0, ranges) and in_ranges(9, ranges) and in_ranges(1000, ranges)
+    assert not in_ranges(10, ranges) and not in_ranges(29, ranges)
+    assert overlaps_ranges(5, 40, [(10, 20)])
+    assert not overlaps_ranges(20, 25, [(10, 20)])
+
+def test_process_video_only_decodes_ranges(sample_video, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'frames').mkdir()
+    reader = FakeReader()
+
+    results = list(process_video(
+        sample_video(), frame_skip=2, readers=(reader, reader),
+        ranges=[['10f', '29f'], [2.0, 2.5]], use_subtitle_streams=False
+    ))
+
+    assert reader.frames
+    assert all(10 <= f < 30 or 60 <= f < 75 for f in reader.frames)
+    assert {f for f in reader.frames if f < 30} and {f for f in reader.frames if f >= 60}
+    frames = [int(r['frame'][6:12]) for r in results]
+    assert frames == sorted(frames)
+
+def test_storage_replaces_frames_in_ranges(tmp_path):
+    storage = Storage(str(tmp_path / 'state.db'))
+    for number in (5, 15, 25, 35):
+        storage.save_frame('vid', {'frame': f'frame_{number:06d}.jpg', 'text': f'line {number}', 'timestamp': number / 10})
+    storage.save_frame('other', {'frame': 'frame_000015.jpg', 'text': 'other', 'timestamp': 1.5})
+
+    assert storage.delete_frames_in_ranges('vid', [(10, 20), (30, None)]) == 2
+    remaining = [frame['frame_number'] for frame in storage.get_new_frames('vid')]
+    assert remaining == ['frame_000005.jpg', 'frame_000025.jpg']
+    assert len(storage.get_new_frames('other')) == 1
+
+def test_range_rerun_needs_the_job_on_disk(tmp_path, monkeypatch):
+    import importlib
+    import threading
+    web_ui = importlib.import_module('web_ui')
+    storage = Storage(str(tmp_path / 'state.db'))
+    storage.save_job_state('vid', 'completed', 8, 0.6, {})
+    storage.save_job_state('other', 'completed', 8, 0.6, {})
+    monkeypatch.setattr(web_ui, 'storage', storage)
+    monkeypatch.setattr(web_ui, 'current_progress', {'status': 'completed', 'current_url': 'vid'})
+    monkeypatch.setattr(web_ui, 'download_video', lambda *args, **kwargs: pytest.fail('downloaded'))
+    client = web_ui.app.test_client()
+    rerun = lambda url: client.post('/download', json={'url': url, 'ranges': [[0, 5]]}).status_code
+
+    assert rerun('unknown') == 404
+    assert rerun('other') == 409
+    running = threading.Event()
+    thread = threading.Thread(target=running.wait)
+    thread.start()
+    monkeypatch.setattr(web_ui, 'current_thread', thread)
+    try:
+        assert rerun('vid') == 409
+    finally:
+        running.set()
+        thread.join()
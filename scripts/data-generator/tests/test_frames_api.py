@@ -0,0 +1,76 @@
+import gzip
+import importlib
+import json
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from storage import Storage
+
+def fill(storage, youtube_id='abc123', count=25):
+    for i in range(count):
+        storage.save_frame(youtube_id, {
+            'frame': f'frame_{i * 8:06d}.jpg',
+            'text': f'line {i}',
+            'timestamp': i * 8 / 30,
+            'confidence': i / count
+        })
+
+def test_list_frames_pages_with_cursor(tmp_path):
+    storage = Storage(str(tmp_path / 'state.db'))
+    fill(storage)
+
+    seen, cursor = [], None
+    while True:
+        frames, cursor = storage.list_frames('abc123', cursor=cursor, limit=10)
+        seen += [frame['frame_number'] for frame in frames]
+        if cursor is None:
+            break
+    assert seen == [f'frame_{i * 8:06d}.jpg' for i in range(25)]
+
+    newest, cursor = storage.list_frames('abc123', limit=3, descending=True)
+    assert [f['frame_number'] for f in newest] == ['frame_000192.jpg', 'frame_000184.jpg', 'frame_000176.jpg']
+    assert cursor == 176
+    older, _ = storage.list_frames('abc123', cursor=cursor, limit=1, descending=True)
+    assert older[0]['frame_number'] == 'frame_000168.jpg'
+    assert storage.list_frames('other', limit=10) == ([], None)
+
+def test_list_frames_filters(tmp_path):
+    storage = Storage(str(tmp_path / 'state.db'))
+    fill(storage, count=10)
+    storage.update_frame('abc123', 'frame_000008.jpg', is_deleted=True)
+    storage.update_frame('abc123', 'frame_000016.jpg', modified_text='fixed')
+
+    deleted, _ = storage.list_frames('abc123', deleted=True)
+    assert [f['frame_number'] for f in deleted] == ['frame_000008.jpg']
+    assert len(storage.list_frames('abc123', deleted=False)[0]) == 9
+    edited, _ = storage.list_frames('abc123', edited=True)
+    assert [f['modified_text'] for f in edited] == ['fixed']
+    confident, _ = storage.list_frames('abc123', min_confidence=0.5, max_confidence=0.7)
+    assert [f['confidence'] for f in confident] == [0.5, 0.6, 0.7]
+    assert storage.count_frames('abc123') == 10
+
+def test_frames_route_gzip_and_validation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    web_ui = importlib.import_module('web_ui')
+    storage = Storage(str(tmp_path / 'state.db'))
+    fill(storage, count=40)
+    monkeypatch.setattr(web_ui, 'storage', storage)
+    monkeypatch.setitem(web_ui.current_progress, 'current_url', 'abc123')
+    client = web_ui.app.test_client()
+
+    response = client.get('/api/frames?order=desc&limit=30', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    page = json.loads(gzip.decompress(response.data))
+    assert len(page['frames']) == 30
+    assert page['frames'][0]['frame_number'] == 'frame_000312.jpg'
+
+    rest = client.get(f"/api/frames?order=desc&cursor={page['next_cursor']}").get_json()
+    assert len(rest['frames']) == 10 and rest['next_cursor'] is None
+
+    assert client.get('/api/frames?deleted=maybe').status_code == 400
+    assert client.get('/api/frames?order=sideways').status_code == 400
+    assert client.get('/api/frames?cursor=abc').status_code == 400
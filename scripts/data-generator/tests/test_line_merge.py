@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from line_merge import banded_edit_distance, is_near_duplicate, merge_near_duplicates, normalize_text
+
+def make_result(frame, timestamp, text, confidence=0.9):
+    return {
+        'frame': f'frame_{frame:06d}.jpg',
+        'timestamp': timestamp,
+        'texts': [{'text': text, 'confidence': confidence, 'bbox': None, 'lang': 'ch_tra'}]
+    }
+
+def test_normalize_text_drops_punctuation_and_spaces():
+    assert normalize_text('你全身都濕透了, 沒事吧?') == '你全身都濕透了沒事吧'
+    assert normalize_text('我要退出　CRYCHIC') == '我要退出CRYCHIC'
+
+def test_banded_edit_distance():
+    assert banded_edit_distance('傳訊息也都沒有回', '傳訊息也都沒有回', 2) == 0
+    assert banded_edit_distance('傳訊息也都沒有回', '傅訊息也都沒有回', 2) == 1
+    assert banded_edit_distance('abcdef', 'abc', 2) == 3  # exceeds the band
+    assert banded_edit_distance('', 'ab', 2) == 2
+
+def test_short_lines_must_match_exactly():
+    assert not is_near_duplicate('是的', '好的')
+    assert is_near_duplicate('我今天是來講一件事的', '我今天是來講一件事旳')
+
+def test_merge_keeps_span_start_and_best_variant():
+    results = [
+        make_result(100, 4.0, '你全身都濕透了, 沒事吧?', 0.7),
+        make_result(120, 4.8, '你全身都濕透了 沒事吧', 0.95),
+        make_result(140, 5.6, '你全身都濕诱了, 沒事吧?', 0.8),
+        make_result(200, 8.0, '傳訊息也都沒有回', 0.9),
+    ]
+    merged_pairs = []
+    merged = list(merge_near_duplicates(results, on_merge=lambda d, k: merged_pairs.append((d['frame'], k['frame']))))
+
+    assert [r['frame'] for r in merged] == ['frame_000100.jpg', 'frame_000200.jpg']
+    assert merged[0]['timestamp'] == 4.0
+    assert merged[0]['texts'][0]['text'] == '你全身都濕透了 沒事吧'
+    assert merged_pairs == [('frame_000120.jpg', 'frame_000100.jpg'), ('frame_000140.jpg', 'frame_000100.jpg')]
+
+def test_merge_window_is_bounded():
+    results = [make_result(i * 100, i * 10.0, f'第{i}句台詞內容') for i in range(10)]
+    results.append(make_result(1000, 100.0, '第0句台詞內容'))
+    merged = list(merge_near_duplicates(results, window=2, max_gap=3.0))
+    # The repeat is far outside the window, so it stays a separate line
+    assert len(merged) == 11
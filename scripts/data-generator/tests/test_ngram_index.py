@@ -0,0 +1,59 @@
+import csv
+import shutil
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ngram_index import HEADER, NgramIndex, build_index, index_path_for, normalize, open_index, terms
+
+TABLE = Path(__file__).parent.parent.parent.parent / 'tables' / 'mygo.csv'
+
+def test_terms_follow_the_cjk_analyzer():
+    assert normalize('ＣＲＹＣＨＩＣ ﾊﾞﾝﾄﾞ') == 'crychic バンド'
+    assert terms(normalize('我要退出 CRYCHIC！')) == ['我要', '要退', '退出', 'crychic']
+    assert terms('嗯, ok') == ['嗯', 'ok']
+
+def test_search_matches_a_scan_of_the_csv(tmp_path):
+    csv_path = tmp_path / 'table.csv'
+    shutil.copy(TABLE, csv_path)
+    with open(csv_path, 'a', encoding='utf-8', newline='') as f:
+        # A quoted field across lines, and full-width Latin
+        csv.writer(f).writerow(['x1', '1.0', '春日影\n（ＣＲＹＣＨＩＣ）', 99, '00:00:01,000', '00:00:02,000', 30, 60])
+    rows, _ = build_index(str(csv_path))
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        texts = [row['text'] for row in csv.DictReader(f)]
+    assert rows == len(texts)
+
+    index = open_index(str(csv_path))
+    for query in ['春日影', '樂團', '燈', 'crychic', '為什麼要演奏']:
+        expected = [row for row, text in enumerate(texts) if normalize(query) in normalize(text)]
+        assert index.search(query) == expected, query
+    # Row offsets point at the records in the CSV
+    data = csv_path.read_bytes()
+    last = data[index.row_offsets[-2]:index.row_offsets[-1]].decode('utf-8')
+    assert next(csv.reader(last.splitlines(keepends=True)))[0] == 'x1'
+    assert index.row_text(len(texts) - 1) == '春日影\n(crychic)'
+
+def test_stale_and_damaged_indexes_are_ignored(tmp_path):
+    csv_path = tmp_path / 'table.csv'
+    shutil.copy(TABLE, csv_path)
+    build_index(str(csv_path))
+    index_path = Path(index_path_for(str(csv_path)))
+    data = index_path.read_bytes()
+
+    with open(csv_path, 'ab') as f:
+        f.write(b'x2,1.0,new line,1,"00:00:01,000","00:00:02,000",30,60\n')
+    assert open_index(str(csv_path)) is None
+    build_index(str(csv_path))
+    assert open_index(str(csv_path)).search('new line') == [NgramIndex(str(index_path)).rows - 1]
+
+    index_path.write_bytes(data[:HEADER.size + 100])
+    with pytest.raises(ValueError):
+        NgramIndex(str(index_path))
+    index_path.write_bytes(data[:8] + (2).to_bytes(4, 'little') + data[12:])
+    with pytest.raises(ValueError, match='version 2'):
+        NgramIndex(str(index_path))
+    assert open_index(str(csv_path)) is None
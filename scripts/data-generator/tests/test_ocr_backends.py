@@ -0,0 +1,61 @@
+import importlib
+import pytest
+import numpy as np
+import torch
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ocr_backends import OCRBackend, ONNXModule, create_backend
+
+class BoxBackend(OCRBackend):
+    def detect(self, image):
+        return [[0, 10, 0, 5]], []
+
+    def recognize(self, image, horizontal_list, free_list):
+        return [(box, 'text', 0.9) for box in horizontal_list]
+
+class FakeInput:
+    name = 'image'
+
+class FakeSession:
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.fed = None
+
+    def get_inputs(self):
+        return [FakeInput()]
+
+    def run(self, names, feed):
+        self.fed = feed
+        return self.outputs
+
+def test_readtext_is_detect_then_recognize():
+    backend = BoxBackend()
+    image = np.zeros((10, 20), dtype=np.uint8)
+    assert backend.readtext(image) == [([0, 10, 0, 5], 'text', 0.9)]
+    assert backend.readtext_batch([image, image]) == [backend.readtext(image)] * 2
+    with pytest.raises(TypeError):
+        OCRBackend()
+
+def test_onnx_module_behaves_like_torch_module():
+    session = FakeSession([np.ones((1, 4, 4, 2), dtype=np.float32), np.zeros((1, 2), dtype=np.float32)])
+    module = ONNXModule(session).eval()
+    y, feature = module(torch.zeros(1, 3, 8, 8, dtype=torch.float64), None)
+    assert isinstance(y, torch.Tensor) and y.shape == (1, 4, 4, 2)
+    assert session.fed['image'].dtype == np.float32
+
+    single = ONNXModule(FakeSession([np.ones((2, 5, 7), dtype=np.float32)]))
+    assert single(torch.zeros(2, 1, 64, 100)).shape == (2, 5, 7)
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend('tesseract', ['ch_tra', 'en'])
+
+def test_download_rejects_unknown_backend():
+    client = importlib.import_module('web_ui').app.test_client()
+    response = client.post('/download', json={'url': 'https://example.com/v', 'ocr_backend': 'tesseract'})
+    assert response.status_code == 400
+    assert 'ocr_backend' in response.get_json()['error']
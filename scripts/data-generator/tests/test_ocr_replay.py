@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from ocr_replay import OCRTrace, fingerprint, recording_readers, replay_readers
+from video_ocr import process_video
+from tests.conftest import FakeReader
+
+def test_fingerprint_depends_on_content_and_shape():
+    a = np.zeros((4, 4), dtype=np.uint8)
+    assert fingerprint(a) == fingerprint(a.copy())
+    assert fingerprint(a) != fingerprint(np.ones((4, 4), dtype=np.uint8))
+    assert fingerprint(a) != fingerprint(np.zeros((2, 8), dtype=np.uint8))
+
+def test_record_then_replay_matches(sample_video, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'frames').mkdir()
+    trace_path = str(tmp_path / 'trace.jsonl.gz')
+    video_path = sample_video(frames=60, value=lambda i: i * 4)
+
+    # A different line every 10 frames
+    fake = FakeReader(lambda frame_index: (f'line {frame_index // 10}', 0.9))
+    with OCRTrace(trace_path, 'w', {'frame_skip': 2}) as trace:
+        recorded = list(process_video(
+            video_path, frame_skip=2, readers=recording_readers(trace, (fake, fake))
+        ))
+    assert fake.calls > 0
+    assert len(recorded) >= 2
+
+    trace = OCRTrace(trace_path)
+    assert trace.metadata['frame_skip'] == 2
+    readers = replay_readers(trace, verify=True)
+    replayed = list(process_video(video_path, frame_skip=2, readers=readers))
+
+    assert [r['frame'] for r in replayed] == [r['frame'] for r in recorded]
+    assert [r['texts'][0]['text'] for r in replayed] == [r['texts'][0]['text'] for r in recorded]
+    assert sum(reader.misses for reader in readers) == 0
+    assert sum(reader.mismatches for reader in readers) == 0
+
+def test_replay_reports_missing_frames(tmp_path):
+    trace_path = str(tmp_path / 'trace.jsonl.gz')
+    OCRTrace(trace_path, 'w').close()
+    ch_reader, _ = replay_readers(OCRTrace(trace_path))
+    ch_reader.seek_frame(5)
+    assert ch_reader.readtext(np.zeros((4, 4), dtype=np.uint8)) == []
+    assert ch_reader.misses == 1
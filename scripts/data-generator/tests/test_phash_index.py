@@ -0,0 +1,94 @@
+import pytest
+import random
+import cv2
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from phash_index import MultiIndexHash, PHashIndex, build_index, hamming, hash_file, phash
+
+def make_frame(seed, size=(180, 320)):
+    rng = np.random.default_rng(seed)
+    frame = np.zeros(size + (3,), dtype=np.uint8)
+    for _ in range(6):
+        center = tuple(int(v) for v in rng.integers(0, size[::-1]))
+        color = tuple(int(v) for v in rng.integers(0, 255, 3))
+        cv2.circle(frame, center, int(rng.integers(10, 80)), color, -1)
+    return frame
+
+def test_phash_is_robust_to_small_changes():
+    frame = make_frame(1)
+    noisy = np.clip(frame.astype(np.int16) + np.random.default_rng(0).integers(-8, 8, frame.shape), 0, 255).astype(np.uint8)
+    resized = cv2.resize(frame, (640, 360))
+    assert hamming(phash(frame), phash(noisy)) <= 4
+    assert hamming(phash(frame), phash(resized)) <= 4
+    assert hamming(phash(frame), phash(make_frame(2))) > 12
+
+def test_multi_index_matches_brute_force():
+    rng = random.Random(0)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    # Plant near neighbours of the first value
+    values += [values[0] ^ (1 << bit) ^ (1 << (bit + 7)) for bit in range(10)]
+    tree = MultiIndexHash()
+    for i, value in enumerate(values):
+        tree.add(value, i)
+    for query in values[:20]:
+        for radius in (0, 2, 5, 10):
+            expected = sorted(i for i, value in enumerate(values) if hamming(query, value) <= radius)
+            assert sorted(key for _, _, key in tree.search(query, radius)) == expected
+
+def test_index_persists_and_skips_torn_line(tmp_path):
+    path = tmp_path / 'index.tsv'
+    index = PHashIndex(str(path))
+    index.add('mygo/1/frame_000001.jpg', 0x0f0f)
+    index.add('mygo/2/frame_000009.jpg', 0x0f0e)
+    index.add('mygo/2/frame_000009.jpg', 0x0f0e)
+    with open(path, 'a') as f:
+        f.write('00000000')
+
+    reopened = PHashIndex(str(path))
+    assert len(reopened) == 2
+    assert reopened.query_key('mygo/1/frame_000001.jpg', radius=1) == [('mygo/2/frame_000009.jpg', 1)]
+
+    # An updated hash replaces the old one
+    reopened.add('mygo/2/frame_000009.jpg', ~0x0f0e & (2 ** 64 - 1))
+    assert reopened.query(0x0f0f, radius=8) == [('mygo/1/frame_000001.jpg', 0)]
+
+def test_build_index_and_duplicate_groups(tmp_path):
+    for episode in ('1', '2'):
+        folder = tmp_path / 'contents' / 'mygo' / episode
+        folder.mkdir(parents=True)
+        for seed in range(3):
+            cv2.imwrite(str(folder / f'frame_{seed:06d}.jpg'), make_frame(seed))
+
+    index_path = str(tmp_path / 'index.tsv')
+    index = build_index([str(tmp_path / 'contents' / 'mygo')], index_path, workers=2)
+    assert len(index) == 6
+    assert 'mygo/2/frame_000001.jpg' in index
+
+    groups = PHashIndex(index_path).duplicate_groups(radius=4, prefix='mygo/')
+    assert sorted(sorted(group) for group in groups) == [
+        [f'mygo/1/frame_{seed:06d}.jpg', f'mygo/2/frame_{seed:06d}.jpg'] for seed in range(3)
+    ]
+    assert hash_file(str(tmp_path / 'contents' / 'mygo' / '1' / 'frame_000000.jpg')) is not None
+
+    # Rebuilding without --rebuild only hashes new frames
+    assert len(build_index([str(tmp_path / 'contents' / 'mygo')], index_path, workers=2)) == 6
+
+def test_similar_route_bounds_radius(tmp_path, monkeypatch):
+    import importlib
+    web_ui = importlib.import_module('web_ui')
+    index = PHashIndex(str(tmp_path / 'index.tsv'))
+    index.add('abc123/frame_000001.jpg', 0x0f0f)
+    index.add('other/frame_000009.jpg', 0x0f0e)
+    monkeypatch.setattr(web_ui, 'frame_index', index)
+    monkeypatch.setattr(web_ui, 'current_progress', {'status': 'completed', 'current_url': 'abc123'})
+    client = web_ui.app.test_client()
+
+    response = client.get('/similar?frame=frame_000001.jpg&radius=16')
+    assert response.get_json()['matches'] == [{'key': 'other/frame_000009.jpg', 'distance': 1}]
+    assert client.get('/similar?frame=frame_000001.jpg&radius=17').status_code == 400
+    assert client.get('/similar?frame=frame_000001.jpg&radius=-1').status_code == 400
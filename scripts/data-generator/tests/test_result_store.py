@@ -0,0 +1,81 @@
+import pickle
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from result_store import ResultStore
+from result_writer import IncrementalResultWriter, SpanBuilder
+from video_ocr import remove_duplicates
+
+def make_result(frame, timestamp, *texts):
+    return {
+        'frame': f'frame_{frame:06d}.jpg',
+        'timestamp': timestamp,
+        'texts': [
+            {
+                'text': text,
+                'confidence': np.float64(confidence),
+                'bbox': [[np.int32(10), np.int32(5)], [np.int32(200), np.int32(5)], [np.int32(200), np.int32(40)], [np.int32(10), np.int32(40)]],
+                'lang': 'ch_tra'
+            }
+            for text, confidence in texts
+        ]
+    }
+
+RESULTS = [
+    make_result(0, 0.0, ('傳訊息也都沒有回', 0.7)),
+    make_result(8, 0.5, ('傳訊息也都沒有回', 0.9), ('雜訊', 0.3)),
+    make_result(16, 1.0, ('我要退出 CRYCHIC', 0.85)),
+    make_result(24, 1.5, ('雜訊', 0.5), ('我要退出CRYCHIC', 0.95)),
+    make_result(40, 2.5, ('為什麼要演奏春日影', 0.8)),
+    {'frame': 'frame_000060.jpg', 'timestamp': 3.5, 'end_frame': 'frame_000075.jpg', 'end_timestamp': 4.7,
+     'texts': [{'text': '一輩子', 'confidence': 1.0, 'bbox': None, 'lang': 'ja'}]},
+]
+
+def span_builder_rows(results):
+    spans = SpanBuilder()
+    rows = [row for row in map(spans.add, results) if row is not None]
+    return rows + [spans.finish()]
+
+def test_round_trip_keeps_results():
+    store = ResultStore.from_results(RESULTS + [{'frame': 'frame_000099.jpg', 'timestamp': 9.0, 'texts': []}])
+    assert len(store) == len(RESULTS)
+    rebuilt = list(store)
+    assert [r['frame'] for r in rebuilt] == [r['frame'] for r in RESULTS]
+    assert rebuilt[1]['texts'][1] == {'text': '雜訊', 'confidence': 0.3, 'bbox': [[10, 5], [200, 5], [200, 40], [10, 40]], 'lang': 'ch_tra'}
+    assert rebuilt[-1]['texts'][0]['bbox'] is None
+    assert rebuilt[-1]['end_frame'] == 'frame_000075.jpg' and rebuilt[-1]['end_timestamp'] == 4.7
+
+def test_spans_match_span_builder():
+    assert ResultStore.from_results(RESULTS).spans() == span_builder_rows(RESULTS)
+    assert ResultStore().spans() == []
+
+def test_write_csv_matches_incremental_writer(tmp_path):
+    with IncrementalResultWriter(str(tmp_path / 'incremental.csv')) as writer:
+        for result in RESULTS:
+            writer.add(result)
+    ResultStore.from_results(RESULTS).write_csv(str(tmp_path / 'store.csv'))
+    assert (tmp_path / 'store.csv').read_bytes() == (tmp_path / 'incremental.csv').read_bytes()
+
+def test_unique_keeps_best_result_per_first_text():
+    results = RESULTS[:3] + [make_result(30, 2.0, ('我要退出CRYCHIC', 0.95))]
+    unique = remove_duplicates(ResultStore.from_results(results))
+    assert [r['frame'] for r in unique] == ['frame_000008.jpg', 'frame_000030.jpg']
+    assert remove_duplicates(results) == unique
+
+def test_growth_take_and_pickle():
+    store = ResultStore(capacity=2)
+    store.extend(RESULTS * 50)
+    assert len(store) == 300
+    subset = store.take(np.array([4, 1]))
+    assert [r['frame'] for r in subset] == ['frame_000040.jpg', 'frame_000008.jpg']
+    assert len(list(subset)[1]['texts']) == 2
+
+    restored = pickle.loads(pickle.dumps(store))
+    assert list(restored) == list(store)
+    restored.append(make_result(100, 9.0, ('新的一句', 0.9)))
+    assert list(restored)[-1]['texts'][0]['text'] == '新的一句'
@@ -0,0 +1,93 @@
+import csv
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from result_writer import CSV_HEADER, IncrementalCSVWriter, IncrementalResultWriter, SpanBuilder, repair_csv, splice_ranges
+
+def make_result(frame, timestamp, text, confidence=0.9):
+    return {
+        'frame': f'frame_{frame:06d}.jpg',
+        'timestamp': timestamp,
+        'texts': [{'text': text, 'confidence': confidence, 'bbox': None, 'lang': 'ch_tra'}]
+    }
+
+def read_rows(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return list(csv.reader(f))
+
+def test_span_is_final_when_text_changes():
+    spans = SpanBuilder()
+    assert spans.add(make_result(10, 1.0, '傳訊息也都沒有回', 0.7)) is None
+    assert spans.add(make_result(20, 2.0, '傳訊息也都沒有回', 0.9)) is None
+    row = spans.add(make_result(30, 3.5, '我要退出 CRYCHIC'))
+    assert row['text'] == '傳訊息也都沒有回'
+    assert row['score'] == 0.9
+    assert row['start_frame'] == 'frame_000010.jpg'
+    assert row['end_frame'] == 'frame_000030.jpg'
+    assert row['start_time'] == '00:01,000'
+    assert row['end_time'] == '00:03,500'
+    last = spans.finish()
+    assert last['text'] == '我要退出 CRYCHIC'
+    assert last['end_frame'] == 'frame_000030.jpg'
+
+def test_rows_are_on_disk_before_close(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    writer = IncrementalResultWriter(path)
+    writer.add(make_result(10, 1.0, 'first'))
+    writer.add(make_result(30, 3.0, 'second'))
+    # The first span is complete and already readable, even without close()
+    rows = read_rows(path)
+    assert rows[0] == CSV_HEADER
+    assert [row[2] for row in rows[1:]] == ['first']
+    writer.close()
+    assert [row[2] for row in read_rows(path)[1:]] == ['first', 'second']
+
+def test_reopen_drops_torn_row(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    with IncrementalResultWriter(path) as writer:
+        writer.add(make_result(10, 1.0, 'first'))
+        writer.add(make_result(30, 3.0, 'second'))
+    with open(path, 'ab') as f:
+        f.write('abc,0.9,"torn'.encode('utf-8'))
+
+    assert repair_csv(path) > 0
+    assert [row[2] for row in read_rows(path)[1:]] == ['first', 'second']
+
+    # Appending after a repair keeps a single header
+    with IncrementalCSVWriter(path) as writer:
+        writer.write_row({
+            'id': 'x', 'score': 1.0, 'text': 'third', 'episode': '1', 'start_time': '00:04,000',
+            'end_time': '00:05,000', 'start_frame': 'a', 'end_frame': 'b'
+        })
+    rows = read_rows(path)
+    assert rows.count(CSV_HEADER) == 1
+    assert [row[2] for row in rows[1:]] == ['first', 'second', 'third']
+
+def test_explicit_end_from_subtitle_cues():
+    spans = SpanBuilder()
+    cue = make_result(24, 1.0, '你好')
+    cue.update({'end_frame': 'frame_000059.jpg', 'end_timestamp': 2.5})
+    spans.add(cue)
+    row = spans.add(make_result(72, 3.0, '第二句'))
+    assert row['end_frame'] == 'frame_000059.jpg'
+    assert row['end_time'] == '00:02,500'
+
+def test_range_rows_replace_rows_inside_the_ranges(tmp_path):
+    full, rerun = str(tmp_path / 'ocr_results.csv'), str(tmp_path / 'ranges.csv')
+    with IncrementalResultWriter(full) as writer:
+        for frame, text in [(0, 'one'), (30, 'two'), (60, 'three'), (90, 'four')]:
+            writer.add(make_result(frame, frame / 30, text))
+    with IncrementalResultWriter(rerun) as writer:
+        writer.add(make_result(30, 1.0, 'two fixed'))
+        writer.add(make_result(45, 1.5, 'new line'))
+
+    assert splice_ranges(full, rerun, [(30, 60)]) == 5
+    rows = read_rows(full)
+    assert rows[0] == CSV_HEADER
+    assert [(row[2], row[6]) for row in rows[1:]] == [
+        ('one', 'frame_000000.jpg'), ('two fixed', 'frame_000030.jpg'), ('new line', 'frame_000045.jpg'),
+        ('three', 'frame_000060.jpg'), ('four', 'frame_000090.jpg')]
+    assert not Path(rerun).exists()
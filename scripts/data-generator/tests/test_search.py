@@ -0,0 +1,81 @@
+import importlib
+import sqlite3
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from storage import MATCH_END, MATCH_START, Storage
+
+def save(storage, youtube_id, frame, text):
+    storage.save_frame(youtube_id, {'frame': f'frame_{frame:06d}.jpg', 'text': text, 'timestamp': frame / 30, 'confidence': 0.9})
+
+def found(storage, query, **kwargs):
+    return [(frame['youtube_id'], frame['frame_number']) for frame in storage.search_frames(query, **kwargs)]
+
+def test_index_follows_inserts_edits_and_deletes(tmp_path):
+    db_path = str(tmp_path / 'state.db')
+    # A database from before the index: existing frames are indexed when it is created
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('CREATE TABLE frames (id TEXT PRIMARY KEY, youtube_id TEXT NOT NULL, frame_number TEXT NOT NULL, '
+                     'text TEXT, timestamp REAL, confidence REAL, is_deleted BOOLEAN DEFAULT 0, modified_text TEXT, '
+                     'frame_index INTEGER, UNIQUE(youtube_id, frame_number))')
+        conn.execute("INSERT INTO frames VALUES ('x', 'abc123', 'frame_000008.jpg', '為什麼要演奏春日影', 0.3, 0.9, 0, NULL, 8)")
+    storage = Storage(db_path)
+    assert storage.full_text
+    assert found(storage, '春日影') == [('abc123', 'frame_000008.jpg')]
+
+    # Re-saving a frame replaces its text in the index too
+    save(storage, 'abc123', 8, '今天的天氣真好')
+    save(storage, 'abc123', 16, '我們一起組樂團吧')
+    assert found(storage, '春日影') == []
+    assert found(storage, '天氣真') == [('abc123', 'frame_000008.jpg')]
+
+    storage.update_frame('abc123', 'frame_000016.jpg', modified_text='我們一起組 Band 吧')
+    hit = storage.search_frames('band')[0]
+    assert hit['frame_number'] == 'frame_000016.jpg'
+    assert hit['snippet'] == f'我們一起組 {MATCH_START}Band{MATCH_END} 吧'
+    # Short queries are scanned, with the same result shape
+    assert storage.search_frames('樂團')[0]['snippet'] == f'我們一起組{MATCH_START}樂團{MATCH_END}吧'
+
+    storage.update_frame('abc123', 'frame_000016.jpg', is_deleted=True)
+    assert found(storage, 'band') == []
+    assert found(storage, 'band', include_deleted=True) == [('abc123', 'frame_000016.jpg')]
+    storage.delete_frames_in_ranges('abc123', [(0, None)])
+    assert found(storage, '天氣真') == []
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO frames_fts (frames_fts, rank) VALUES ('integrity-check', 1)")
+
+def test_duplicate_lines_across_jobs(tmp_path):
+    storage = Storage(str(tmp_path / 'state.db'))
+    save(storage, 'first', 8, '為什麼要演奏春日影')
+    save(storage, 'first', 16, '嗯')
+    save(storage, 'second', 24, '為什麼要演奏春日影')
+    save(storage, 'second', 32, '嗯')
+    save(storage, 'second', 40, '為什麼要演奏春日影啊')
+    save(storage, 'second', 48, '我們一起組樂團吧')
+    storage.update_frame('second', 'frame_000048.jpg', modified_text='為什麼要演奏春日影')
+
+    duplicates = storage.find_duplicate_lines('second')
+    assert [(line['frame_number'], line['text']) for line in duplicates] == [
+        ('frame_000024.jpg', '為什麼要演奏春日影'), ('frame_000048.jpg', '為什麼要演奏春日影')]
+    assert duplicates[0]['matches'] == [{'youtube_id': 'first', 'frame_number': 'frame_000008.jpg'}]
+    storage.update_frame('first', 'frame_000008.jpg', is_deleted=True)
+    assert storage.find_duplicate_lines('second') == []
+
+def test_search_route_escapes_and_highlights(tmp_path, monkeypatch):
+    web_ui = importlib.import_module('web_ui')
+    storage = Storage(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(web_ui, 'storage', storage)
+    save(storage, 'abc123', 8, '<b>春日影</b>')
+    client = web_ui.app.test_client()
+
+    response = client.get('/search?q=春日影')
+    assert response.status_code == 200
+    frames = response.get_json()['frames']
+    assert frames[0]['snippet'] == '&lt;b&gt;<mark>春日影</mark>&lt;/b&gt;'
+    assert client.get('/search?q=春日影&youtube_id=other').get_json()['frames'] == []
+    assert client.get('/search').status_code == 400
+    assert client.get('/search?q=abc&deleted=maybe').status_code == 400
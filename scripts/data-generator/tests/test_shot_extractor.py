@@ -0,0 +1,57 @@
+import csv
+import shutil
+import pytest
+import numpy as np
+import cv2
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from shot_extractor import INDEX_FILE, consecutive_similarity, extract_shots, run_episodes
+
+@pytest.fixture
+def three_shots(tmp_path):
+    """90 frames: three 30-frame shots of a slowly panning texture each."""
+    rng = np.random.default_rng(0)
+    video_path = str(tmp_path / 'episode.mp4')
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (160, 120))
+    for shot in range(3):
+        texture = cv2.resize(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8), (200, 120), interpolation=cv2.INTER_CUBIC)
+        for i in range(30):
+            writer.write(np.ascontiguousarray(texture[:, i:i + 160]))
+    writer.release()
+    return video_path
+
+def test_similarity_matches_match_template():
+    rng = np.random.default_rng(1)
+    thumbs = rng.integers(0, 256, (5, 100, 100, 3), dtype=np.uint8)
+    thumbs[2] = thumbs[1] // 2 + 40
+    expected = [cv2.matchTemplate(thumbs[i], thumbs[i - 1], cv2.TM_CCOEFF_NORMED)[0][0] for i in range(1, 5)]
+    assert consecutive_similarity(thumbs) == pytest.approx(expected, abs=1e-4)
+
+    flat = np.zeros((3, 10, 10, 3), dtype=np.uint8)
+    flat[2] = rng.integers(0, 256, (10, 10, 3), dtype=np.uint8)
+    assert consecutive_similarity(flat).tolist() == [1.0, 0.0]
+
+@pytest.mark.parametrize('decoder', ['opencv', 'ffmpeg'])
+def test_cuts_are_saved_with_an_index(three_shots, tmp_path, decoder):
+    if decoder == 'ffmpeg' and shutil.which('ffmpeg') is None:
+        pytest.skip('ffmpeg not installed')
+    output_dir = tmp_path / f'shots_{decoder}'
+    # Blocks of 16 put the cuts inside blocks and the block edges inside shots
+    rows = extract_shots(three_shots, str(output_dir), frame_skip=2, decoder=decoder, block_size=16)
+    assert [row['frame'] for row in rows] == [30, 60]
+    assert rows[0]['time'] == '00:00:01,000' and float(rows[1]['timestamp']) == pytest.approx(2.0)
+    assert (output_dir / 'frame_000030.jpg').exists()
+    with open(output_dir / INDEX_FILE, encoding='utf-8') as f:
+        assert [int(row['frame']) for row in csv.DictReader(f)] == [30, 60]
+
+def test_episodes_with_an_index_are_skipped(three_shots, tmp_path, capsys):
+    tasks = [(three_shots, str(tmp_path / 'a')), (three_shots, str(tmp_path / 'b'))]
+    run_episodes(tasks, workers=1, frame_skip=3)
+    (tmp_path / 'a' / 'frame_000030.jpg').unlink()
+    run_episodes(tasks, workers=2, frame_skip=3)
+    assert 'Skipping 2 episode(s)' in capsys.readouterr().out
+    assert not (tmp_path / 'a' / 'frame_000030.jpg').exists()
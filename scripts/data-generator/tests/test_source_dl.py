@@ -1,12 +1,17 @@
 import pytest
+import functools
 import os
+import shutil
 import sys
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from pathlib import Path
 
 # Add parent directory to Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from source_dl import download_video, download_playlist
+import source_dl
+from source_dl import download_video, download_playlist, format_args, YT_DLP_PATH
 
 @pytest.fixture
 def setup_downloads_dir():
@@ -29,43 +34,106 @@ def setup_downloads_dir():
         except:
             pass
 
+def mock_yt_dlp(mocker, stdout=''):
+    """Mock subprocess.run as a successful yt-dlp call printing ``stdout``."""
+    return mocker.patch('subprocess.run', return_value=mocker.Mock(returncode=0, stdout=stdout, stderr=''))
+
 def test_download_video(setup_downloads_dir, mocker):
     """Test single video download"""
-    # Mock subprocess.run
-    mock_run = mocker.patch('subprocess.run')
+    mock_run = mock_yt_dlp(mocker, stdout='/tmp/downloads/test [test123].mp4\n')
     
     test_url = "https://youtube.com/watch?v=test123"
-    download_video(test_url)
-    
-    # Check that subprocess.run was called twice (once for -i, once for download)
-    assert mock_run.call_count == 2
+    paths = download_video(test_url)
     
-    # Verify the calls
-    calls = mock_run.call_args_list
-    assert '-i' in str(calls[0])  # First call should check formats
-    assert test_url in str(calls[1])  # Second call should download
+    # A single yt-dlp call: no separate -F format listing
+    assert mock_run.call_count == 1
+    cmd = mock_run.call_args[0][0]
+    assert '-F' not in cmd
+    assert '--no-playlist' in cmd
+    assert cmd[cmd.index('-N') + 1] == '8'
+    assert test_url == cmd[-1]
+    assert paths == ['/tmp/downloads/test [test123].mp4']
 
 def test_download_playlist(setup_downloads_dir, mocker):
     """Test playlist download"""
-    # Mock subprocess.run
-    mock_run = mocker.patch('subprocess.run')
+    mock_run = mock_yt_dlp(mocker, stdout='/tmp/a.mp4\n/tmp/b.mp4\n')
     
     test_url = "https://youtube.com/playlist?list=test123"
-    download_playlist(test_url)
+    paths = download_playlist(test_url)
+    
+    assert mock_run.call_count == 1
+    cmd = mock_run.call_args[0][0]
+    assert '--yes-playlist' in cmd
+    assert test_url in cmd
+    assert paths == ['/tmp/a.mp4', '/tmp/b.mp4']
+
+def test_unknown_profile(setup_downloads_dir, mocker):
+    mock_run = mock_yt_dlp(mocker)
+    with pytest.raises(ValueError):
+        download_video("https://youtube.com/watch?v=test123", profile='4k')
+    assert mock_run.call_count == 0
+
+@pytest.mark.parametrize('heights, expected', [
+    ([360, 480, 720, 1080, 2160], 720),
+    ([360, 480, 1080, 2160], 1080),
+    ([360, 480], 480),
+])
+def test_ocr_profile_picks_smallest_format_meeting_target(heights, expected):
+    yt_dlp = pytest.importorskip('yt_dlp')
+    opts = dict(yt_dlp.parse_options(format_args('ocr')).ydl_opts, quiet=True, simulate=True)
+    formats = [
+        {'format_id': f'{height}-{ext}', 'url': f'http://example.com/{height}.{ext}', 'ext': ext,
+         'height': height, 'width': height * 16 // 9, 'vcodec': 'avc1', 'acodec': 'none', 'protocol': 'https'}
+        for height in heights for ext in ('webm', 'mp4')
+    ]
+    info = {'id': 'x', 'title': 'x', 'formats': formats, 'extractor': 'generic',
+            'extractor_key': 'Generic', 'webpage_url': 'http://example.com'}
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        chosen = ydl.process_ie_result(info, download=False)
+    assert chosen['format_id'] == f'{expected}-mp4'
+
+@pytest.fixture
+def sample_server(tmp_path):
+    """Serve a short MP4 over a local HTTP server."""
+    cv2 = pytest.importorskip('cv2')
+    import numpy as np
+    
+    site = tmp_path / 'site'
+    site.mkdir()
+    writer = cv2.VideoWriter(str(site / 'sample.mp4'), cv2.VideoWriter_fourcc(*'mp4v'), 24, (320, 240))
+    for i in range(48):
+        writer.write(np.full((240, 320, 3), i * 5, dtype=np.uint8))
+    writer.release()
+    
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(site))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/sample.mp4'
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.skipif(shutil.which(YT_DLP_PATH) is None, reason='yt-dlp not installed')
+def test_download_from_local_server(sample_server, tmp_path, monkeypatch):
+    """Offline end-to-end download through yt-dlp's generic extractor, deduplicated by video ID."""
+    downloads = tmp_path / 'downloads'
+    downloads.mkdir()
+    monkeypatch.setattr(source_dl, 'ensure_downloads_dir', lambda: str(downloads))
     
-    # Check that subprocess.run was called twice
-    assert mock_run.call_count == 2
+    paths = download_video(sample_server)
+    assert len(paths) == 1 and os.path.getsize(paths[0]) > 0
+    assert '[sample]' in os.path.basename(paths[0])
+    mtime = os.path.getmtime(paths[0])
     
-    # Verify the calls
-    calls = mock_run.call_args_list
-    assert '-i' in str(calls[0])  # First call should check formats
-    assert '--playlist' in str(calls[1])  # Second call should have playlist flag
-    assert test_url in str(calls[1])
+    # The same video ID is not downloaded again
+    assert download_video(sample_server) == paths
+    assert os.path.getmtime(paths[0]) == mtime
+    assert os.listdir(downloads) == [os.path.basename(paths[0])]
 
 def test_downloads_directory_creation(setup_downloads_dir, mocker):
     """Test that downloads directory is created if it doesn't exist"""
     # Mock subprocess.run to prevent actual downloads
-    mocker.patch('subprocess.run')
+    mock_yt_dlp(mocker)
     
     # Remove downloads directory if it exists
     downloads_dir = 'downloads'
@@ -0,0 +1,36 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.bench_startup import ENTRY_POINTS, HEAVY_MODULES
+
+def test_entry_points_do_not_import_ocr_dependencies():
+    code = (
+        f"import sys\n"
+        f"for module in {list(ENTRY_POINTS)!r}:\n"
+        f"    __import__(module)\n"
+        f"print(','.join(name for name in {list(HEAVY_MODULES)!r} if name in sys.modules))\n"
+    )
+    process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                             cwd=str(Path(__file__).parent.parent))
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip() == ''
+
+def test_spawned_worker_import_has_no_side_effects(tmp_path):
+    # A spawn child runs the parent's main script as __mp_main__
+    (tmp_path / 'ocr_results.csv').write_text('id\n')
+    code = (
+        "import runpy, sys, threading\n"
+        f"sys.path.insert(0, {str(Path(__file__).parent.parent)!r})\n"
+        "before = threading.active_count()\n"
+        f"runpy.run_path({str(Path(__file__).parent.parent / 'web_ui.py')!r}, run_name='__mp_main__')\n"
+        "print(threading.active_count() - before)\n"
+    )
+    process = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=str(tmp_path))
+    assert process.returncode == 0, process.stderr
+    assert process.stdout.strip().splitlines()[-1] == '0'
+    # No database opened, and the atexit cleanup did not remove the parent's results
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['ocr_results.csv']
@@ -0,0 +1,66 @@
+import json
+import pytest
+import numpy as np
+import cv2
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from subtitle_detector import DEFAULT_THRESHOLD, SubtitleDetector, save_calibration, subtitle_score, threshold_for
+from video_ocr import process_video
+
+def subtitle_band(text='SUBTITLE LINE', background=90, width=1280, height=216):
+    """A band with white text and a dark outline, the way our subtitles look."""
+    band = np.full((height, width, 3), background, dtype=np.uint8)
+    origin = (width // 4, height // 2 + 20)
+    cv2.putText(band, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 2.0, (0, 0, 0), 12, cv2.LINE_AA)
+    cv2.putText(band, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 2.0, (255, 255, 255), 4, cv2.LINE_AA)
+    return band
+
+def test_outlined_text_scores_above_plain_bands():
+    assert subtitle_score(subtitle_band()) > DEFAULT_THRESHOLD
+    assert subtitle_score(subtitle_band(background=30)) > DEFAULT_THRESHOLD
+
+    gradient = np.tile(np.linspace(0, 255, 1280, dtype=np.uint8), (216, 1))
+    white = np.full((216, 1280, 3), 255, dtype=np.uint8)
+    # White text without an outline is not our subtitle style
+    unoutlined = np.full((216, 1280, 3), 200, dtype=np.uint8)
+    cv2.putText(unoutlined, 'SUBTITLE LINE', (320, 128), cv2.FONT_HERSHEY_SIMPLEX, 2.0, (255, 255, 255), 4)
+    for band in (np.zeros((216, 1280, 3), dtype=np.uint8), cv2.cvtColor(gradient, cv2.COLOR_GRAY2BGR), white, unoutlined):
+        assert subtitle_score(band) < DEFAULT_THRESHOLD
+
+def test_threshold_from_false_negative_rate(tmp_path):
+    positives = np.linspace(0.01, 1.0, 100)
+    assert threshold_for(np.percentile(positives, np.linspace(0, 100, 101)), 0.0) == pytest.approx(0.01)
+    path = str(tmp_path / 'calibration.json')
+    save_calibration(positives, np.zeros(10), path=path)
+    assert json.load(open(path))['positives'] == 100
+
+    detector = SubtitleDetector.load(0.1, path=path)
+    rejected = sum(not detector(np.full((4, 4), 0, dtype=np.uint8)) for _ in range(3))
+    assert rejected == 3 and detector.seen == 3
+    assert (positives < detector.threshold).mean() <= 0.1
+    assert SubtitleDetector.load(0.1, path=str(tmp_path / 'missing.json')).threshold == DEFAULT_THRESHOLD
+    with pytest.raises(ValueError):
+        SubtitleDetector.load(1.0, path=path)
+
+def test_rejected_frames_skip_ocr(tmp_path):
+    video_path = str(tmp_path / 'sample.mp4')
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (64, 48))
+    for i in range(90):
+        writer.write(np.full((48, 64, 3), i * 2, dtype=np.uint8))
+    writer.release()
+
+    class CountingReader:
+        calls = 0
+        def readtext(self, image):
+            CountingReader.calls += 1
+            return [([[0, 0], [10, 0], [10, 10], [0, 10]], 'line', 0.9)]
+
+    detector = SubtitleDetector(threshold=1.0)
+    results = list(process_video(video_path, frame_skip=2, readers=(CountingReader(), CountingReader()),
+                                 frames_dir=str(tmp_path / 'frames'), subtitle_detector=detector))
+    assert results == [] and CountingReader.calls == 0
+    assert detector.seen > 0 and detector.rejected == detector.seen
@@ -0,0 +1,76 @@
+import shutil
+import subprocess
+import pytest
+import numpy as np
+import cv2
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from subtitle_streams import (
+    choose_subtitle_stream, cue_frames, cues_to_rows, extract_cues, find_subtitle_track,
+    merge_simultaneous_cues, parse_srt
+)
+
+SAMPLE_SRT = """1
+00:00:34,284 --> 00:00:36,785
+{\\an8}<i>你全身都濕透了,</i>
+沒事吧?
+
+2
+00:00:38,329 --> 00:00:40,247
+傳訊息也都沒有回
+
+"""
+
+def test_parse_srt_strips_tags_and_joins_lines():
+    cues = parse_srt(SAMPLE_SRT)
+    assert cues == [
+        (34.284, 36.785, '你全身都濕透了, 沒事吧?'),
+        (38.329, 40.247, '傳訊息也都沒有回'),
+    ]
+
+def test_simultaneous_cues_are_joined():
+    cues = [(1.0, 2.0, '上句'), (1.0, 2.0, '下句'), (3.0, 4.0, '下一句')]
+    assert merge_simultaneous_cues(cues) == [(1.0, 2.0, '上句 下句'), (3.0, 4.0, '下一句')]
+
+def test_choose_prefers_traditional_chinese():
+    streams = [
+        {'index': 0, 'codec_type': 'video', 'codec_name': 'hevc'},
+        {'index': 2, 'codec_type': 'subtitle', 'codec_name': 'ass', 'tags': {'language': 'chi', 'title': 'CHS'}},
+        {'index': 3, 'codec_type': 'subtitle', 'codec_name': 'ass', 'tags': {'language': 'chi', 'title': 'CHT'}},
+        {'index': 4, 'codec_type': 'subtitle', 'codec_name': 'hdmv_pgs_subtitle', 'tags': {'title': '繁體'}},
+    ]
+    assert choose_subtitle_stream(streams)['index'] == 3
+    assert choose_subtitle_stream(streams[:1] + streams[3:]) is None
+
+def test_rows_use_video_frame_numbers():
+    # mygo.csv lists 00:00:34,284 -> 00:00:36,785 as frames 821-881. At 23.976 fps 34.284 s is
+    # frame 821.99, so frame 821 (34.242 s) is shown before the cue starts and 822 is its first frame
+    assert cue_frames(34.284, 36.785, 24000 / 1001) == (822, 881)
+    row = cues_to_rows([(34.284, 36.785, '你全身都濕透了, 沒事吧?')], 24000 / 1001, episode='1')[0]
+    assert row['start_time'] == '00:00:34,284'
+    assert row['end_time'] == '00:00:36,785'
+    assert row['score'] == 1.0
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+def test_extract_embedded_stream(tmp_path):
+    video_path = str(tmp_path / 'video.mp4')
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), 24, (64, 48))
+    for _ in range(24 * 5):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+    srt_path = tmp_path / 'sub.srt'
+    srt_path.write_text("1\n00:00:01,000 --> 00:00:02,000\n我要退出 CRYCHIC\n\n", encoding='utf-8')
+    mkv_path = str(tmp_path / 'video.mkv')
+    subprocess.run([
+        'ffmpeg', '-v', 'error', '-i', video_path, '-i', str(srt_path), '-map', '0', '-map', '1',
+        '-c', 'copy', '-c:s', 'ass', '-metadata:s:s:0', 'language=chi', mkv_path
+    ], check=True)
+
+    stream, fps = find_subtitle_track(mkv_path)
+    assert stream is not None and fps == 24
+    assert extract_cues(mkv_path, stream['index']) == [(1.0, 2.0, '我要退出 CRYCHIC')]
+    assert find_subtitle_track(video_path)[0] is None
@@ -0,0 +1,79 @@
+import pytest
+import importlib
+import os
+import cv2
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import thumbnails
+from thumbnails import ThumbnailWorker, etag, frame_file, size_path
+
+def write_frame(frames_dir, name='frame_000024.jpg', shape=(720, 1280)):
+    frames_dir.mkdir(exist_ok=True)
+    image = np.random.default_rng(0).integers(0, 255, shape + (3,), dtype=np.uint8)
+    path = frames_dir / name
+    cv2.imwrite(str(path), image)
+    return str(path), image
+
+def test_worker_renders_every_size(tmp_path):
+    frame_path, image = write_frame(tmp_path / 'frames')
+    worker = ThumbnailWorker()
+    worker.submit(frame_path, image)
+    worker.join()
+    for size, width in thumbnails.SIZES.items():
+        rendered = cv2.imread(size_path(frame_path, size))
+        assert rendered.shape[1] == width
+        assert rendered.shape[0] == round(720 * width / 1280)
+
+def test_frame_file_renders_on_demand(tmp_path):
+    frames_dir = tmp_path / 'frames'
+    frame_path, _ = write_frame(frames_dir)
+    assert frame_file('frame_000024.jpg', frames_dir=str(frames_dir)) == frame_path
+    thumb = frame_file('frame_000024.jpg', 'thumb', frames_dir=str(frames_dir))
+    assert os.path.isfile(thumb)
+    with pytest.raises(ValueError):
+        frame_file('frame_000024.jpg', 'huge', frames_dir=str(frames_dir))
+    with pytest.raises(FileNotFoundError):
+        frame_file('frame_999999.jpg', 'thumb', frames_dir=str(frames_dir))
+
+def test_etag_follows_content(tmp_path):
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(b'one')
+    first = etag(str(path))
+    assert etag(str(path)) == first
+    path.write_bytes(b'two!')
+    assert etag(str(path)) != first
+    # The cache is bounded
+    for i in range(thumbnails.ETAG_CACHE_SIZE + 10):
+        etag_path = tmp_path / f'{i}.jpg'
+        etag_path.write_bytes(b'x')
+        etag(str(etag_path))
+    assert thumbnails._content_hash.cache_info().currsize == thumbnails.ETAG_CACHE_SIZE
+
+def test_frames_route_caching(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    web_ui = importlib.import_module('web_ui')
+    write_frame(tmp_path / 'frames')
+    client = web_ui.app.test_client()
+
+    response = client.get('/frames/frame_000024.jpg?size=thumb&v=abc123')
+    assert response.status_code == 200
+    assert cv2.imdecode(np.frombuffer(response.data, np.uint8), cv2.IMREAD_COLOR).shape[1] == 320
+    assert 'immutable' in response.headers['Cache-Control']
+    tag = response.headers['ETag']
+    assert not tag.startswith('W/')
+
+    revalidated = client.get('/frames/frame_000024.jpg?size=thumb&v=abc123', headers={'If-None-Match': tag})
+    assert revalidated.status_code == 304
+
+    unversioned = client.get('/frames/frame_000024.jpg')
+    assert unversioned.status_code == 200
+    assert 'no-cache' in unversioned.headers['Cache-Control']
+
+    assert client.get('/frames/frame_000024.jpg?size=huge').status_code == 400
+    assert client.get('/frames/missing.jpg?size=thumb').status_code == 404
+    assert client.get('/frames/../web_ui.py').status_code == 404
@@ -0,0 +1,89 @@
+import multiprocessing
+import time
+import pytest
+import sys
+from pathlib import Path
+
+# Add parent directory to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from work_queue import LeaseLost, WorkQueue, job_key, run_worker
+from tests.conftest import FakeReader, write_video
+
+LINES = ['傳訊息也都沒有回', '我要退出 CRYCHIC', '為什麼要演奏春日影']
+
+def line(frame_index):
+    """A new line every 30 frames."""
+    return LINES[frame_index // 30], 0.9
+
+def result(frame, text):
+    return {'frame': f'frame_{frame:06d}.jpg', 'timestamp': frame / 30,
+            'texts': [{'text': text, 'confidence': 0.9, 'bbox': [[0, 0], [10, 0], [10, 10], [0, 10]], 'lang': 'ch_tra'}]}
+
+def node(db_path, owner, frames_dir):
+    run_worker(db_path, owner, readers=(FakeReader(line), FakeReader(line)), frames_dir=frames_dir,
+               lease_seconds=5, heartbeat_interval=0.5)
+
+def test_expired_lease_is_reclaimed_and_results_are_idempotent(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), lease_seconds=0.2, max_attempts=2)
+    assert queue.enqueue('ep1', 'ep1.mp4', frame_skip=2)
+    assert not queue.enqueue('ep1', 'ep1.mp4', frame_skip=2)
+
+    first = queue.claim('node-a')
+    assert first['settings'] == {'frame_skip': 2} and queue.claim('node-b') is None
+    time.sleep(0.3)
+    second = queue.claim('node-b')
+    assert second['id'] == first['id'] and second['attempts'] == 2
+    assert not queue.heartbeat(first)
+    with pytest.raises(LeaseLost):
+        queue.complete(first, [result(16, LINES[0])])
+
+    assert queue.complete(second, [result(16, LINES[0]), result(16, LINES[0]), result(32, LINES[1])]) == 3
+    assert [r['texts'][0]['text'] for r in queue.results('ep1')] == LINES[:2]
+    with pytest.raises(LeaseLost):
+        queue.complete(second, [result(16, LINES[0])])
+    assert queue.status() == {'ep1': {'done': 1}}
+
+    # An item whose leases keep expiring ends up failed
+    queue.enqueue('ep2', 'ep2.mp4')
+    queue.claim('node-a')
+    time.sleep(0.3)
+    queue.claim('node-a')
+    time.sleep(0.3)
+    assert queue.claim('node-a') is None
+    assert queue.status()['ep2'] == {'failed': 1}
+
+def test_processes_share_the_queue(tmp_path):
+    video_path = write_video(tmp_path / 'ep1.mp4', frames=90)
+
+    db_path = str(tmp_path / 'queue.db')
+    queue = WorkQueue(db_path, lease_seconds=0.1)
+    assert queue.enqueue_video('ep1', video_path, segment_frames=30, frame_skip=2) == 3
+    # A node that claimed an item and died
+    crashed = queue.claim('crashed-node')
+    time.sleep(0.2)
+
+    context = multiprocessing.get_context('spawn')
+    nodes = [context.Process(target=node, args=(db_path, f'node-{i}', str(tmp_path / f'frames-{i}'))) for i in range(3)]
+    for process in nodes:
+        process.start()
+    for process in nodes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    assert queue.status() == {'ep1': {'done': 3}}
+    assert [(r['frame'], r['texts'][0]['text']) for r in queue.results('ep1')] == [
+        ('frame_000016.jpg', LINES[0]), ('frame_000030.jpg', LINES[1]), ('frame_000060.jpg', LINES[2])
+    ]
+    with pytest.raises(LeaseLost):
+        queue.complete(crashed, [])
+
+def test_seasons_with_the_same_file_names_stay_apart(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'))
+    mygo, ave = str(tmp_path / 'contents' / 'mygo' / '1.mp4'), str(tmp_path / 'contents' / 'ave' / '1.mp4')
+    assert (job_key(mygo), job_key(ave), job_key(ave, 'AveMujica')) == ('mygo/1', 'ave/1', 'AveMujica/1')
+    assert queue.enqueue(job_key(mygo), mygo) and queue.enqueue(job_key(ave), ave)
+    # The same job name for another video is an error, not a silent no-op
+    with pytest.raises(ValueError, match='already queued'):
+        queue.enqueue('mygo/1', ave)
+    assert set(queue.status()) == {'mygo/1', 'ave/1'}
@@ -0,0 +1,165 @@
+"""Downscaled frame sizes and cache validators for the review UI.
+
+Each saved frame gets a ``thumb`` (grid card) and ``preview`` (modal and
+live preview) rendition next to it, under ``frames/.sizes/<size>/``. They
+are rendered by a background thread when the frame is saved and on demand
+if a request arrives first.
+
+``etag()`` is a strong validator derived from the file contents, so a
+re-rendered file with identical bytes keeps its tag.
+
+Frames kept in a ``frame_pack`` pack get their sizes in the same pack,
+under the same relative names (``.sizes/<size>/<frame>``).
+"""
+import functools
+import hashlib
+import os
+import queue
+import threading
+
+import cv2
+
+FRAMES_DIR = 'frames'
+SIZES_DIR = '.sizes'
+# Target width in pixels; height follows the frame's aspect ratio
+SIZES = {
+    'thumb': 320,
+    'preview': 960,
+}
+JPEG_QUALITY = 82
+# Files whose ETag is remembered; older entries are evicted least recently used first
+ETAG_CACHE_SIZE = 4096
+
+def size_path(frame_path, size):
+    """Path of the ``size`` rendition of ``frame_path``."""
+    directory, filename = os.path.split(frame_path)
+    return os.path.join(directory, SIZES_DIR, size, filename)
+
+def render_size(image, size):
+    """Downscale ``image`` to the width of ``size`` (never upscales)."""
+    width = SIZES[size]
+    height, current_width = image.shape[:2]
+    if current_width <= width:
+        return image
+    return cv2.resize(image, (width, max(1, round(height * width / current_width))), interpolation=cv2.INTER_AREA)
+
+def packed_size_name(filename, size):
+    """Name of the ``size`` rendition of ``filename`` inside a frame pack."""
+    return f'{SIZES_DIR}/{size}/{filename}'
+
+def write_size(frame_path, size, image=None, store=None):
+    """Render and atomically write one rendition; returns its path or None.
+    
+    With ``store`` (a ``frame_pack.FramePackWriter``) the rendition is
+    appended to the pack instead and its name in the pack is returned.
+    """
+    if image is None:
+        image = cv2.imread(frame_path)
+        if image is None:
+            return None
+    ok, data = cv2.imencode('.jpg', render_size(image, size), [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        return None
+    if store is not None:
+        name = packed_size_name(os.path.basename(frame_path), size)
+        store.add(name, data)
+        return name
+    target = size_path(frame_path, size)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Write under a temporary name so a concurrent request never sees half a file
+    tmp_path = f'{target}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data.tobytes())
+    os.replace(tmp_path, target)
+    return target
+
+def frame_file(filename, size=None, frames_dir=FRAMES_DIR):
+    """Path to serve for ``/frames/<filename>?size=``, rendering the size if it is missing.
+
+    Raises ``ValueError`` for an unknown size and ``FileNotFoundError`` when
+    the frame does not exist.
+    """
+    frame_path = os.path.join(frames_dir, filename)
+    if not size or size == 'full':
+        if not os.path.isfile(frame_path):
+            raise FileNotFoundError(frame_path)
+        return frame_path
+    if size not in SIZES:
+        raise ValueError(f"Unknown frame size: {size} (expected one of {', '.join(SIZES)})")
+    target = size_path(frame_path, size)
+    if os.path.isfile(target) and (
+        not os.path.isfile(frame_path) or os.path.getmtime(target) >= os.path.getmtime(frame_path)
+    ):
+        return target
+    if not os.path.isfile(frame_path) or write_size(frame_path, size) is None:
+        raise FileNotFoundError(frame_path)
+    return target
+
+def packed_frame(pack, filename, size=None, store=None):
+    """Name in ``pack`` to serve for ``/frames/<filename>?size=``, or None if the frame is not packed.
+    
+    A missing size is rendered from the packed frame and appended through
+    ``store``. Raises ``ValueError`` for an unknown size.
+    """
+    if size and size != 'full' and size not in SIZES:
+        raise ValueError(f"Unknown frame size: {size} (expected one of {', '.join(SIZES)})")
+    if filename not in pack:
+        return None
+    if not size or size == 'full':
+        return filename
+    name = packed_size_name(filename, size)
+    if name not in pack:
+        image = pack.image(filename)
+        if image is None or store is None or write_size(filename, size, image, store=store) is None:
+            return None
+    return name
+
+@functools.lru_cache(maxsize=ETAG_CACHE_SIZE)
+def _content_hash(path, mtime_ns, size):
+    # mtime and size are only part of the cache key
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def etag(path):
+    """Strong ETag for a file: a content hash, cached per (path, mtime, size)."""
+    stat = os.stat(path)
+    return _content_hash(path, stat.st_mtime_ns, stat.st_size)
+
+class ThumbnailWorker:
+    """Background thread rendering every size of each saved frame.
+
+    ``submit`` is cheap enough to call from ``process_video``'s
+    ``on_frame_saved``; the image array is encoded later, so callers must
+    not modify it afterwards.
+    """
+
+    def __init__(self, sizes=tuple(SIZES), max_pending=256):
+        self.sizes = sizes
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, name='thumbnails', daemon=True)
+        self.thread.start()
+
+    def submit(self, frame_path, image=None, store=None):
+        try:
+            self.queue.put_nowait((frame_path, image, store))
+        except queue.Full:
+            # Drop it; the size is rendered on first request instead
+            pass
+
+    def _run(self):
+        while True:
+            frame_path, image, store = self.queue.get()
+            try:
+                for size in self.sizes:
+                    write_size(frame_path, size, image, store)
+            except Exception as e:
+                print(f"Could not render sizes of {frame_path}: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    def join(self):
+        """Wait until every submitted frame has been rendered."""
+        self.queue.join()
@@ -1,18 +1,38 @@
 import cv2
 import os
-import easyocr
+import sys
 import numpy as np
-import torch
 import csv
-from collections import defaultdict
 import base64
 import uuid
 import hashlib
 from id_generator import generate_frame_id
+from line_merge import merge_near_duplicates, normalize_text
+from result_writer import IncrementalResultWriter
+from ffmpeg_decode import FFmpegFrameReader
+from subtitle_streams import find_subtitle_track, iter_cue_results
+from ocr_backends import EasyOCRBackend, LANGUAGE_SETS, create_backend
+from cpu_planner import applied_plan, apply_plan, load_plan
+from frame_ranges import normalize_ranges
+from crop_archive import CropArchiveWriter
+from result_store import ResultStore
+from subtitle_detector import SubtitleDetector
 
-def init_readers():
-    """Initialize EasyOCR readers with GPU if available."""
+def init_readers(backend='easyocr'):
+    """Initialize the (Chinese, Japanese) OCR backends, EasyOCR with GPU if available."""
+    # torch and easyocr take seconds to import; only OCR runs pay for them
+    if backend != 'easyocr':
+        print(f"Initializing {backend} OCR backend")
+        plan = applied_plan() or apply_plan(load_plan().single_process())
+        return (
+            create_backend(backend, LANGUAGE_SETS['ch_tra'], threads=plan.torch_threads),
+            create_backend(backend, LANGUAGE_SETS['ja'], threads=plan.torch_threads)
+        )
+    
     try:
+        import easyocr
+        import torch
+
         # Force CUDA initialization
         if not torch.cuda.is_available():
             print("CUDA is not available. Running on CPU.")
@@ -61,7 +81,7 @@ def init_readers():
             torch.cuda.empty_cache()  # Clear GPU cache after warmup
             
         print("GPU initialization completed successfully")
-        return ch_reader, ja_reader
+        return EasyOCRBackend(ch_reader), EasyOCRBackend(ja_reader)
         
     except Exception as e:
         print(f"Error initializing GPU: {str(e)}")
@@ -70,7 +90,12 @@ def init_readers():
 
 def init_readers_cpu():
     """Initialize EasyOCR readers in CPU mode."""
+    import easyocr
+
     print("Initializing readers in CPU mode")
+    # Workers started by cpu_planner are already pinned; a plain run gets every core
+    plan = applied_plan() or apply_plan(load_plan().single_process())
+    print(f"CPU layout: {plan.torch_threads} torch threads, {plan.cv2_threads} OpenCV threads")
     reader_config = {
         'gpu': False,
         'model_storage_directory': os.path.join(os.path.dirname(__file__), 'model_cache'),
@@ -82,7 +107,18 @@ def init_readers_cpu():
     
     ch_reader = easyocr.Reader(['ch_tra', 'en'], **reader_config)
     ja_reader = easyocr.Reader(['ja', 'en'], **reader_config)
-    return ch_reader, ja_reader
+    return EasyOCRBackend(ch_reader), EasyOCRBackend(ja_reader)
+
+def _cuda_device():
+    """(torch, current CUDA device) when OCR runs on the GPU, else (None, None).
+
+    Only looks at CUDA if torch is already loaded: GPU readers import it,
+    and a process whose readers never did has nothing on the GPU.
+    """
+    torch = sys.modules.get('torch')
+    if torch is None or not torch.cuda.is_available():
+        return None, None
+    return torch, torch.cuda.current_device()
 
 def crop_subtitle_region(image):
     """Crop the bottom portion of the frame where subtitles typically appear."""
@@ -164,34 +200,143 @@ def perform_ocr(ch_reader, ja_reader, image_path):
         return []
 
 def remove_duplicates(results):
-    """Remove duplicate content across frames and select representative frames."""
-    # Group frames by content
-    content_groups = defaultdict(list)
-    for result in results:
-        if result['texts']:
-            # Use the highest confidence text as the key
-            key = result['texts'][0]['text']
-            content_groups[key].append(result)
-    
-    # Select one representative frame from each group
-    unique_results = []
-    for group in content_groups.values():
-        # Sort by confidence and select the frame with highest confidence
-        group.sort(key=lambda x: max(t['confidence'] for t in x['texts']), reverse=True)
-        unique_results.append(group[0])
+    """Remove duplicate content across frames and select representative frames.
+
+    Keeps the highest-confidence result of each normalized first text, in
+    frame order. ``results`` may be a ``ResultStore`` or any iterable of
+    results.
+    """
+    if not isinstance(results, ResultStore):
+        results = ResultStore.from_results(results)
+    return list(results.unique())
+
+def iter_sampled_frames(cap, frame_skip=1, start_frame=0):
+    """Yield (frame_number, frame) for every frame_skip-th frame of an OpenCV capture.
+
+    Skipped frames are only grabbed, not converted to BGR.
+    """
+    frame_count = 0
+    if start_frame > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        frame_count = start_frame
     
-    # Sort by frame number
-    unique_results.sort(key=lambda x: int(x['frame'].split('_')[1].split('.')[0]))
-    return unique_results
+    while True:
+        # Skip frames according to frame_skip parameter
+        if frame_count % frame_skip != 0:
+            if not cap.grab():
+                break
+            frame_count += 1
+            continue
+        
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame_count, frame
+        frame_count += 1
+
+def detect_texts(readers, image, confidence_threshold=0.6):
+    """OCR ``image`` with each (lang, reader) in turn and return the first language's texts above the threshold."""
+    for lang, reader in readers:
+        texts = [
+            {
+                'text': text,
+                'confidence': prob,
+                'bbox': bbox,
+                'lang': lang
+            }
+            for bbox, text, prob in reader.readtext(image)
+            if prob > confidence_threshold
+        ]
+        if texts:
+            return texts
+    return []
+
+def iter_range_frames(video_path, cap, fps, frame_ranges, frame_skip=1, decoder='opencv'):
+    """Yield (frame_number, timestamp, subtitle_region, get_full_frame) for each sampled frame in ``frame_ranges``.
 
-def process_video(video_path, progress_callback=None, frame_skip=1, confidence_threshold=0.6, pause_event=None, start_frame=0):
-    """Process video and perform OCR on extracted frames."""
+    Each half-open ``(start, end)`` range is seeked to directly, so frames
+    outside the ranges are never decoded; ``end`` None runs to the end of the video.
+    """
+    for range_start, range_end in frame_ranges:
+        frame_reader = None
+        if decoder == 'ffmpeg':
+            # ffmpeg samples, crops and converts inside its filter graph
+            frame_reader = FFmpegFrameReader(video_path, frame_skip=frame_skip, start_frame=range_start)
+            frames = (
+                (index, ts, region, frame_reader.read_full_frame)
+                for index, ts, region in frame_reader
+            )
+        else:
+            frames = (
+                (index, index / fps, crop_subtitle_region(frame), lambda _, frame=frame: frame)
+                for index, frame in iter_sampled_frames(cap, frame_skip, range_start)
+            )
+        try:
+            for item in frames:
+                if range_end is not None and item[0] >= range_end:
+                    break
+                yield item
+        finally:
+            if frame_reader is not None:
+                frame_reader.close()
+
+def process_video(video_path, progress_callback=None, frame_skip=1, confidence_threshold=0.6, pause_event=None, start_frame=0, readers=None, decoder='opencv', use_subtitle_streams=True, ocr_backend='easyocr', end_frame=None, on_frame_saved=None, ranges=None, range_unit='seconds', archive_dir=None, frames_dir='frames', subtitle_detector=None, resume_state=None, on_checkpoint=None, frame_store=None):
+    """Process video and perform OCR on extracted frames.
+
+    ``readers`` is an optional (Chinese, Japanese) reader pair used instead of
+    ``init_readers()``, e.g. the recording/replay readers from ``ocr_replay``.
+    ``decoder`` is ``'opencv'`` (full-frame VideoCapture decode) or ``'ffmpeg'``
+    (subtitle band only, see ``ffmpeg_decode``).
+    If ``use_subtitle_streams`` is set and the video has a text subtitle
+    track, its cues are used directly and no OCR runs at all.
+    ``ocr_backend`` selects the engine from ``ocr_backends`` ('easyocr' or 'onnx').
+    ``end_frame`` stops before that frame (used by ``cpu_planner`` segments).
+    ``ranges`` limits processing to ``[start, end]`` pairs (see ``frame_ranges``;
+    plain numbers are read in ``range_unit``, 'seconds' or 'frames').
+    ``archive_dir`` keeps every sampled crop and raw OCR output in a
+    ``crop_archive`` shard for later re-thresholding or re-OCR.
+    ``on_frame_saved(frame_path, image)`` is called after each frame is written,
+    e.g. ``PHashIndex.frame_saved_callback`` from ``phash_index``.
+    Frames are written to ``frames_dir``, which must exist, or appended to
+    ``frame_store`` (a ``frame_pack.FramePackWriter``) if one is given.
+    ``subtitle_detector`` (a ``subtitle_detector.SubtitleDetector``) skips OCR
+    on bands it finds no subtitle in.
+    ``on_checkpoint(state)`` is called after every sampled frame, once all
+    results before it have been consumed; passing a ``state`` back as
+    ``resume_state`` continues with the next sampled frame and the same
+    text tracking, as if the run had never stopped.
+    """
+    # Text tracking: a line is reported again only once its text changes
+    last_text = None
+    last_text_frame = 0
+    if resume_state:
+        start_frame = max(start_frame, resume_state['next_frame'])
+        last_text = resume_state.get('last_text')
+        last_text_frame = resume_state.get('last_text_frame', 0)
+    
+    if use_subtitle_streams:
+        try:
+            stream, stream_fps = find_subtitle_track(video_path)
+        except Exception as e:
+            print(f"Could not probe subtitle streams: {str(e)}")
+            stream, stream_fps = None, None
+        if stream is not None and stream_fps:
+            yield from iter_cue_results(
+                video_path, stream, stream_fps,
+                start_frame=start_frame,
+                progress_callback=progress_callback,
+                on_frame_saved=on_frame_saved,
+                ranges=normalize_ranges(ranges, stream_fps, range_unit) if ranges else None,
+                frames_dir=frames_dir
+            )
+            return
+    
     # Initialize OCR readers with GPU support
-    ch_reader, ja_reader = init_readers()
+    ch_reader, ja_reader = readers if readers is not None else init_readers(ocr_backend)
     
     # Enable CUDA optimization if available
-    if torch.cuda.is_available():
-        current_device = torch.cuda.current_device()
+    torch, current_device = _cuda_device()
+    if torch is not None:
         with torch.cuda.device(current_device):
             torch.cuda.empty_cache()  # Clear GPU cache before processing
             torch.backends.cudnn.benchmark = True
@@ -214,67 +359,64 @@ def process_video(video_path, progress_callback=None, frame_skip=1, confidence_t
     print(f"Confidence threshold: {confidence_threshold}")
     print(f"Starting from frame: {start_frame}")
     
+    if ranges:
+        # Resuming (start_frame) inside a ranged job skips what is already done
+        frame_ranges = [
+            (max(range_start, start_frame), range_end)
+            for range_start, range_end in normalize_ranges(ranges, fps, range_unit, total_frames)
+            if range_end is None or range_end > start_frame
+        ]
+        print(f"Frame ranges: {frame_ranges}")
+    else:
+        frame_ranges = [(start_frame, end_frame)]
+    
     # Process frames
     seen_texts = set()  # Track unique texts
-    last_text = None
-    last_text_frame = 0
     frame_count = 0
     min_text_duration = 0.5  # Minimum duration (in seconds) to consider text as new
+    frames = iter_range_frames(video_path, cap, fps, frame_ranges, frame_skip, decoder)
+    crop_archive = None
+    if archive_dir:
+        crop_archive = CropArchiveWriter(archive_dir, {
+            'video_path': os.path.abspath(video_path),
+            'fps': fps,
+            'total_frames': total_frames,
+            'frame_skip': frame_skip,
+            'decoder': decoder,
+            'confidence_threshold': confidence_threshold
+        }, tag=f'from{frame_ranges[0][0]}')
+        ch_reader, ja_reader = crop_archive.recording_readers((ch_reader, ja_reader))
     
     try:
         # Skip to start frame if needed
         if start_frame > 0:
             print(f"Skipping to frame {start_frame}")
-            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-            frame_count = start_frame
         
-        while True:
+        for frame_count, timestamp, subtitle_region, get_full_frame in frames:
             # Check for pause if event is provided
             if pause_event:
                 pause_event.wait()
-                
-            ret, frame = cap.read()
-            if not ret:
-                break
             
-            # Skip frames according to frame_skip parameter
-            if frame_count % frame_skip != 0:
-                frame_count += 1
-                continue
-            
-            timestamp = frame_count / fps
+            if crop_archive is not None:
+                crop_archive.add_crop(frame_count, timestamp, subtitle_region)
             
             # Only process frame if enough time has passed since last detected text
-            if frame_count - last_text_frame > fps * min_text_duration:
-                # Crop and process subtitle region
-                subtitle_region = crop_subtitle_region(frame)
+            # Bands without the outlined-text pattern never reach OCR
+            if frame_count - last_text_frame > fps * min_text_duration and (
+                subtitle_detector is None or subtitle_detector(subtitle_region)
+            ):
+                # Let frame-aware readers (record/replay) know where we are
+                for reader in (ch_reader, ja_reader):
+                    if hasattr(reader, 'seek_frame'):
+                        reader.seek_frame(frame_count)
                 
                 try:
-                    # Try Chinese OCR first
-                    ch_results = ch_reader.readtext(subtitle_region)
-                    texts = []
-                    
-                    # Process Chinese results
-                    for (bbox, text, prob) in ch_results:
-                        if prob > confidence_threshold:
-                            texts.append({
-                                'text': text,
-                                'confidence': prob,
-                                'bbox': bbox,
-                                'lang': 'ch_tra'
-                            })
-                    
-                    # If no good Chinese results, try Japanese
-                    if not texts:
-                        ja_results = ja_reader.readtext(subtitle_region)
-                        for (bbox, text, prob) in ja_results:
-                            if prob > confidence_threshold:
-                                texts.append({
-                                    'text': text,
-                                    'confidence': prob,
-                                    'bbox': bbox,
-                                    'lang': 'ja'
-                                })
+                    # Chinese first, Japanese only if Chinese found nothing
+                    texts = detect_texts(
+                        [('ch_tra', ch_reader), ('ja', ja_reader)],
+                        subtitle_region,
+                        confidence_threshold
+                    )
                     
                     if texts:
                         # Get highest confidence text
@@ -283,8 +425,15 @@ def process_video(video_path, progress_callback=None, frame_skip=1, confidence_t
                         # Only process if text is different from last one
                         if best_text['text'] != last_text:
                             # Save full frame
-                            frame_path = os.path.join('frames', f'frame_{frame_count:06d}.jpg')
-                            cv2.imwrite(frame_path, frame)  # Save full frame for context
+                            frame_path = os.path.join(frames_dir, f'frame_{frame_count:06d}.jpg')
+                            full_frame = get_full_frame(frame_count)
+                            # Save full frame for context
+                            if frame_store is not None:
+                                frame_store.add_image(os.path.basename(frame_path), full_frame)
+                            else:
+                                cv2.imwrite(frame_path, full_frame)
+                            if on_frame_saved:
+                                on_frame_saved(frame_path, full_frame)
                             
                             frame_result = {
                                 'frame': os.path.basename(frame_path),
@@ -314,7 +463,7 @@ def process_video(video_path, progress_callback=None, frame_skip=1, confidence_t
                             yield frame_result
                     
                     # Periodically clear GPU cache to prevent memory buildup
-                    if frame_count % 100 == 0 and torch.cuda.is_available():
+                    if frame_count % 100 == 0 and torch is not None:
                         with torch.cuda.device(current_device):
                             torch.cuda.empty_cache()
                         
@@ -333,12 +482,23 @@ def process_video(video_path, progress_callback=None, frame_skip=1, confidence_t
                         processed_frames=frame_count
                     )
             
-            frame_count += 1
+            if on_checkpoint:
+                # The consumer has handled every result up to this frame
+                on_checkpoint({
+                    'next_frame': frame_count + frame_skip,
+                    'last_text': last_text,
+                    'last_text_frame': last_text_frame
+                })
             
     finally:
+        frames.close()
         cap.release()
+        if subtitle_detector is not None:
+            print(f"Subtitle detector skipped OCR on {subtitle_detector.rejected}/{subtitle_detector.seen} frames")
+        if crop_archive is not None:
+            crop_archive.close()
         # Final GPU cleanup
-        if torch.cuda.is_available():
+        if torch is not None:
             with torch.cuda.device(current_device):
                 torch.cuda.empty_cache()
 
@@ -346,86 +506,55 @@ def save_results(results, base_filename):
     """Save OCR results to CSV file."""
     print("\nProcessing results...")
     
-    # Format results for CSV
-    formatted_results = []
-    current_text = None
-    start_frame = None
-    start_time = None
-    
-    for result in results:
-        frame_name = result['frame']
-        timestamp = result['timestamp']
-        best_text = max(result['texts'], key=lambda x: x['confidence'])
-        
-        if current_text != best_text['text']:
-            # Save previous group if exists
-            if current_text is not None:
-                # 使用共享的 ID 生成器
-                frame_id = generate_frame_id('mygo', start_frame, start_time, current_text)
-                
-                formatted_results.append({
-                    'id': frame_id,
-                    'score': best_text['confidence'],
-                    'text': current_text,
-                    'episode': '1',  # TODO: Extract from filename
-                    'start_time': f"{int(start_time//60):02d}:{int(start_time%60):02d},{int((start_time%1)*1000):03d}",
-                    'end_time': f"{int(timestamp//60):02d}:{int(timestamp%60):02d},{int((timestamp%1)*1000):03d}",
-                    'start_frame': start_frame,
-                    'end_frame': frame_name
-                })
-            
-            # Start new group
-            current_text = best_text['text']
-            start_frame = frame_name
-            start_time = timestamp
-    
-    # Save last group
-    if current_text is not None:
-        # 使用共享的 ID 生成器
-        frame_id = generate_frame_id('mygo', start_frame, start_time, current_text)
-        
-        formatted_results.append({
-            'id': frame_id,
-            'score': best_text['confidence'],
-            'text': current_text,
-            'episode': '1',  # TODO: Extract from filename
-            'start_time': f"{int(start_time//60):02d}:{int(start_time%60):02d},{int((start_time%1)*1000):03d}",
-            'end_time': f"{int(timestamp//60):02d}:{int(timestamp%60):02d},{int((timestamp%1)*1000):03d}",
-            'start_frame': start_frame,
-            'end_frame': frame_name
-        })
-
-    # Save as CSV
     csv_file = f'{base_filename}.csv'
-    with open(csv_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['id', 'score', 'text', 'episode', 'start_time', 'end_time', 'start_frame', 'end_frame'])
-        for result in formatted_results:
-            writer.writerow([
-                result['id'],
-                f"{result['score']:.1f}",
-                result['text'],
-                result['episode'],
-                result['start_time'],
-                result['end_time'],
-                result['start_frame'],
-                result['end_frame']
-            ])
+    if os.path.exists(csv_file):
+        os.remove(csv_file)
+    
+    if isinstance(results, ResultStore):
+        # Spans come straight from the columns
+        results.write_csv(csv_file)
+    else:
+        with IncrementalResultWriter(csv_file) as writer:
+            for result in results:
+                writer.add(result)
     
     print(f"\nResults saved to {csv_file}")
     return csv_file
 
 if __name__ == "__main__":
-    # Get the downloaded video file
-    downloads_dir = 'downloads'
-    video_files = [f for f in os.listdir(downloads_dir) if f.endswith('.mp4')]
-    
-    if not video_files:
-        print("No MP4 files found in downloads directory")
-        exit(1)
-    
-    video_path = os.path.join(downloads_dir, video_files[0])
+    import argparse
+    from frame_ranges import parse_range_spec
+
+    parser = argparse.ArgumentParser(description='OCR the subtitles of a video into ocr_results.csv')
+    parser.add_argument('video', nargs='?', help='Video file (default: first MP4 in downloads/)')
+    parser.add_argument('--ranges', type=parse_range_spec, default=None,
+                        help='Only process these ranges, e.g. "1:00-2:30,4000f-4500f" (seconds, MM:SS or <n>f frames)')
+    parser.add_argument('--frame-skip', type=int, default=1, help='Process every n-th frame')
+    parser.add_argument('--output', default='ocr_results.csv', help='CSV to write')
+    parser.add_argument('--presence-fnr', type=float, default=None,
+                        help='Skip OCR on frames the subtitle detector rejects, at this false-negative rate (e.g. 0.01)')
+    args = parser.parse_args()
+
+    video_path = args.video
+    if video_path is None:
+        # Get the downloaded video file
+        downloads_dir = 'downloads'
+        video_files = [f for f in os.listdir(downloads_dir) if f.endswith('.mp4')]
+        
+        if not video_files:
+            print("No MP4 files found in downloads directory")
+            exit(1)
+        
+        video_path = os.path.join(downloads_dir, video_files[0])
     print(f"Processing video: {video_path}")
     
-    results = process_video(video_path)
-    csv_file = save_results(results, 'ocr_results') 
\ No newline at end of file
+    # Spans are appended to the CSV as soon as they are final; a new run starts a new file
+    os.makedirs('frames', exist_ok=True)
+    if os.path.exists(args.output):
+        os.remove(args.output)
+    with IncrementalResultWriter(args.output) as writer:
+        detector = SubtitleDetector.load(args.presence_fnr) if args.presence_fnr is not None else None
+        results = process_video(video_path, frame_skip=args.frame_skip, ranges=args.ranges, subtitle_detector=detector)
+        for result in merge_near_duplicates(results):
+            writer.add(result)
+    print(f"Results saved to {args.output}")
@@ -1,15 +1,30 @@
-from flask import Flask, render_template, request, jsonify, send_file, send_from_directory
+from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, abort
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
 import os
 import json
+import gzip
 import shutil
 from source_dl import download_video
 from video_ocr import process_video, save_results
-import pandas as pd
+from cpu_planner import process_video_parallel
+from frame_ranges import normalize_ranges
+from crop_archive import CropArchive, LazyBackend, evaluate, job_archive_dir, save_missing_frames
+from subtitle_detector import SubtitleDetector
+from frame_pack import FramePack, FramePackWriter, pack_path_for
+import cv2
+from result_writer import IncrementalResultWriter, splice_ranges
+from line_merge import merge_near_duplicates
 import threading
 import queue
 import atexit
 import time
-from storage import Storage
+from storage import MATCH_END, MATCH_START, Storage
+from ocr_backends import BACKENDS, LANGUAGE_SETS, create_backend
+from markupsafe import escape
+from phash_index import PHashIndex, hash_file
+import thumbnails
+from thumbnails import ThumbnailWorker
 import subprocess
 from pathlib import Path
 import csv
@@ -19,7 +34,38 @@ from datetime import datetime, timedelta
 from id_generator import generate_frame_id
 
 app = Flask(__name__)
-storage = Storage()
+# Created on first use: CPU runs spawn OCR workers that re-import this module,
+# and those must not open the database, load the hash index or start threads
+storage = None
+# Perceptual hashes of every saved frame, keyed "<youtube id>/<frame file>"
+frame_index = None
+# Renders thumb/preview sizes of frames as they are saved
+thumbnail_worker = None
+shared_lock = threading.Lock()
+
+def get_storage():
+    """The job and frame database, opened on first use."""
+    global storage
+    with shared_lock:
+        if storage is None:
+            storage = Storage()
+        return storage
+
+def get_frame_index():
+    """The perceptual-hash index of saved frames, loaded on first use."""
+    global frame_index
+    with shared_lock:
+        if frame_index is None:
+            frame_index = PHashIndex()
+        return frame_index
+
+def get_thumbnail_worker():
+    """The thumbnail rendering thread, started on first use."""
+    global thumbnail_worker
+    with shared_lock:
+        if thumbnail_worker is None:
+            thumbnail_worker = ThumbnailWorker()
+        return thumbnail_worker
 
 # Global variables for progress tracking
 current_progress = {
@@ -35,31 +81,85 @@ current_thread = None
 is_paused = False
 processing_event = threading.Event()
 processing_event.set()  # Initially not paused
+# Minimum seconds between resume checkpoints written to the job row
+CHECKPOINT_SECONDS = 5.0
+# Largest Hamming radius /similar accepts; wider queries return most of the index
+MAX_SIMILAR_RADIUS = 16
+# FRAME_STORE=pack appends saved frames and their sizes to frames.pack instead of frames/
+FRAME_STORE = os.environ.get('FRAME_STORE', 'files')
+FRAMES_PACK = pack_path_for('frames')
+# Rows of a range rerun, spliced into ocr_results.csv when it finishes
+RANGE_RESULTS = 'ocr_results.ranges.csv'
+frame_pack_writer = None
+frame_pack_reader = None
+frame_pack_lock = threading.Lock()
+
+def get_frame_pack_writer():
+    """The one writer of frames.pack, opened on first use."""
+    global frame_pack_writer
+    with frame_pack_lock:
+        if frame_pack_writer is None:
+            frame_pack_writer = FramePackWriter(FRAMES_PACK)
+        return frame_pack_writer
+
+def get_frame_pack():
+    """Reader of frames.pack (reopened after the pack was replaced), or None without one."""
+    global frame_pack_reader
+    with frame_pack_lock:
+        if frame_pack_reader is not None and frame_pack_reader.is_stale():
+            frame_pack_reader.close()
+            frame_pack_reader = None
+        if frame_pack_reader is None and os.path.exists(FRAMES_PACK):
+            frame_pack_reader = FramePack(FRAMES_PACK)
+        return frame_pack_reader
 
-def cleanup_temp_files():
-    """Clean up temporary files and directories."""
+def cleanup_temp_files(keep_results=False):
+    """Clean up temporary files and directories.
+    
+    ``keep_results`` keeps ocr_results.csv for a job resuming from a checkpoint.
+    """
+    global frame_pack_writer
     try:
         # Clean up frames directory
         if os.path.exists('frames'):
             shutil.rmtree('frames')
+        with frame_pack_lock:
+            if frame_pack_writer is not None:
+                frame_pack_writer.close()
+                frame_pack_writer = None
+        for path in (FRAMES_PACK, f'{FRAMES_PACK}.idx'):
+            if os.path.exists(path):
+                os.remove(path)
         # Clean up downloads directory
         if os.path.exists('downloads'):
             shutil.rmtree('downloads')
         # Remove results file
-        if os.path.exists('ocr_results.csv'):
+        if not keep_results and os.path.exists('ocr_results.csv'):
             os.remove('ocr_results.csv')
+        if os.path.exists(RANGE_RESULTS):
+            os.remove(RANGE_RESULTS)
     except Exception as e:
         print(f"Error during cleanup: {str(e)}")
 
-def process_video_async(video_path, frame_skip=1, confidence_threshold=0.6, start_frame=None):
-    """Process video in a separate thread and update progress."""
+def process_video_async(video_path, frame_skip=1, confidence_threshold=0.6, start_frame=None, decoder='opencv', ocr_backend='easyocr', ranges=None, range_unit='seconds', presence_fnr=None, resume_state=None):
+    """Process video in a separate thread and update progress.
+    
+    With ``ranges`` only those parts are reprocessed; the job's stored frames
+    and ocr_results.csv rows inside them are replaced and everything else is kept. With
+    ``presence_fnr`` frames the subtitle detector rejects skip OCR.
+    
+    Full runs save a checkpoint with the job row every ``CHECKPOINT_SECONDS``:
+    the next frame to decode, the text tracking, the merge window, the open
+    CSV span and the CSV length. ``resume_state`` is such a checkpoint; the
+    run picks up exactly there, without OCRing a frame twice or writing a
+    row twice. Runs split across CPU workers checkpoint only between whole
+    segments, so resuming one redoes the segments that were in flight.
+    """
     global current_progress, processing_event
+    writer = None
     try:
         current_progress['status'] = 'processing'
         
-        # Initialize OCR and process video
-        results = []
-        
         # If we have a start frame, we need to skip to that position
         start_frame_number = 0
         if start_frame and start_frame.startswith('frame_'):
@@ -69,15 +169,110 @@ def process_video_async(video_path, frame_skip=1, confidence_threshold=0.6, star
             except:
                 print(f"Could not parse start frame number from {start_frame}")
         
-        for result in process_video(
+        tracker_state = None
+        if resume_state and resume_state.get('tracker'):
+            tracker_state = resume_state['tracker']
+            start_frame_number = tracker_state['next_frame']
+            print(f"Resuming from checkpoint at frame number: {start_frame_number}")
+            # Rows written after the checkpoint are written again from its span state
+            if os.path.exists('ocr_results.csv'):
+                with open('ocr_results.csv', 'r+b') as f:
+                    f.truncate(min(resume_state.get('csv_bytes', 0), os.fstat(f.fileno()).st_size))
+        
+        frame_ranges = None
+        if ranges:
+            cap = cv2.VideoCapture(video_path)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            cap.release()
+            frame_ranges = normalize_ranges(ranges, fps, range_unit)
+            if 'current_url' in current_progress:
+                deleted = get_storage().delete_frames_in_ranges(
+                    get_storage().extract_youtube_id(current_progress['current_url']),
+                    frame_ranges
+                )
+                print(f"Reprocessing {len(ranges)} range(s), replacing {deleted} stored frames")
+        
+        # Finished spans are appended to the CSV as soon as the next line confirms their end;
+        # a range rerun writes its own and splices it into ocr_results.csv once done
+        results_path = RANGE_RESULTS if ranges else 'ocr_results.csv'
+        if ranges and os.path.exists(results_path):
+            os.remove(results_path)
+        writer = IncrementalResultWriter(results_path)
+        merge_pending = []
+        if tracker_state:
+            writer.spans.current = resume_state.get('span')
+            merge_pending = resume_state.get('merge_pending') or []
+        
+        last_checkpoint = [time.monotonic()]
+        
+        def on_checkpoint(state):
+            if 'current_url' not in current_progress or time.monotonic() - last_checkpoint[0] < CHECKPOINT_SECONDS:
+                return
+            last_checkpoint[0] = time.monotonic()
+            # The stored CSV length must be on disk before the row points at it
+            writer.writer.sync()
+            get_storage().save_job_state(
+                current_progress['current_url'],
+                current_progress['status'],
+                current_progress.get('frame_skip', 8),
+                current_progress.get('confidence_threshold', 0.6),
+                current_progress,
+                checkpoint={
+                    'tracker': state,
+                    'merge_pending': merge_pending,
+                    'span': writer.spans.current,
+                    'csv_bytes': os.fstat(writer.writer.fd).st_size
+                }
+            )
+        
+        archive_dir = None
+        if 'current_url' in current_progress:
+            # Every sampled crop and raw OCR output, for /rethreshold
+            archive_dir = job_archive_dir(get_storage().extract_youtube_id(current_progress['current_url']))
+            if not ranges and not start_frame_number and os.path.exists(archive_dir):
+                shutil.rmtree(archive_dir)
+        
+        index_frame = None
+        if 'current_url' in current_progress:
+            index_frame = get_frame_index().frame_saved_callback(get_storage().extract_youtube_id(current_progress['current_url']))
+        
+        frame_store = get_frame_pack_writer() if FRAME_STORE == 'pack' else None
+        
+        thumbnail_worker = get_thumbnail_worker()
+        
+        def on_frame_saved(frame_path, image):
+            thumbnail_worker.submit(frame_path, image, store=frame_store)
+            if index_frame:
+                index_frame(frame_path, image)
+        
+        # Imported here, not at startup: torch alone takes seconds to load
+        import torch
+
+        # On CPU the planner splits the video over as many OCR workers as fit
+        run = process_video if torch.cuda.is_available() else process_video_parallel
+        detections = run(
             video_path, 
             progress_callback=update_progress, 
             frame_skip=frame_skip,
             confidence_threshold=confidence_threshold,
             pause_event=processing_event,
-            start_frame=start_frame_number  # Pass the start frame to process_video
-        ):
-            results.append(result)
+            start_frame=start_frame_number,  # Pass the start frame to process_video
+            decoder=decoder,
+            ocr_backend=ocr_backend,
+            on_frame_saved=on_frame_saved,
+            ranges=ranges,
+            range_unit=range_unit,
+            archive_dir=archive_dir,
+            subtitle_detector=SubtitleDetector.load(presence_fnr) if presence_fnr is not None else None,
+            resume_state=tracker_state,
+            # A range rerun is not a position in the video to resume from
+            on_checkpoint=None if ranges else on_checkpoint,
+            frame_store=frame_store
+        )
+        
+        # Fold OCR jitter variants of the same line into one result
+        for result in merge_near_duplicates(detections, on_merge=merge_stored_frame, pending=merge_pending):
+            writer.add(result)
             # Check if processing should be paused
             processing_event.wait()
             
@@ -85,15 +280,34 @@ def process_video_async(video_path, frame_skip=1, confidence_threshold=0.6, star
                 break
         
         if current_progress['status'] != 'cancelled':
-            # Save results
-            csv_file = save_results(results, 'ocr_results')
+            if ranges:
+                writer.close()
+                writer = None
+                splice_ranges('ocr_results.csv', RANGE_RESULTS, frame_ranges)
             current_progress['status'] = 'completed'
         
-        return results
+        return 'ocr_results.csv'
     except Exception as e:
         current_progress['status'] = 'error'
         print(f"Error processing video: {str(e)}")
         raise
+    finally:
+        if writer is not None:
+            writer.close()
+
+def merge_stored_frame(dropped, kept):
+    """Mirror a near-duplicate merge in storage: hide the dropped frame and keep the best text."""
+    if 'current_url' not in current_progress:
+        return
+    youtube_id = get_storage().extract_youtube_id(current_progress['current_url'])
+    get_storage().update_frame(youtube_id, dropped['frame'], is_deleted=True)
+    best_text = max(kept['texts'], key=lambda x: x['confidence'])
+    get_storage().save_frame(youtube_id, {
+        'frame': kept['frame'],
+        'text': best_text['text'],
+        'timestamp': kept['timestamp'],
+        'confidence': best_text['confidence']
+    })
 
 def update_progress(frame, text, timestamp, total_frames=None, processed_frames=None):
     """Callback function to update processing progress."""
@@ -108,7 +322,7 @@ def update_progress(frame, text, timestamp, total_frames=None, processed_frames=
     
     # Save progress to storage
     if 'current_url' in current_progress:
-        storage.save_job_state(
+        get_storage().save_job_state(
             current_progress['current_url'],
             current_progress['status'],
             current_progress.get('frame_skip', 8),
@@ -116,8 +330,8 @@ def update_progress(frame, text, timestamp, total_frames=None, processed_frames=
             current_progress
         )
         if frame and text:
-            storage.save_frame(
-                storage.extract_youtube_id(current_progress['current_url']),
+            get_storage().save_frame(
+                get_storage().extract_youtube_id(current_progress['current_url']),
                 {
                     'frame': frame,
                     'text': text,
@@ -260,24 +474,88 @@ def resume_processing():
 
 @app.route('/download', methods=['POST'])
 def download():
-    global current_thread, current_progress
+    global current_thread, current_progress, is_paused, processing_event
     
     data = request.json
     url = data.get('url')
     frame_skip = int(data.get('frame_skip', 8))
     confidence_threshold = float(data.get('confidence_threshold', 0.6))
+    decoder = data.get('decoder', 'opencv')
+    ocr_backend = data.get('ocr_backend', 'easyocr')
+    download_profile = data.get('download_profile', 'ocr')
+    # Optional [[start, end], ...] time (or frame, with range_unit='frames') ranges to reprocess
+    ranges = data.get('ranges')
+    range_unit = data.get('range_unit', 'seconds')
+    # Optional false-negative rate of the subtitle-presence check before OCR (e.g. 0.01)
+    presence_fnr = data.get('presence_fnr')
     
     if not url:
         return jsonify({'error': 'No URL provided'}), 400
+    if ocr_backend not in BACKENDS:
+        return jsonify({'error': f"Invalid ocr_backend: {ocr_backend} (expected one of {', '.join(BACKENDS)})"}), 400
+    
+    if ranges:
+        try:
+            normalize_ranges(ranges, 1.0, range_unit)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid ranges: {str(e)}'}), 400
+    if presence_fnr is not None:
+        try:
+            presence_fnr = float(presence_fnr)
+            SubtitleDetector.load(presence_fnr)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid presence_fnr: {str(e)}'}), 400
     
     try:
+        if ranges:
+            # Reprocess only the given ranges, keeping the job's other frames and images
+            if get_storage().get_job_state(url, include_frames=False) is None:
+                return jsonify({'error': 'No processed job for this URL'}), 404
+            if current_thread is not None and current_thread.is_alive():
+                return jsonify({'error': 'Processing is still running'}), 409
+            # frames/ and ocr_results.csv on disk are the last processed job's
+            current_url = current_progress.get('current_url')
+            if not current_url or get_storage().extract_youtube_id(current_url) != get_storage().extract_youtube_id(url):
+                return jsonify({'error': 'The files on disk belong to another video; process this URL before rerunning ranges'}), 409
+            os.makedirs('frames', exist_ok=True)
+            current_progress['current_url'] = url
+            current_progress['frame_skip'] = frame_skip
+            current_progress['confidence_threshold'] = confidence_threshold
+            
+            current_progress['status'] = 'downloading'
+            video_files = download_video(url, profile=download_profile)
+            if not video_files:
+                return jsonify({'error': 'No video file found after download'}), 400
+            
+            is_paused = False
+            processing_event.set()
+            current_thread = threading.Thread(
+                target=process_video_async,
+                args=(video_files[0],),
+                kwargs={
+                    'frame_skip': frame_skip,
+                    'confidence_threshold': confidence_threshold,
+                    'decoder': decoder,
+                    'ocr_backend': ocr_backend,
+                    'ranges': ranges,
+                    'range_unit': range_unit,
+                    'presence_fnr': presence_fnr
+                }
+            )
+            current_thread.start()
+            
+            return jsonify({'status': 'processing', 'ranges': ranges, 'frame_version': get_storage().extract_youtube_id(url)})
+        
         # Check for existing job
-        existing_job = storage.get_job_state(url)
+        existing_job = get_storage().get_job_state(url, include_frames=False)
         if existing_job and existing_job['job']['status'] != 'completed':
+            # Restoring re-extracts the stored frames' images
+            existing_job = get_storage().get_job_state(url)
             print(f"Found existing job for URL: {url}")
             
-            # Clean up any existing files first
-            cleanup_temp_files()
+            # Clean up any existing files first; a checkpoint continues the results CSV
+            checkpoint = existing_job['job'].get('checkpoint')
+            cleanup_temp_files(keep_results=bool(checkpoint))
             
             # Create necessary directories
             os.makedirs('frames', exist_ok=True)
@@ -286,16 +564,12 @@ def download():
             # Download video first
             print("Downloading video...")
             current_progress['status'] = 'downloading'
-            download_video(url)
-            
-            # Get downloaded video path
-            downloads_dir = 'downloads'
-            video_files = [f for f in os.listdir(downloads_dir) if f.endswith(('.mp4', '.mkv'))]
+            video_files = download_video(url, profile=download_profile)
             if not video_files:
                 print("No video file found after download")
                 return jsonify({'error': 'No video file found after download'}), 400
             
-            video_path = os.path.join(downloads_dir, video_files[0])
+            video_path = video_files[0]
             print(f"Video downloaded to: {video_path}")
             
             # Extract frames using ffmpeg
@@ -322,27 +596,35 @@ def download():
                     kwargs={
                         'frame_skip': existing_job['job']['frame_skip'],
                         'confidence_threshold': existing_job['job']['confidence_threshold'],
-                        'start_frame': existing_job['job']['current_frame']
+                        'start_frame': existing_job['job']['current_frame'],
+                        'decoder': decoder,
+                        'ocr_backend': ocr_backend,
+                        'presence_fnr': presence_fnr,
+                        'resume_state': checkpoint
                     }
                 )
                 current_thread.start()
                 
-                # Return existing frames immediately for instant display
+                # The UI pages through the stored frames with /api/frames
                 return jsonify({
                     'status': 'restored',
                     'progress': current_progress,
-                    'frames': existing_job['frames']
+                    'frame_count': len(existing_job['frames']),
+                    'frame_version': get_storage().extract_youtube_id(url)
                 })
             else:
                 print("Frame extraction failed")
                 return jsonify({'error': 'Failed to restore frames'}), 500
         elif existing_job and existing_job['job']['status'] == 'completed':
             print(f"Found completed job for URL: {url}")
-            # For completed jobs, just return the existing frames without reprocessing
+            # For completed jobs, just point the UI at the existing frames without reprocessing
+            youtube_id = get_storage().extract_youtube_id(url)
+            current_progress['current_url'] = url
             return jsonify({
                 'status': 'completed',
                 'progress': existing_job['job'],
-                'frames': existing_job['frames']
+                'frame_count': get_storage().count_frames(youtube_id),
+                'frame_version': youtube_id
             })
         
         # Clean up any existing files
@@ -358,18 +640,14 @@ def download():
         current_progress['confidence_threshold'] = confidence_threshold
         
         # Download video
-        download_video(url)
-        
-        # Get downloaded video path
-        downloads_dir = 'downloads'
-        video_files = [f for f in os.listdir(downloads_dir) if f.endswith(('.mp4', '.mkv'))]
+        # Returns the downloaded (or already present) file for this video ID
+        video_files = download_video(url, profile=download_profile)
         if not video_files:
             return jsonify({'error': 'No video file found after download'}), 400
         
-        video_path = os.path.join(downloads_dir, video_files[0])
+        video_path = video_files[0]
         
         # Reset processing state
-        global is_paused, processing_event
         is_paused = False
         processing_event.set()
         
@@ -379,12 +657,15 @@ def download():
             args=(video_path,),
             kwargs={
                 'frame_skip': frame_skip,
-                'confidence_threshold': confidence_threshold
+                'confidence_threshold': confidence_threshold,
+                'decoder': decoder,
+                'ocr_backend': ocr_backend,
+                'presence_fnr': presence_fnr
             }
         )
         current_thread.start()
         
-        return jsonify({'status': 'processing'})
+        return jsonify({'status': 'processing', 'frame_version': get_storage().extract_youtube_id(url)})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -395,7 +676,7 @@ def cancel_processing():
     global current_progress, current_thread, is_paused, processing_event
     
     if 'current_url' in current_progress:
-        storage.cleanup_job(current_progress['current_url'])
+        get_storage().cleanup_job(current_progress['current_url'])
     
     current_progress['status'] = 'cancelled'
     is_paused = False
@@ -413,8 +694,8 @@ def update_frame():
     is_deleted = data.get('is_deleted')
     
     if 'current_url' in current_progress and frame_number:
-        youtube_id = storage.extract_youtube_id(current_progress['current_url'])
-        storage.update_frame(youtube_id, frame_number, modified_text, is_deleted)
+        youtube_id = get_storage().extract_youtube_id(current_progress['current_url'])
+        get_storage().update_frame(youtube_id, frame_number, modified_text, is_deleted)
         return jsonify({'status': 'success'})
     
     return jsonify({'error': 'Invalid request'}), 400
@@ -428,15 +709,269 @@ def progress():
     
     # If we have a current URL, get any new frames since last check
     if 'current_url' in current_progress:
-        youtube_id = storage.extract_youtube_id(current_progress['current_url'])
-        new_frames = storage.get_new_frames(youtube_id, last_frame_number)
+        youtube_id = get_storage().extract_youtube_id(current_progress['current_url'])
+        new_frames = get_storage().get_new_frames(youtube_id, last_frame_number)
         progress_data['new_frames'] = new_frames
+        progress_data['frame_version'] = youtube_id
     
     return jsonify(progress_data)
 
+def gzip_jsonify(payload):
+    """JSON response, gzip-compressed when the client accepts it."""
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    response = app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if 'gzip' in request.accept_encodings and len(body) > 512:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def parse_flag(value):
+    """'1'/'true'/'yes' -> True, '0'/'false'/'no' -> False, missing -> None."""
+    if value is None or value == '':
+        return None
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Expected a boolean, got {value!r}")
+
+@app.route('/api/frames')
+def list_frames():
+    """One page of the current job's frames.
+    
+    Query parameters: ``cursor`` (``next_cursor`` of the previous page),
+    ``limit`` (1-500), ``order`` (``asc``/``desc``), ``deleted`` and
+    ``edited`` (booleans) and ``min_confidence``/``max_confidence``.
+    """
+    if 'current_url' not in current_progress:
+        return jsonify({'error': 'No video has been processed'}), 400
+    
+    args = request.args
+    try:
+        order = args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Unknown order: {order}")
+        cursor = args.get('cursor', type=int)
+        if args.get('cursor') and cursor is None:
+            raise ValueError(f"Invalid cursor: {args.get('cursor')!r}")
+        limit = min(max(int(args.get('limit', 100)), 1), 500)
+        min_confidence = float(args['min_confidence']) if args.get('min_confidence') else None
+        max_confidence = float(args['max_confidence']) if args.get('max_confidence') else None
+        deleted = parse_flag(args.get('deleted'))
+        edited = parse_flag(args.get('edited'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    youtube_id = get_storage().extract_youtube_id(current_progress['current_url'])
+    frames, next_cursor = get_storage().list_frames(
+        youtube_id,
+        cursor=cursor,
+        limit=limit,
+        descending=order == 'desc',
+        deleted=deleted,
+        edited=edited,
+        min_confidence=min_confidence,
+        max_confidence=max_confidence
+    )
+    return gzip_jsonify({
+        'frames': frames,
+        'next_cursor': next_cursor,
+        'frame_version': youtube_id
+    })
+
+@app.route('/rethreshold', methods=['POST'])
+def rethreshold():
+    """Re-select the current job's texts from its crop archive with a new threshold or language order.
+    
+    Nothing is decoded; crops the new selection needs candidates for that the original
+    run never recorded (gated frames, or a language that was not tried) are OCR'd with
+    ``ocr_backend``, loaded on the first such crop. With ``"ocr_misses": false`` the
+    request is refused instead when there are any. The job's stored frames are replaced
+    only once the new selection is computed. Text edits and deletions are re-applied to
+    frames the new selection still has.
+    """
+    if 'current_url' not in current_progress:
+        return jsonify({'error': 'No video has been processed'}), 400
+    if current_progress.get('status') == 'processing':
+        return jsonify({'error': 'Processing is still running'}), 409
+    
+    data = request.json or {}
+    confidence_threshold = float(data.get('confidence_threshold', current_progress.get('confidence_threshold', 0.6)))
+    languages = data.get('languages', ['ch_tra', 'ja'])
+    ocr_backend = data.get('ocr_backend', 'easyocr')
+    ocr_misses = data.get('ocr_misses', True)
+    if not isinstance(languages, list) or not languages or any(lang not in LANGUAGE_SETS for lang in languages):
+        return jsonify({'error': f"Invalid languages (expected a list of {', '.join(LANGUAGE_SETS)})"}), 400
+    if ocr_backend not in BACKENDS:
+        return jsonify({'error': f"Invalid ocr_backend: {ocr_backend} (expected one of {', '.join(BACKENDS)})"}), 400
+    if not isinstance(ocr_misses, bool):
+        return jsonify({'error': 'Invalid ocr_misses (expected true or false)'}), 400
+    youtube_id = get_storage().extract_youtube_id(current_progress['current_url'])
+    
+    try:
+        archive = CropArchive(job_archive_dir(youtube_id))
+    except FileNotFoundError:
+        return jsonify({'error': 'No crop archive for this video'}), 404
+    
+    readers = None
+    if ocr_misses:
+        readers = {
+            lang: LazyBackend(lambda lang=lang: create_backend(ocr_backend, LANGUAGE_SETS[lang]))
+            for lang in languages
+        }
+    misses = {}
+    with archive:
+        selected = list(evaluate(archive, confidence_threshold, languages, readers=readers, misses=misses))
+        missed = sum(misses.values())
+        if missed and not ocr_misses:
+            return jsonify({
+                'error': f'{missed} crops have no stored candidates for this selection; '
+                         'allow ocr_misses to OCR them',
+                'misses': missed
+            }), 409
+        results = list(merge_near_duplicates(save_missing_frames(selected, archive)))
+    
+    # Reviewer edits outlive the re-selection on frames that are still selected
+    edits = get_storage().frame_edits(youtube_id)
+    get_storage().delete_frames_in_ranges(youtube_id, [(0, None)])
+    kept = 0
+    for result in results:
+        best_text = max(result['texts'], key=lambda x: x['confidence'])
+        get_storage().save_frame(youtube_id, {
+            'frame': result['frame'],
+            'text': best_text['text'],
+            'timestamp': result['timestamp'],
+            'confidence': best_text['confidence']
+        })
+        edit = edits.get(get_storage().frame_index(result['frame']))
+        if edit is not None:
+            modified_text, is_deleted = edit
+            get_storage().update_frame(youtube_id, result['frame'], modified_text=modified_text or None,
+                                 is_deleted=is_deleted or None)
+            kept += 1
+    current_progress['confidence_threshold'] = confidence_threshold
+    
+    return jsonify({
+        'status': 'success',
+        'confidence_threshold': confidence_threshold,
+        'edits_kept': kept,
+        'edits_dropped': len(edits) - kept,
+        'misses': missed,
+        'frames': get_storage().get_new_frames(youtube_id)
+    })
+
+@app.route('/similar')
+def similar_frames():
+    """Find indexed frames (from any processed video) that look like a frame of the current job."""
+    frame = request.args.get('frame')
+    radius = request.args.get('radius', 8, type=int)
+    if not frame or 'current_url' not in current_progress:
+        return jsonify({'error': 'Invalid request'}), 400
+    if not 0 <= radius <= MAX_SIMILAR_RADIUS:
+        return jsonify({'error': f'radius must be between 0 and {MAX_SIMILAR_RADIUS}'}), 400
+    
+    key = f"{get_storage().extract_youtube_id(current_progress['current_url'])}/{frame}"
+    index = get_frame_index()
+    if key in index:
+        matches = index.query_key(key, radius)
+    else:
+        frame_path = os.path.join('frames', os.path.basename(frame))
+        value = hash_file(frame_path) if os.path.exists(frame_path) else None
+        if value is None:
+            return jsonify({'error': 'Frame not found'}), 404
+        matches = index.query(value, radius, exclude=key)
+    
+    return jsonify({
+        'frame': frame,
+        'matches': [{'key': match, 'distance': distance} for match, distance in matches]
+    })
+
+def highlight(snippet):
+    """HTML of a search snippet: OCR text escaped, the match in <mark>."""
+    return str(escape(snippet or '')).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+@app.route('/search')
+def search_frames():
+    """Find frames of any processed job by text or edited text (``q``), best matches first.
+    
+    ``youtube_id`` limits the search to one job and ``deleted=1`` includes
+    deleted frames; ``limit``/``offset`` page through the matches.
+    """
+    args = request.args
+    query = args.get('q', '').strip()
+    try:
+        if not query:
+            raise ValueError('Missing query')
+        limit = min(max(int(args.get('limit', 50)), 1), 200)
+        offset = max(int(args.get('offset', 0)), 0)
+        include_deleted = parse_flag(args.get('deleted')) is True
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    start = time.perf_counter()
+    frames = get_storage().search_frames(
+        query,
+        youtube_id=args.get('youtube_id') or None,
+        limit=limit,
+        offset=offset,
+        include_deleted=include_deleted
+    )
+    for frame in frames:
+        frame['snippet'] = highlight(frame['snippet'])
+    return gzip_jsonify({
+        'query': query,
+        'frames': frames,
+        'next_offset': offset + limit if len(frames) == limit else None,
+        'milliseconds': round((time.perf_counter() - start) * 1000, 2)
+    })
+
+@app.route('/api/duplicates')
+def duplicate_lines():
+    """Lines of the current job that other processed jobs already have; check before exporting."""
+    if 'current_url' not in current_progress:
+        return jsonify({'error': 'No video has been processed'}), 400
+    youtube_id = get_storage().extract_youtube_id(current_progress['current_url'])
+    duplicates = get_storage().find_duplicate_lines(youtube_id)
+    return jsonify({'youtube_id': youtube_id, 'count': len(duplicates), 'duplicates': duplicates})
+
 @app.route('/frames/<path:filename>')
 def serve_frame(filename):
-    return send_from_directory('frames', filename)
+    """Serve a frame, or its ``size=thumb|preview`` rendition, with cache validators.
+    
+    Frame names repeat across jobs, so only URLs carrying the job's
+    ``v=<frame_version>`` are immutable; others must revalidate by ETag.
+    Frames that are not in frames/ are served from frames.pack.
+    """
+    if safe_join('frames', filename) is None:
+        abort(404)
+    pack = get_frame_pack() if not os.path.isfile(os.path.join('frames', filename)) else None
+    try:
+        name = None
+        if pack is not None:
+            name = thumbnails.packed_frame(pack, filename, request.args.get('size'), get_frame_pack_writer())
+        path = thumbnails.frame_file(filename, request.args.get('size')) if name is None else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError:
+        abort(404)
+    
+    if name is not None:
+        # Straight from the pack file, with sendfile where the WSGI server supports it
+        image, length = pack.open_slice(name)
+        response = app.response_class(wrap_file(request.environ, image), mimetype='image/jpeg', direct_passthrough=True)
+        response.content_length = length
+        response.set_etag(pack.etag(name))
+        response.make_conditional(request)
+    else:
+        response = send_file(os.path.abspath(path), mimetype='image/jpeg', etag=thumbnails.etag(path), conditional=True)
+    if request.args.get('v'):
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
 
 @app.route('/download_csv', methods=['POST'])
 def download_csv():
@@ -451,9 +986,9 @@ def download_csv():
             return jsonify({'error': 'No video has been processed'}), 400
         
         # Get data from storage
-        youtube_id = storage.extract_youtube_id(current_progress['current_url'])
+        youtube_id = get_storage().extract_youtube_id(current_progress['current_url'])
         print(f"YouTube ID: {youtube_id}")
-        job_state = storage.get_job_state(current_progress['current_url'])
+        job_state = get_storage().get_job_state(current_progress['current_url'])
         
         if not job_state:
             return jsonify({'error': 'No data found'}), 404
@@ -571,13 +1106,20 @@ def download_csv():
         
         print("\nCSV file created successfully")
         
+        # Lines other jobs already have usually mean the episode was processed twice
+        duplicates = get_storage().find_duplicate_lines(youtube_id)
+        if duplicates:
+            print(f"Warning: {len(duplicates)} line(s) already exported from other jobs (see /api/duplicates)")
+        
         # Send file
-        return send_file(
+        response = send_file(
             temp_path,
             as_attachment=True,
             download_name=filename,
             mimetype='text/csv'
         )
+        response.headers['X-Duplicate-Lines'] = str(len(duplicates))
+        return response
         
     except Exception as e:
         print(f"Error generating CSV: {str(e)}")
@@ -586,7 +1128,9 @@ def download_csv():
         return jsonify({'error': str(e)}), 500
 
 # Register cleanup function to run on server shutdown
-atexit.register(cleanup_temp_files)
+# Not in spawned OCR workers, which import this module as __mp_main__
+if __name__ != '__mp_main__':
+    atexit.register(cleanup_temp_files)
 
 if __name__ == '__main__':
     # Create necessary directories
@@ -0,0 +1,486 @@
+"""Durable OCR work queue shared by several machines through one SQLite file.
+
+A season is enqueued as items (whole episodes, or fixed-length frame
+segments of them). Any number of workers, on any box that can open the
+database file and the videos, claim items one at a time:
+
+- a claim is a *lease* with an owner, a random token and an expiry time,
+- the worker extends it with heartbeats while ``process_video`` runs,
+- a lease that is not extended expires and the item is handed out again,
+- results are written back with the lease token in one transaction, keyed
+  by ``generate_frame_id``, so a retried or twice-finished item never
+  duplicates rows and a worker that lost its lease cannot overwrite the
+  new holder's state.
+
+The tables live next to ``Storage``'s (``processing_state.db`` by default)
+or in any shared path; ``Storage`` never drops them. Leases compare wall
+clock times, so nodes need roughly synchronized clocks, and the file needs
+working POSIX locks (local disks, most NFSv4 mounts):
+
+    python work_queue.py enqueue contents/mygo/*.mp4 --db /shared/queue.db --segment-minutes 5
+    python work_queue.py work --db /shared/queue.db --wait
+    python work_queue.py status --db /shared/queue.db
+    python work_queue.py export mygo/1 tables/ep1.csv --db /shared/queue.db
+
+Jobs are named ``<collection>/<episode>`` after the video's directory and
+file name (``contents/mygo/1.mp4`` -> ``mygo/1``), so seasons whose files
+share names stay apart; ``--collection`` or ``--job`` name them explicitly.
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from id_generator import generate_frame_id
+from ocr_backends import BACKENDS
+
+DEFAULT_DB = 'processing_state.db'
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+
+def _texts_json(texts):
+    """process_video texts as plain JSON (EasyOCR bboxes hold NumPy scalars)."""
+    return json.dumps([
+        {
+            'text': t['text'],
+            'confidence': float(t['confidence']),
+            'bbox': [[int(x), int(y)] for x, y in t['bbox']] if t.get('bbox') is not None else None,
+            'lang': t.get('lang'),
+        }
+        for t in texts
+    ], ensure_ascii=False)
+
+
+class LeaseLost(Exception):
+    """The lease expired and the item may now belong to another worker."""
+
+
+class WorkQueue:
+    """Work items, their leases and their results in one SQLite file."""
+
+    def __init__(self, db_path=DEFAULT_DB, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.init_db()
+
+    def _connect(self):
+        # Autocommit mode; writes that must be atomic open BEGIN IMMEDIATE themselves
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def init_db(self):
+        """Create the queue tables if they do not exist."""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS work_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job TEXT NOT NULL,
+                    video_path TEXT NOT NULL,
+                    start_frame INTEGER NOT NULL,
+                    end_frame INTEGER,
+                    settings TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_token TEXT,
+                    lease_expires REAL,
+                    result_count INTEGER,
+                    error TEXT,
+                    updated_at REAL,
+                    UNIQUE(job, start_frame)
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS work_items_claim
+                ON work_items (status, lease_expires)
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS work_results (
+                    id TEXT PRIMARY KEY,
+                    job TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    frame TEXT NOT NULL,
+                    frame_index INTEGER NOT NULL,
+                    timestamp REAL NOT NULL,
+                    text TEXT NOT NULL,
+                    confidence REAL,
+                    texts TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS work_results_job
+                ON work_results (job, frame_index)
+            ''')
+        finally:
+            conn.close()
+
+    def enqueue(self, job, video_path, start_frame=0, end_frame=None, **settings):
+        """Add one item; an item with the same job and start frame is left as it is.
+
+        Returns True if the item was added. Raises ``ValueError`` if the job
+        already has that item for another video.
+        """
+        video_path = os.path.abspath(video_path)
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                INSERT OR IGNORE INTO work_items (job, video_path, start_frame, end_frame, settings, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (job, video_path, start_frame, end_frame, json.dumps(settings), time.time()))
+            if cursor.rowcount == 1:
+                return True
+            existing = conn.execute('SELECT video_path FROM work_items WHERE job = ? AND start_frame = ?',
+                                    (job, start_frame)).fetchone()[0]
+            if existing != video_path:
+                raise ValueError(f"Job {job} is already queued for {existing}, not {video_path} "
+                                 f"(name the job with --collection or --job)")
+            return False
+        finally:
+            conn.close()
+
+    def enqueue_video(self, job, video_path, segment_frames=None, total_frames=None, **settings):
+        """Enqueue a whole video, or ``segment_frames``-long segments of it.
+
+        Segment boundaries sit on the ``frame_skip`` grid, so the segments
+        sample the same frames as one run over the whole video.
+        """
+        if not segment_frames:
+            return int(self.enqueue(job, video_path, **settings))
+        if total_frames is None:
+            import cv2
+
+            cap = cv2.VideoCapture(video_path)
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+        frame_skip = settings.get('frame_skip', 1)
+        length = max(frame_skip, math.ceil(segment_frames / frame_skip) * frame_skip)
+        return sum(
+            self.enqueue(job, video_path, start, min(start + length, total_frames), **settings)
+            for start in range(0, total_frames, length)
+        )
+
+    def claim(self, owner):
+        """Lease the oldest pending or expired item to ``owner``; None when there is none.
+
+        Items whose lease expired ``max_attempts`` times are marked failed
+        instead of being handed out again.
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            while True:
+                now = time.time()
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('''
+                    SELECT * FROM work_items
+                    WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                    ORDER BY id LIMIT 1
+                ''', (now,)).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                if row['attempts'] >= self.max_attempts:
+                    conn.execute('''
+                        UPDATE work_items SET status = 'failed', lease_token = NULL,
+                            error = COALESCE(error, 'lease expired'), updated_at = ?
+                        WHERE id = ?
+                    ''', (now, row['id']))
+                    conn.execute('COMMIT')
+                    continue
+                token = uuid.uuid4().hex
+                conn.execute('''
+                    UPDATE work_items
+                    SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_token = ?,
+                        lease_expires = ?, updated_at = ?
+                    WHERE id = ?
+                ''', (owner, token, now + self.lease_seconds, now, row['id']))
+                conn.execute('COMMIT')
+                lease = dict(row)
+                lease.update(settings=json.loads(row['settings']), token=token, lease_owner=owner,
+                             attempts=row['attempts'] + 1)
+                return lease
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, lease):
+        """Extend ``lease``; False if it was lost (expired and reclaimed, or finished)."""
+        conn = self._connect()
+        try:
+            now = time.time()
+            cursor = conn.execute('''
+                UPDATE work_items SET lease_expires = ?, updated_at = ?
+                WHERE id = ? AND lease_token = ? AND status = 'leased'
+            ''', (now + self.lease_seconds, now, lease['id'], lease['token']))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, lease, results):
+        """Store the item's process_video ``results`` and mark it done.
+
+        Rows are keyed by ``generate_frame_id`` over job, frame, timestamp
+        and text, so storing the same results twice changes nothing.
+        Raises ``LeaseLost`` (and stores nothing) if ``lease`` is no longer held.
+        """
+        rows = []
+        for result in results:
+            if not result.get('texts'):
+                continue
+            best = max(result['texts'], key=lambda x: x['confidence'])
+            rows.append((
+                generate_frame_id(lease['job'], result['frame'], result['timestamp'], best['text']),
+                lease['job'],
+                lease['id'],
+                result['frame'],
+                int(result['frame'].split('_')[1].split('.')[0]),
+                float(result['timestamp']),
+                best['text'],
+                float(best['confidence']),
+                _texts_json(result['texts'])
+            ))
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute('''
+                UPDATE work_items
+                SET status = 'done', lease_token = NULL, lease_expires = NULL, result_count = ?,
+                    error = NULL, updated_at = ?
+                WHERE id = ? AND lease_token = ? AND status = 'leased'
+            ''', (len(rows), time.time(), lease['id'], lease['token']))
+            if cursor.rowcount != 1:
+                conn.execute('ROLLBACK')
+                raise LeaseLost(f"Lease on item {lease['id']} was lost")
+            conn.executemany('''
+                INSERT OR REPLACE INTO work_results
+                (id, job, item_id, frame, frame_index, timestamp, text, confidence, texts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        return len(rows)
+
+    def fail(self, lease, error):
+        """Give the item back for a retry, or mark it failed after ``max_attempts``."""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                UPDATE work_items
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    lease_token = NULL, lease_expires = NULL, error = ?, updated_at = ?
+                WHERE id = ? AND lease_token = ?
+            ''', (self.max_attempts, str(error), time.time(), lease['id'], lease['token']))
+        finally:
+            conn.close()
+
+    def status(self):
+        """{job: {status: item count}}."""
+        conn = self._connect()
+        try:
+            counts = {}
+            for job, status, count in conn.execute('''
+                SELECT job, status, COUNT(*) FROM work_items GROUP BY job, status ORDER BY job
+            '''):
+                counts.setdefault(job, {})[status] = count
+            return counts
+        finally:
+            conn.close()
+
+    def results(self, job):
+        """The job's stored results as process_video results, in frame order."""
+        conn = self._connect()
+        try:
+            return [
+                {'frame': frame, 'timestamp': timestamp, 'texts': json.loads(texts)}
+                for frame, timestamp, texts in conn.execute('''
+                    SELECT frame, timestamp, texts FROM work_results
+                    WHERE job = ? ORDER BY frame_index
+                ''', (job,))
+            ]
+        finally:
+            conn.close()
+
+
+class _Heartbeat(threading.Thread):
+    """Extends a lease every ``interval`` seconds until stopped; ``lost`` is set if it cannot."""
+
+    def __init__(self, queue, lease, interval):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.lease = lease
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            if not self.queue.heartbeat(self.lease):
+                self.lost.set()
+                return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def process_item(queue, lease, readers=None, frames_dir='frames', heartbeat_interval=None):
+    """Run process_video on a leased item and store its results.
+
+    Heartbeats run while OCR does; if the lease is lost the item is
+    abandoned and ``LeaseLost`` raised. Returns the stored result count.
+    """
+    from video_ocr import process_video
+
+    settings = dict(lease['settings'])
+    heartbeat = _Heartbeat(queue, lease, heartbeat_interval or queue.lease_seconds / 3)
+    heartbeat.start()
+    results = []
+    try:
+        os.makedirs(frames_dir, exist_ok=True)
+        for result in process_video(
+            lease['video_path'],
+            start_frame=lease['start_frame'],
+            end_frame=lease['end_frame'],
+            readers=readers,
+            use_subtitle_streams=False,
+            frames_dir=frames_dir,
+            **settings
+        ):
+            if heartbeat.lost.is_set():
+                raise LeaseLost(f"Lease on item {lease['id']} was lost")
+            results.append(result)
+    finally:
+        heartbeat.stop()
+    return queue.complete(lease, results)
+
+
+def run_worker(db_path=DEFAULT_DB, owner=None, readers=None, ocr_backend='easyocr', frames_dir='frames',
+               lease_seconds=LEASE_SECONDS, heartbeat_interval=None, wait=False, poll_seconds=10.0):
+    """Claim and process items until the queue is empty (or forever with ``wait``).
+
+    Returns the number of items this worker completed.
+    """
+    queue = WorkQueue(db_path, lease_seconds=lease_seconds)
+    owner = owner or f'{socket.gethostname()}:{os.getpid()}'
+    done = 0
+    while True:
+        lease = queue.claim(owner)
+        if lease is None:
+            if not wait:
+                return done
+            time.sleep(poll_seconds)
+            continue
+        if readers is None:
+            # Only load the OCR models once there is work
+            from video_ocr import init_readers
+
+            readers = init_readers(ocr_backend)
+        print(f"[{owner}] item {lease['id']}: {lease['job']} frames {lease['start_frame']}-{lease['end_frame']}")
+        try:
+            count = process_item(queue, lease, readers, frames_dir, heartbeat_interval)
+        except LeaseLost as e:
+            print(f"[{owner}] {e}")
+            continue
+        except Exception as e:
+            print(f"[{owner}] item {lease['id']} failed: {e}")
+            queue.fail(lease, e)
+            continue
+        done += 1
+        print(f"[{owner}] item {lease['id']} done, {count} results")
+
+
+def job_key(video_path, collection=None):
+    """Job name of a video: ``<collection>/<file name without extension>``.
+
+    ``collection`` defaults to the name of the video's directory.
+    """
+    if collection is None:
+        collection = os.path.basename(os.path.dirname(os.path.abspath(video_path)))
+    return f"{collection}/{os.path.splitext(os.path.basename(video_path))[0]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared OCR work queue')
+    parser.add_argument('--db', default=DEFAULT_DB, help='Queue database (any path all workers can open)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help='Add videos to the queue')
+    enqueue.add_argument('videos', nargs='+', help='Video files (paths must be valid on every worker)')
+    enqueue.add_argument('--segment-minutes', type=float, default=None, help='Split videos into segments this long')
+    enqueue.add_argument('--frame-skip', type=int, default=8, help='Process every n-th frame')
+    enqueue.add_argument('--threshold', type=float, default=0.6, help='Confidence threshold')
+    enqueue.add_argument('--decoder', default='opencv', choices=('opencv', 'ffmpeg'), help='Decode path')
+    enqueue.add_argument('--collection', default=None,
+                         help="Job name prefix (default: each video's directory name)")
+    enqueue.add_argument('--job', default=None, help='Job name, for a single video')
+
+    work = commands.add_parser('work', help='Process items until the queue is empty')
+    work.add_argument('--owner', default=None, help='Worker name (default: host:pid)')
+    work.add_argument('--ocr-backend', default='easyocr', choices=sorted(BACKENDS), help='OCR backend')
+    work.add_argument('--frames-dir', default='frames', help='Where this worker writes frames')
+    work.add_argument('--lease-seconds', type=float, default=LEASE_SECONDS, help='Lease length')
+    work.add_argument('--wait', action='store_true', help='Keep polling for new items instead of exiting')
+
+    commands.add_parser('status', help='Item counts per job and status')
+
+    export = commands.add_parser('export', help='Write a job to CSV')
+    export.add_argument('job', help='Job name (<collection>/<video file name without extension>)')
+    export.add_argument('output', help='CSV to write')
+    args = parser.parse_args()
+
+    if args.command == 'enqueue' and args.job and len(args.videos) > 1:
+        parser.error('--job names a single video')
+
+    if args.command == 'enqueue':
+        queue = WorkQueue(args.db)
+        for video_path in args.videos:
+            segment_frames = None
+            if args.segment_minutes:
+                import cv2
+
+                cap = cv2.VideoCapture(video_path)
+                segment_frames = int(args.segment_minutes * 60 * cap.get(cv2.CAP_PROP_FPS))
+                cap.release()
+            job = args.job or job_key(video_path, args.collection)
+            try:
+                added = queue.enqueue_video(job, video_path, segment_frames, frame_skip=args.frame_skip,
+                                            confidence_threshold=args.threshold, decoder=args.decoder)
+            except ValueError as e:
+                parser.error(str(e))
+            print(f"{job}: {added} items added")
+    elif args.command == 'work':
+        done = run_worker(args.db, args.owner, ocr_backend=args.ocr_backend, frames_dir=args.frames_dir,
+                          lease_seconds=args.lease_seconds, wait=args.wait)
+        print(f"Completed {done} items")
+    elif args.command == 'status':
+        for job, counts in WorkQueue(args.db).status().items():
+            print(f"{job}: " + ', '.join(f'{count} {status}' for status, count in sorted(counts.items())))
+    else:
+        from line_merge import merge_near_duplicates
+        from result_store import ResultStore
+
+        # Lines that straddle a segment boundary are found by both segments
+        store = ResultStore.from_results(merge_near_duplicates(WorkQueue(args.db).results(args.job)))
+        collection, _, episode = args.job.rpartition('/')
+        store.write_csv(args.output, collection=collection or 'mygo', episode=episode)
+        print(f"Wrote {len(store)} results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()